@@ -1,5 +1,5 @@
 import frappe
-from frappe.utils import flt, nowdate
+from frappe.utils import cint, flt, now, nowdate
 
 # Default account mappings — can be overridden in UW Settings
 DEFAULT_ACCOUNTS = {
@@ -11,85 +11,211 @@ DEFAULT_ACCOUNTS = {
     "cash": "1000 - Cash",
 }
 
+JOURNAL_ENTRY_FIELDS = [
+    "posting_date", "entry_type", "reference_doctype", "reference_name",
+    "debit_account", "credit_account", "amount", "campaign", "agency", "donor", "remarks",
+    "posting_key",
+]
+
 def create_donation_journal_entry(donation):
-    """Create a journal entry when a Donation is submitted.
+    """Queue a journal entry for a submitted Donation.
 
     Debit: Cash/Donations Receivable
     Credit: Donation Revenue
+
+    The entry goes to the outbox with the rest of the rollup batch, so a
+    Remittance chunk records all of its donation entries with one insert.
     """
-    if not should_create_journal_entries():
-        return
-
-    entry = frappe.new_doc("UW Journal Entry")
-    entry.posting_date = donation.donation_date or nowdate()
-    entry.entry_type = "Donation Receipt"
-    entry.reference_doctype = "Donation"
-    entry.reference_name = donation.name
-    entry.debit_account = DEFAULT_ACCOUNTS["cash"]
-    entry.credit_account = DEFAULT_ACCOUNTS["donation_revenue"]
-    entry.amount = flt(donation.amount)
-    entry.campaign = donation.campaign
-    entry.donor = donation.donor
-    entry.remarks = f"Donation {donation.name} from {donation.donor_name or donation.donor}"
-    entry.insert(ignore_permissions=True)
-    return entry.name
+    from united_way import rollups
+
+    rollups.add_journal_entry(donation_journal_entry(donation))
 
 def create_distribution_journal_entries(distribution_run):
-    """Create journal entries for each agency distribution item.
+    """Queue journal entries for each agency distribution item.
 
     For each agency:
     Debit: Agency Distribution Expense
     Credit: Agency Payable
     """
-    if not should_create_journal_entries():
-        return
-
-    entries = []
-    for item in distribution_run.items:
-        entry = frappe.new_doc("UW Journal Entry")
-        entry.posting_date = distribution_run.distribution_date or nowdate()
-        entry.entry_type = "Agency Distribution"
-        entry.reference_doctype = "Distribution Run"
-        entry.reference_name = distribution_run.name
-        entry.debit_account = DEFAULT_ACCOUNTS["distribution_expense"]
-        entry.credit_account = DEFAULT_ACCOUNTS["agency_payable"]
-        entry.amount = flt(item.distribution_amount)
-        entry.campaign = distribution_run.campaign
-        entry.agency = item.agency
-        entry.remarks = f"Distribution to {item.agency} - {distribution_run.name}"
-        entry.insert(ignore_permissions=True)
-        entries.append(entry.name)
-
-    return entries
+    from united_way.journal_outbox import add_to_outbox
+
+    add_to_outbox(distribution_journal_entries(distribution_run))
 
 def create_writeoff_journal_entry(writeoff):
-    """Create a journal entry when a Pledge Writeoff is submitted.
+    """Queue a journal entry for a submitted Pledge Writeoff.
 
     Debit: Writeoff Expense
     Credit: Donations Receivable (reducing the receivable)
     """
-    if not should_create_journal_entries():
-        return
-
-    entry = frappe.new_doc("UW Journal Entry")
-    entry.posting_date = writeoff.writeoff_date or nowdate()
-    entry.entry_type = "Pledge Writeoff"
-    entry.reference_doctype = "Pledge Writeoff"
-    entry.reference_name = writeoff.name
-    entry.debit_account = DEFAULT_ACCOUNTS["writeoff_expense"]
-    entry.credit_account = DEFAULT_ACCOUNTS["donations_receivable"]
-    entry.amount = flt(writeoff.writeoff_amount)
-    entry.campaign = writeoff.campaign
-    entry.donor = writeoff.donor
-    entry.remarks = f"Write-off of {writeoff.writeoff_amount} for pledge {writeoff.pledge}"
-    entry.insert(ignore_permissions=True)
-    return entry.name
+    from united_way.journal_outbox import add_to_outbox
+
+    add_to_outbox([writeoff_journal_entry(writeoff)])
+
+def donation_journal_entry(donation):
+    return frappe._dict(
+        posting_date=donation.donation_date or nowdate(),
+        entry_type="Donation Receipt",
+        reference_doctype="Donation",
+        reference_name=donation.name,
+        debit_account=DEFAULT_ACCOUNTS["cash"],
+        credit_account=DEFAULT_ACCOUNTS["donation_revenue"],
+        amount=flt(donation.amount),
+        campaign=donation.campaign,
+        donor=donation.donor,
+        remarks=f"Donation {donation.name} from {donation.donor_name or donation.donor}",
+    )
+
+def distribution_journal_entries(distribution_run):
+    return [
+        frappe._dict(
+            posting_date=distribution_run.distribution_date or nowdate(),
+            entry_type="Agency Distribution",
+            reference_doctype="Distribution Run",
+            reference_name=distribution_run.name,
+            debit_account=DEFAULT_ACCOUNTS["distribution_expense"],
+            credit_account=DEFAULT_ACCOUNTS["agency_payable"],
+            amount=flt(item.distribution_amount),
+            campaign=distribution_run.campaign,
+            agency=item.agency,
+            remarks=f"Distribution to {item.agency} - {distribution_run.name}",
+        )
+        for item in distribution_run.items
+    ]
+
+def writeoff_journal_entry(writeoff):
+    return frappe._dict(
+        posting_date=writeoff.writeoff_date or nowdate(),
+        entry_type="Pledge Writeoff",
+        reference_doctype="Pledge Writeoff",
+        reference_name=writeoff.name,
+        debit_account=DEFAULT_ACCOUNTS["writeoff_expense"],
+        credit_account=DEFAULT_ACCOUNTS["donations_receivable"],
+        amount=flt(writeoff.writeoff_amount),
+        campaign=writeoff.campaign,
+        donor=writeoff.donor,
+        remarks=f"Write-off of {writeoff.writeoff_amount} for pledge {writeoff.pledge}",
+    )
+
+def post_journal_entries(entries, settings=None, summarize=None):
+    """Write many UW Journal Entries with one settings read and one bulk insert.
+
+    Entries are dicts of JOURNAL_ENTRY_FIELDS. Names are reserved from the
+    JE-{YYYY}- naming series up front and only required fields are checked;
+    controller hooks are not run.
+
+    Args:
+        entries: list of entry dicts
+        settings: get_posting_settings() result, if the caller already has it
+        summarize: Override UW Settings > Post Summary Journal Entries
+
+    Returns:
+        list of created entry names (empty if posting is disabled)
+    """
+    settings = settings or get_posting_settings()
+    if not settings.auto_create_journal_entries or not entries:
+        return []
+
+    if summarize is None:
+        summarize = settings.journal_entry_summary_mode
+    if summarize:
+        entries = summarize_journal_entries(entries)
+
+    for entry in entries:
+        for fieldname in ("posting_date", "entry_type", "debit_account", "credit_account"):
+            if not entry.get(fieldname):
+                frappe.throw(
+                    f"Journal entry for {entry.get('reference_doctype')} {entry.get('reference_name')} "
+                    f"is missing {fieldname}."
+                )
+
+    entries = [entry for entry in entries if flt(entry.get("amount"))]
+    if not entries:
+        return []
+
+    names = reserve_series(f"JE-{nowdate()[:4]}-", len(entries), digits=5)
+    timestamp = now()
+    user = frappe.session.user
+
+    frappe.db.bulk_insert(
+        "UW Journal Entry",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus"] + JOURNAL_ENTRY_FIELDS,
+        values=[
+            [name, timestamp, timestamp, user, user, 0] + [entry.get(f) for f in JOURNAL_ENTRY_FIELDS]
+            for name, entry in zip(names, entries)
+        ],
+    )
+    return names
+
+def summarize_journal_entries(entries):
+    """Aggregate entries into one per entry type, accounts, campaign and posting date."""
+    groups = {}
+    for entry in entries:
+        key = (
+            entry.get("entry_type"), entry.get("debit_account"), entry.get("credit_account"),
+            entry.get("campaign"), str(entry.get("posting_date")),
+        )
+        groups.setdefault(key, []).append(entry)
+
+    summary = []
+    for group in groups.values():
+        first = group[0]
+        if len(group) == 1:
+            summary.append(first)
+            continue
+
+        references = {(e.get("reference_doctype"), e.get("reference_name")) for e in group}
+        reference_doctype, reference_name = references.pop() if len(references) == 1 else (None, None)
+        summary.append(frappe._dict(
+            posting_date=first.get("posting_date"),
+            entry_type=first.get("entry_type"),
+            reference_doctype=reference_doctype,
+            reference_name=reference_name,
+            debit_account=first.get("debit_account"),
+            credit_account=first.get("credit_account"),
+            amount=flt(sum(flt(e.get("amount")) for e in group), 2),
+            campaign=first.get("campaign"),
+            remarks=f"Summary of {len(group)} {first.get('entry_type')} entries",
+        ))
+
+    return summary
+
+def reserve_series(prefix, count, digits=5):
+    """Reserve ``count`` consecutive names from a naming series in one update.
+
+    Uses the same tabSeries counter as Frappe's naming, so reserved names
+    never collide with documents named the normal way.
+    """
+    current = frappe.db.sql(
+        "SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", prefix
+    )
+    if current:
+        start = cint(current[0][0])
+        frappe.db.sql(
+            "UPDATE `tabSeries` SET `current` = `current` + %s WHERE `name` = %s", (count, prefix)
+        )
+    else:
+        start = 0
+        frappe.db.sql(
+            "INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (prefix, count)
+        )
+
+    return [f"{prefix}{str(start + i).zfill(digits)}" for i in range(1, count + 1)]
+
+def get_posting_settings():
+    """Journal entry settings from the worker settings cache."""
+    from united_way.cache import get_settings
+
+    settings = get_settings()
+    return frappe._dict(
+        auto_create_journal_entries=cint(settings.get("auto_create_journal_entries")),
+        journal_entry_summary_mode=cint(settings.get("journal_entry_summary_mode")),
+    )
 
 def should_create_journal_entries():
     """Check if journal entry creation is enabled in UW Settings.
     Returns True if auto_create_journal_entries is checked in settings."""
     try:
-        return frappe.db.get_single_value("UW Settings", "auto_create_journal_entries") or 0
+        return get_posting_settings().auto_create_journal_entries
     except Exception:
         return False
 
@@ -1,6 +1,8 @@
 import frappe
 from frappe.utils import flt
 
+from united_way import identity_map
+
 
 @frappe.whitelist(allow_guest=False)
 def get_campaign_summary(campaign=None, campaign_year=None):
@@ -48,7 +50,12 @@ def get_donor_profile(donor=None, email=None):
         if not donor:
             frappe.throw(f"No contact found with email '{email}'.")
 
-    contact = frappe.get_doc("Contact", donor)
+    contact = identity_map.get_header("Contact", donor, [
+        "full_name", "email", "organization", "contact_type", "donor_since", "lifetime_giving",
+        "donor_level", "last_donation_date", "last_donation_amount", "consecutive_years_giving",
+    ])
+    if not contact:
+        frappe.throw(f"Contact '{donor}' not found.", frappe.DoesNotExistError)
 
     profile = {
         "name": contact.name,
@@ -0,0 +1,308 @@
+"""
+Report performance benchmarks against stored budgets.
+
+Usage:
+    bench --site uw.localhost uw-benchmark-reports --scale 10k --scale 100k
+    bench --site uw.localhost uw-benchmark-reports --scale 1m --skip-load --update-budgets
+
+Each scale loads a synthetic dataset (united_way.synthetic, with payment
+schedules and a year of month-end aging snapshots, see DATASET_PARAMS)
+and runs every UW Core script report's ``execute()`` with the filters in
+CASES.
+Reports without a case run unfiltered, so new reports are benchmarked
+from the start. Every case is run once to warm the caches, then
+``repeat`` times with the report result cache bypassed, recording:
+
+- wall_time: median seconds per run
+- queries: SQL statements sent to the database (session Questions)
+- rows_examined: rows read by the storage engine (session Handler_read_*)
+
+Measurements are compared with benchmark_budgets.json and written as
+JSON to the site's private/benchmarks folder. Wall time and rows
+examined may exceed their budget by the stored tolerance; query counts
+are exact. The first run of a scale without any budgets records its
+measurements with headroom as the scale's baseline (commit the updated
+benchmark_budgets.json). After that, a case without a budget fails like
+one over budget, so new cases cannot pass silently. --update-budgets
+records the current measurements as the new budgets, for when a slowdown
+is intended or after moving the reference machine.
+"""
+import json
+import os
+import statistics
+import time
+
+import frappe
+from frappe.modules import get_report_module_dotted_path
+from frappe.utils import cint, flt, now_datetime
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "benchmark_budgets.json")
+
+# (case, report, filters); {placeholders} are filled from get_filter_context()
+CASES = [
+    ("agency_allocation_report", "Agency Allocation Report", {"campaign": "{campaign}"}),
+    ("campaign_drive_progress", "Campaign Drive Progress", {"campaign": "{campaign}"}),
+    ("campaign_summary", "Campaign Summary", {}),
+    ("distribution_summary", "Distribution Summary", {"campaign": "{campaign}"}),
+    ("donor_giving_history", "Donor Giving History", {"campaign": "{campaign}"}),
+    ("donor_giving_history.organization", "Donor Giving History", {"organization": "{employer}"}),
+    ("donor_retention", "Donor Retention", {"current_year": "{year}"}),
+    ("donor_retention.cohorts", "Donor Retention", {"current_year": "{year}", "view": "Cohorts"}),
+    ("executive_summary", "Executive Summary", {"campaign": "{campaign}"}),
+    ("payment_schedule_aging", "Payment Schedule Aging", {"campaign": "{campaign}"}),
+    ("payment_schedule_aging.employer", "Payment Schedule Aging", {"group_by": "Employer"}),
+    ("receivable_aging_trend", "Receivable Aging Trend", {"campaign": "{campaign}"}),
+    ("remittance_summary", "Remittance Summary", {"campaign": "{campaign}"}),
+]
+
+MEASURES = ("wall_time", "queries", "rows_examined")
+HANDLER_READS = (
+    "Handler_read_first", "Handler_read_key", "Handler_read_last", "Handler_read_next",
+    "Handler_read_prev", "Handler_read_rnd", "Handler_read_rnd_next",
+)
+
+NO_BUDGET = "no budget"
+
+# Synthetic data options on top of the scale, so the aging reports have rows to read
+DATASET_PARAMS = {"with_schedules": True, "aging_snapshots": 12}
+
+# Multipliers applied by --update-budgets
+HEADROOM = {"wall_time": 1.5, "queries": 1, "rows_examined": 1.1}
+
+
+def run_benchmarks(scale, load=True, repeat=3, reports=None, update_budgets=False, output=None):
+    """Benchmark every report case at one dataset scale.
+
+    Args:
+        scale: key of united_way.synthetic.SCALES
+        load: Generate the dataset first (otherwise use the SYN- data already loaded)
+        repeat: Measured runs per case
+        reports: Only run cases of these report names
+        update_budgets: Store these measurements as the scale's new budgets
+            (always done for a scale without any budgets yet)
+        output: Path of the JSON results file (default: private/benchmarks on the site)
+
+    Returns:
+        the results dict, as written to the JSON file
+    """
+    from united_way import synthetic
+
+    frappe.set_user("Administrator")
+    load_time = None
+    if load:
+        start = time.perf_counter()
+        dataset = synthetic.generate(scale=scale, **DATASET_PARAMS)
+        load_time = round(time.perf_counter() - start, 1)
+    else:
+        dataset = get_dataset_counts()
+
+    context = get_filter_context()
+    budget_file = load_budgets()
+    budgets = budget_file["budgets"].get(scale, {})
+    tolerance = budget_file["tolerance"]
+    # Nothing to compare with yet: this run becomes the scale's baseline
+    baseline = not budgets
+
+    results = []
+    for case, report_name, filters in get_cases(reports):
+        result = run_case(report_name, fill_filters(filters, context), repeat=repeat)
+        result.update(case=case, report=report_name, budget=budgets.get(case))
+        result["regressions"] = [] if baseline else check_budget(result, result["budget"], tolerance)
+        results.append(result)
+
+    if update_budgets or baseline:
+        budget_file["budgets"][scale] = dict(
+            budgets,
+            **{result["case"]: make_budget(result) for result in results if not result.get("error")},
+        )
+        save_budgets(budget_file)
+
+    payload = {
+        "scale": scale,
+        "timestamp": now_datetime().isoformat(),
+        "commit": _get_commit(),
+        "site": frappe.local.site,
+        "dataset": dataset,
+        "load_time": load_time,
+        "repeat": repeat,
+        "baseline": baseline,
+        "results": results,
+        "regressions": sum(1 for result in results if result["regressions"] or result.get("error")),
+    }
+
+    output = output or frappe.get_site_path(
+        "private", "benchmarks", f"reports-{scale}-{now_datetime().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    payload["output"] = output
+    return payload
+
+
+def get_cases(reports=None):
+    """CASES plus an unfiltered case for every UW Core script report without one."""
+    cases = list(CASES)
+    covered = {report_name for case, report_name, filters in CASES}
+    for report_name in frappe.get_all(
+        "Report", filters={"module": "UW Core", "report_type": "Script Report"}, pluck="name", order_by="name"
+    ):
+        if report_name not in covered:
+            cases.append((frappe.scrub(report_name), report_name, {}))
+
+    if reports:
+        cases = [case for case in cases if case[1] in reports]
+    return cases
+
+
+def get_filter_context():
+    """Values for the filter placeholders, taken from the loaded synthetic data."""
+    from united_way.synthetic import PREFIX
+
+    campaign = frappe.db.get_value(
+        "Campaign", {"name": ("like", f"{PREFIX}%"), "docstatus": 1},
+        ["name", "campaign_year"], order_by="campaign_year desc", as_dict=True,
+    )
+    if not campaign:
+        frappe.throw("No synthetic campaign found. Load a dataset first.")
+
+    return {
+        "campaign": campaign.name,
+        "year": campaign.campaign_year,
+        "employer": frappe.db.get_value(
+            "Organization", {"name": ("like", f"{PREFIX}Employer-%")}, "name", order_by="name asc"
+        ),
+    }
+
+
+def fill_filters(filters, context):
+    return {
+        key: value.format(**context) if isinstance(value, str) else value
+        for key, value in filters.items()
+    }
+
+
+def run_case(report_name, filters, repeat=3):
+    """Warm up once, then time ``repeat`` runs of a report's execute().
+
+    Returns:
+        dict with filters, wall_time (median), queries, rows_examined and rows
+        (the most seen in any run), or error
+    """
+    module = frappe.get_module(get_report_module_dotted_path("UW Core", report_name))
+    runs = []
+    frappe.flags.uw_skip_report_cache = True
+    try:
+        module.execute(frappe._dict(filters))
+        overhead = _counter_delta(_get_counters(), _get_counters())
+
+        for i in range(max(cint(repeat), 1)):
+            before = _get_counters()
+            start = time.perf_counter()
+            result = module.execute(frappe._dict(filters))
+            wall_time = time.perf_counter() - start
+            delta = _counter_delta(before, _get_counters())
+            runs.append({
+                "wall_time": wall_time,
+                "queries": max(delta["queries"] - overhead["queries"], 0),
+                "rows_examined": max(delta["rows_examined"] - overhead["rows_examined"], 0),
+                "rows": len(result[1] or []),
+            })
+    except Exception:
+        frappe.db.rollback()
+        return {"filters": filters, "error": frappe.get_traceback()}
+    finally:
+        frappe.flags.uw_skip_report_cache = False
+
+    return {
+        "filters": filters,
+        "wall_time": round(statistics.median(run["wall_time"] for run in runs), 4),
+        "queries": max(run["queries"] for run in runs),
+        "rows_examined": max(run["rows_examined"] for run in runs),
+        "rows": max(run["rows"] for run in runs),
+    }
+
+
+def check_budget(result, budget, tolerance):
+    """Measures over budget, as a list of "measure: value > budget" strings.
+
+    A missing budget is reported too, as "no budget".
+
+    Args:
+        tolerance: {measure: allowed fraction over budget}
+    """
+    if result.get("error"):
+        return []
+    if not budget:
+        return [NO_BUDGET]
+
+    regressions = []
+    for measure in MEASURES:
+        if budget.get(measure) is None:
+            continue
+        limit = flt(budget[measure]) * (1 + flt(tolerance.get(measure)))
+        if flt(result[measure]) > limit:
+            regressions.append(f"{measure}: {result[measure]} > {budget[measure]}")
+    return regressions
+
+
+def make_budget(result):
+    return {
+        "wall_time": round(result["wall_time"] * HEADROOM["wall_time"], 3),
+        "queries": cint(result["queries"] * HEADROOM["queries"]),
+        "rows_examined": cint(result["rows_examined"] * HEADROOM["rows_examined"]),
+    }
+
+
+def load_budgets():
+    with open(BUDGETS_PATH) as f:
+        budget_file = json.load(f)
+    budget_file.setdefault("tolerance", {})
+    budget_file.setdefault("budgets", {})
+    return budget_file
+
+
+def save_budgets(budget_file):
+    with open(BUDGETS_PATH, "w") as f:
+        json.dump(budget_file, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def get_dataset_counts():
+    from united_way.synthetic import PREFIX
+
+    counts = {
+        doctype: frappe.db.count(doctype, {"name": ("like", f"{PREFIX}%")})
+        for doctype in ("Contact", "Campaign", "Pledge", "Pledge Allocation", "Donation", "Payment Schedule Entry")
+    }
+    counts["Receivable Aging Snapshot"] = frappe.db.count(
+        "Receivable Aging Snapshot", {"campaign": ("like", f"{PREFIX}%")}
+    )
+    return counts
+
+
+def _get_counters():
+    status = {
+        name: cint(value)
+        for name, value in frappe.db.sql(
+            "SHOW SESSION STATUS WHERE Variable_name IN %(names)s",
+            {"names": ("Questions",) + HANDLER_READS},
+        )
+    }
+    return {
+        "queries": status.get("Questions", 0),
+        "rows_examined": sum(status.get(name, 0) for name in HANDLER_READS),
+    }
+
+
+def _counter_delta(before, after):
+    return {key: after[key] - before[key] for key in before}
+
+
+def _get_commit():
+    from frappe.utils.change_log import get_app_last_commit_ref
+
+    try:
+        return get_app_last_commit_ref("united_way")
+    except Exception:
+        return None
@@ -3,6 +3,9 @@ import io
 import frappe
 from frappe.utils import flt, getdate
 
+from united_way import identity_map, rollups
+from united_way.cache import get_organization_directory
+
 
 @frappe.whitelist()
 def process_bulk_pledges(campaign, csv_data):
@@ -19,7 +22,9 @@ def process_bulk_pledges(campaign, csv_data):
         dict with created, errors counts and details
     """
     # Validate campaign exists and is active
-    camp = frappe.get_doc("Campaign", campaign)
+    camp = identity_map.get_header("Campaign", campaign, ["docstatus", "status"])
+    if not camp:
+        frappe.throw(f"Campaign '{campaign}' not found.")
     if camp.docstatus != 1:
         frappe.throw(f"Campaign '{campaign}' is not submitted.")
     if camp.status not in ("Active", "Planning"):
@@ -62,52 +67,55 @@ def process_bulk_pledges(campaign, csv_data):
 
     created = 0
     errors = []
-
-    for i, group in enumerate(pledge_groups, start=1):
-        try:
-            # Validate donor exists
-            if not frappe.db.exists("Contact", group["donor"]):
-                errors.append(f"Row {i}: Donor '{group['donor']}' not found")
-                continue
-
-            # Validate allocations total 100%
-            total_pct = sum(a["percentage"] for a in group["allocations"])
-            if abs(total_pct - 100) > 0.01:
-                errors.append(
-                    f"Row {i}: Donor '{group['donor']}' allocations total {total_pct}%, must be 100%"
-                )
-                continue
-
-            # Validate agencies exist
-            bad_agencies = [
-                a["agency"] for a in group["allocations"]
-                if not frappe.db.exists("Organization", a["agency"])
-            ]
-            if bad_agencies:
-                errors.append(f"Row {i}: Unknown agencies: {', '.join(bad_agencies)}")
-                continue
-
-            pledge = frappe.new_doc("Pledge")
-            pledge.campaign = campaign
-            pledge.donor = group["donor"]
-            pledge.pledge_date = frappe.utils.nowdate()
-            pledge.pledge_amount = group["pledge_amount"]
-            pledge.payment_method = group["payment_method"] or None
-            pledge.payment_frequency = group["payment_frequency"]
-
-            for alloc in group["allocations"]:
-                pledge.append("allocations", {
-                    "agency": alloc["agency"],
-                    "designation_type": alloc["designation_type"],
-                    "percentage": alloc["percentage"],
-                })
-
-            pledge.insert(ignore_permissions=True)
-            pledge.submit()
-            created += 1
-
-        except Exception as e:
-            errors.append(f"Row {i}: Donor '{group.get('donor', '?')}' — {str(e)}")
+    organizations = get_organization_directory()
+
+    # Recalculate campaign and drive totals once for the whole file
+    with rollups.batch():
+        for i, group in enumerate(pledge_groups, start=1):
+            try:
+                # Validate donor exists
+                if not frappe.db.exists("Contact", group["donor"]):
+                    errors.append(f"Row {i}: Donor '{group['donor']}' not found")
+                    continue
+
+                # Validate allocations total 100%
+                total_pct = sum(a["percentage"] for a in group["allocations"])
+                if abs(total_pct - 100) > 0.01:
+                    errors.append(
+                        f"Row {i}: Donor '{group['donor']}' allocations total {total_pct}%, must be 100%"
+                    )
+                    continue
+
+                # Validate agencies exist
+                bad_agencies = [
+                    a["agency"] for a in group["allocations"]
+                    if a["agency"] not in organizations
+                ]
+                if bad_agencies:
+                    errors.append(f"Row {i}: Unknown agencies: {', '.join(bad_agencies)}")
+                    continue
+
+                pledge = frappe.new_doc("Pledge")
+                pledge.campaign = campaign
+                pledge.donor = group["donor"]
+                pledge.pledge_date = frappe.utils.nowdate()
+                pledge.pledge_amount = group["pledge_amount"]
+                pledge.payment_method = group["payment_method"] or None
+                pledge.payment_frequency = group["payment_frequency"]
+
+                for alloc in group["allocations"]:
+                    pledge.append("allocations", {
+                        "agency": alloc["agency"],
+                        "designation_type": alloc["designation_type"],
+                        "percentage": alloc["percentage"],
+                    })
+
+                pledge.insert(ignore_permissions=True)
+                pledge.submit()
+                created += 1
+
+            except Exception as e:
+                errors.append(f"Row {i}: Donor '{group.get('donor', '?')}' — {str(e)}")
 
     frappe.db.commit()
 
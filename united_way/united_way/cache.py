@@ -0,0 +1,116 @@
+"""Per-worker cache of UW Settings and the Organization directory.
+
+Both change rarely but are read on every posting, pledge validate and
+print. Each worker process keeps them in memory, tagged with a version
+number stored in Redis. Saving UW Settings or an Organization bumps the
+version, and every worker reloads on its next request. The version itself
+is read from Redis at most once per request.
+
+Cached values are shared across requests in the worker: treat them as
+read-only.
+"""
+import frappe
+from frappe.utils import cint
+
+ORGANIZATION_FIELDS = [
+    "name", "organization_name", "organization_type", "status", "agency_code",
+    "corporate_match", "match_ratio", "match_cap", "annual_allocation_cap",
+]
+
+# {(site, key): (version, value)}
+_worker_cache = {}
+
+
+def get_settings():
+    """UW Settings as a read-only dict."""
+    return _get("settings", _load_settings)
+
+
+def get_uw_settings():
+    """Jinja method for print formats: ``{% set settings = get_uw_settings() %}``."""
+    return get_settings()
+
+
+def get_organization(name):
+    """Directory entry (ORGANIZATION_FIELDS) for an Organization, or None."""
+    if not name:
+        return None
+    return get_organization_directory().get(name)
+
+
+def get_organization_directory():
+    """{name: directory entry} for every Organization."""
+    return _get("organizations", _load_organizations)
+
+
+def clear_settings_cache():
+    """Invalidate the settings cache on every worker once the transaction commits."""
+    _invalidate("settings")
+
+
+def clear_organization_cache():
+    """Invalidate the Organization directory on every worker once the transaction commits."""
+    _invalidate("organizations")
+
+
+def clear_cache():
+    """clear_cache hook (bench clear-cache, migrate)."""
+    _bump_version("settings")
+    _bump_version("organizations")
+
+
+def _get(key, loader):
+    site = frappe.local.site
+    version = _get_version(key)
+    cached = _worker_cache.get((site, key))
+    if cached and cached[0] == version:
+        return cached[1]
+
+    value = loader()
+    _worker_cache[(site, key)] = (version, value)
+    return value
+
+
+def _get_version(key):
+    """Current version from Redis, read once per request."""
+    versions = getattr(frappe.local, "uw_cache_versions", None)
+    if versions is None:
+        versions = frappe.local.uw_cache_versions = {}
+
+    if key not in versions:
+        redis = frappe.cache()
+        versions[key] = cint(redis.get(redis.make_key(f"uw_cache_version:{key}")))
+
+    return versions[key]
+
+
+def _invalidate(key):
+    # Bump only after commit, so other workers can't reload the old row
+    # under the new version; this worker reloads its own uncommitted view.
+    _forget(key)
+    frappe.db.after_commit.add(lambda: _bump_version(key))
+    frappe.db.after_rollback.add(lambda: _forget(key))
+
+
+def _bump_version(key):
+    redis = frappe.cache()
+    redis.incr(redis.make_key(f"uw_cache_version:{key}"))
+    _forget(key)
+
+
+def _forget(key):
+    versions = getattr(frappe.local, "uw_cache_versions", None)
+    if versions:
+        versions.pop(key, None)
+    _worker_cache.pop((frappe.local.site, key), None)
+
+
+def _load_settings():
+    return frappe._dict(frappe.get_single("UW Settings").as_dict(no_default_fields=True))
+
+
+def _load_organizations():
+    return {
+        org.name: org
+        for org in frappe.get_all("Organization", fields=ORGANIZATION_FIELDS)
+    }
@@ -0,0 +1,218 @@
+import json
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("uw-index-advisor")
+@click.option("--filters", help="Report filters as JSON (default: none, then the latest campaign)")
+@click.option("--min-rows", default=0, type=int, help="Only flag scans estimated at this many rows or more")
+@click.option("--as-json", is_flag=True, default=False, help="Print findings as JSON")
+@pass_context
+def index_advisor(context, filters=None, min_rows=0, as_json=False):
+    """EXPLAIN United Way report, task, permission and API queries and flag full table scans."""
+    import frappe
+    from united_way.index_advisor import run_advisor
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        results = run_advisor(filters=json.loads(filters) if filters else None, min_rows=min_rows)
+    finally:
+        frappe.destroy()
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2, default=str))
+        return
+
+    scans = [r for r in results if not r.get("error")]
+    errors = [r for r in results if r.get("error")]
+
+    for row in scans:
+        click.secho(f"{row['source']}: full scan of {row['table']} (~{row['rows']} rows)", fg="yellow")
+        click.echo(f"    possible keys: {row['possible_keys'] or '-'}")
+        click.echo(f"    {' '.join(row['query'].split())[:300]}")
+
+    for row in errors:
+        click.secho(f"{row['source']}: could not EXPLAIN: {row['error']}", fg="red")
+
+    click.echo(f"{len(scans)} full table scan(s), {len(errors)} query error(s)")
+
+
+@click.command("uw-ensure-indexes")
+@pass_context
+def ensure_indexes(context):
+    """Create the composite indexes declared in united_way.indexes."""
+    import frappe
+    from united_way.indexes import ensure_indexes as _ensure_indexes
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            _ensure_indexes()
+            frappe.db.commit()
+        finally:
+            frappe.destroy()
+
+
+@click.command("uw-journal-outbox")
+@click.option("--replay", is_flag=True, default=False, help="Re-queue Failed rows for posting")
+@click.option("--include-posted", is_flag=True, default=False, help="With --replay, also re-queue Posted rows")
+@click.option("--reference-doctype", help="With --replay, only rows for this DocType")
+@click.option("--reference-name", help="With --replay, only rows for this document")
+@click.option("--drain", is_flag=True, default=False, help="Post pending rows now instead of waiting for the worker")
+@pass_context
+def journal_outbox(context, replay=False, include_posted=False, reference_doctype=None,
+                   reference_name=None, drain=False):
+    """Show the journal entry outbox backlog, and optionally replay or drain it."""
+    import frappe
+    from united_way.journal_outbox import drain_outbox, get_outbox_status, replay_outbox
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            if replay:
+                count = replay_outbox(reference_doctype, reference_name, include_posted=include_posted)
+                frappe.db.commit()
+                click.echo(f"{site}: re-queued {count} outbox row(s)")
+
+            if drain:
+                drain_outbox()
+
+            status = get_outbox_status()
+            click.echo(
+                f"{site}: {status['pending']} pending, {status['failed']} failed, "
+                f"{status['posted']} posted; oldest pending {status['oldest_pending_seconds']}s"
+            )
+        finally:
+            frappe.destroy()
+
+
+@click.command("uw-rebuild-agency-facts")
+@click.option("--campaign", help="Only rebuild this campaign (default: all campaigns)")
+@pass_context
+def rebuild_agency_facts(context, campaign=None):
+    """Rebuild the Agency Campaign Fact table used by agency reports from submitted documents."""
+    import frappe
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+        rebuild_agency_facts as _rebuild_agency_facts,
+    )
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            _rebuild_agency_facts(campaign)
+            frappe.db.commit()
+            count = frappe.db.count("Agency Campaign Fact", {"campaign": campaign} if campaign else None)
+            click.echo(f"{site}: rebuilt {count} agency fact row(s)")
+        finally:
+            frappe.destroy()
+
+
+@click.command("uw-generate-synthetic")
+@click.option("--scale", type=click.Choice(["10k", "100k", "1m"]), help="Start from a preset size")
+@click.option("--seed", type=int, help="Random seed (same parameters and seed, same data)")
+@click.option("--agencies", type=int, help="Member agencies")
+@click.option("--employers", type=int, help="Corporate donors")
+@click.option("--contacts", type=int, help="Individual donors")
+@click.option("--campaigns", type=int, help="Campaigns, one per year")
+@click.option("--pledges-per-campaign", type=int, help="Pledges in each campaign")
+@click.option("--max-allocations", type=int, help="Most agencies a pledge is split across")
+@click.option("--donations-per-pledge", type=int, help="Average donations per installment pledge")
+@click.option("--frequency-mix", help='Payment frequency weights as JSON, e.g. {"One-Time": 1, "Monthly": 3}')
+@click.option("--with-schedules", is_flag=True, default=None, help="Also write payment schedule entries")
+@click.option("--aging-snapshots", type=int, help="Month-end aging snapshots to take after loading (with schedules)")
+@click.option("--purge", is_flag=True, default=False, help="Only delete previously generated data")
+@pass_context
+def generate_synthetic(context, scale=None, frequency_mix=None, purge=False, **params):
+    """Bulk-load deterministic SYN- test data and rebuild the rollups once."""
+    import time
+
+    import frappe
+    from united_way import synthetic
+
+    if frequency_mix:
+        params["frequency_mix"] = json.loads(frequency_mix)
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            start = time.monotonic()
+            if purge:
+                synthetic.purge()
+                click.echo(f"{site}: purged synthetic data")
+                continue
+
+            counts = synthetic.generate(scale=scale, **params)
+            for doctype, count in counts.items():
+                click.echo(f"{site}: {count} {doctype}")
+            click.echo(f"{site}: done in {time.monotonic() - start:.0f}s")
+        finally:
+            frappe.destroy()
+
+
+@click.command("uw-benchmark-reports")
+@click.option("--scale", "scales", multiple=True, type=click.Choice(["10k", "100k", "1m"]),
+              help="Dataset size to benchmark (repeatable, default 10k)")
+@click.option("--skip-load", is_flag=True, default=False, help="Use the synthetic data already loaded")
+@click.option("--repeat", default=3, type=int, help="Measured runs per report case")
+@click.option("--report", "reports", multiple=True, help="Only benchmark this report (repeatable)")
+@click.option("--update-budgets", is_flag=True, default=False, help="Store the measurements as new budgets")
+@click.option("--output", help="Results JSON path (default: the site's private/benchmarks folder)")
+@pass_context
+def benchmark_reports(context, scales=(), skip_load=False, repeat=3, reports=(), update_budgets=False, output=None):
+    """Time every UW Core report on synthetic data and fail on budget regressions."""
+    import frappe
+    from united_way.benchmark import run_benchmarks
+
+    if output and len(scales) > 1:
+        raise click.UsageError("--output can only be used with a single --scale")
+
+    regressions = 0
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        for scale in scales or ("10k",):
+            payload = run_benchmarks(
+                scale, load=not skip_load, repeat=repeat, reports=reports,
+                update_budgets=update_budgets, output=output,
+            )
+            for result in payload["results"]:
+                if result.get("error"):
+                    click.secho(f"{scale} {result['case']}: error", fg="red")
+                    click.echo(result["error"])
+                    continue
+
+                line = (f"{scale} {result['case']}: {result['wall_time']:.3f}s, "
+                        f"{result['queries']} queries, {result['rows_examined']} rows examined")
+                if payload["baseline"]:
+                    click.secho(f"{line} -- recorded as baseline", fg="yellow")
+                elif not result["budget"]:
+                    click.secho(f"{line} -- no budget (record one with --update-budgets)", fg="red")
+                elif result["regressions"]:
+                    click.secho(f"{line} -- over budget: {'; '.join(result['regressions'])}", fg="red")
+                else:
+                    click.echo(line)
+
+            regressions += payload["regressions"]
+            if payload["baseline"]:
+                click.secho(f"{scale}: no budgets yet; baseline saved to benchmark_budgets.json, commit it", fg="yellow")
+            click.echo(f"{scale}: results written to {payload['output']}")
+    finally:
+        frappe.destroy()
+
+    if regressions and not update_budgets:
+        click.secho(f"{regressions} report case(s) over budget, without a budget or failing", fg="red")
+        raise SystemExit(1)
+
+
+commands = [
+    index_advisor, ensure_indexes, journal_outbox, rebuild_agency_facts, generate_synthetic,
+    benchmark_reports,
+]
@@ -0,0 +1,180 @@
+"""Chunked, resumable Donation creation for Remittance and Batch Deposit.
+
+Both doctypes create (on submit) or cancel (on cancel) one Donation per item
+row. Small documents do this inline, inside the submit request. Documents
+with more items than UW Settings > Background Submission Threshold are
+handed to a background job that works through the items in chunks:
+
+- each chunk runs inside one rollups.batch() and is committed on its own
+- the last processed item idx is checkpointed in ``processed_items``
+- item -> donation links are written with one UPDATE per chunk
+- progress is published to the open form
+
+If the job fails, the parent is marked Failed and ``resume_item_processing``
+picks up again after the last committed checkpoint. A document cannot be
+cancelled while its submit job is Queued or In Progress (see
+``before_cancel``), and a job whose action no longer matches the
+document's docstatus does nothing.
+
+The parent controller provides ``make_donation(item)`` (returns the new
+Donation name) and ``cancel_donation(item)``.
+"""
+import frappe
+from frappe.utils import cint
+
+from united_way import rollups
+from united_way.cache import get_settings
+from united_way.utils import bulk_update
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def process_or_enqueue(doc, action):
+    """Create ("submit") or cancel ("cancel") the Donations for a document's items.
+
+    Runs inline for small documents, otherwise enqueues process_items().
+    """
+    threshold = cint(get_settings().background_item_threshold)
+
+    if not threshold or len(doc.items) <= threshold:
+        _process_chunks(doc, action, in_background=False)
+        return
+
+    doc.db_set({
+        "processing_status": "Queued",
+        "processed_items": 0,
+        "processing_error": None,
+    })
+    _enqueue(doc.doctype, doc.name, action)
+
+    frappe.msgprint(
+        f"{len(doc.items)} items will be processed in the background. "
+        "Progress is shown on this form.",
+        title="Processing Donations",
+        indicator="blue",
+    )
+
+
+# docstatus a document must have for each action's job to run
+ACTION_DOCSTATUS = {"submit": 1, "cancel": 2}
+
+
+def before_cancel(doc, method=None):
+    """Refuse to cancel while the submit job is still creating Donations (doc_events hook)."""
+    if doc.processing_status in ("Queued", "In Progress"):
+        frappe.throw(
+            f"{doc.doctype} {doc.name} cannot be cancelled while its donations are being processed "
+            f"(status: {doc.processing_status}). Try again once processing has finished."
+        )
+
+
+def process_items(doctype, name, action):
+    """Background job entry point. Safe to run again after a failure."""
+    doc = frappe.get_doc(doctype, name)
+    if doc.docstatus != ACTION_DOCSTATUS[action]:
+        return
+
+    try:
+        _process_chunks(doc, action, in_background=True)
+    except Exception:
+        frappe.db.rollback()
+        error = frappe.get_traceback()
+        doc.db_set({
+            "processing_status": "Failed",
+            "processing_error": error.strip().splitlines()[-1],
+        }, update_modified=False)
+        frappe.db.commit()
+        frappe.log_error(error, f"{doctype} Donation Processing Error")
+        _publish_progress(doc, action, doc.processed_items)
+
+
+@frappe.whitelist()
+def resume_item_processing(doctype, name):
+    """Re-enqueue a failed or interrupted submit/cancel job from its last checkpoint."""
+    if doctype not in ("Remittance", "Batch Deposit"):
+        frappe.throw(f"Donation processing is not supported for {doctype}.")
+
+    doc = frappe.get_doc(doctype, name)
+    doc.check_permission("cancel" if doc.docstatus == 2 else "submit")
+
+    if doc.processing_status not in ("Failed", "Queued", "In Progress"):
+        frappe.throw(f"{doctype} {name} has no pending donation processing.")
+
+    action = "cancel" if doc.docstatus == 2 else "submit"
+    doc.db_set({"processing_status": "Queued", "processing_error": None})
+    _enqueue(doctype, name, action)
+
+
+def _enqueue(doctype, name, action):
+    frappe.enqueue(
+        "united_way.donation_batches.process_items",
+        queue="long",
+        timeout=3600,
+        # Per action, so a cancel is never deduplicated against a pending submit
+        job_id=f"uw_donation_items::{doctype}::{name}::{action}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        doctype=doctype,
+        name=name,
+        action=action,
+    )
+
+
+def _process_chunks(doc, action, in_background):
+    chunk_size = cint(get_settings().item_chunk_size) or DEFAULT_CHUNK_SIZE
+    checkpoint = cint(doc.processed_items) if in_background else 0
+    child_doctype = doc.meta.get_field("items").options
+
+    pending = [
+        item for item in doc.items
+        if item.idx > checkpoint and (not item.donation if action == "submit" else item.donation)
+    ]
+
+    if in_background:
+        doc.db_set("processing_status", "In Progress", update_modified=False)
+        frappe.db.commit()
+
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        links = {}
+
+        with rollups.batch():
+            for item in chunk:
+                if action == "submit":
+                    item.donation = doc.make_donation(item)
+                else:
+                    doc.cancel_donation(item)
+                    item.donation = None
+                links[item.name] = {"donation": item.donation}
+
+        bulk_update(child_doctype, links, chunk_size=len(chunk))
+        doc.db_set({
+            "processed_items": chunk[-1].idx,
+            "donations_created": sum(1 for item in doc.items if item.donation),
+        }, update_modified=False)
+
+        if in_background:
+            frappe.db.commit()
+            _publish_progress(doc, action, chunk[-1].idx)
+
+    doc.db_set({
+        "processing_status": "Completed",
+        "processed_items": len(doc.items),
+        "donations_created": sum(1 for item in doc.items if item.donation),
+    }, update_modified=False)
+
+    if in_background:
+        frappe.db.commit()
+        _publish_progress(doc, action, len(doc.items))
+
+
+def _publish_progress(doc, action, processed):
+    total = len(doc.items) or 1
+    verb = "Creating" if action == "submit" else "Cancelling"
+    frappe.publish_progress(
+        processed * 100 / total,
+        title=f"{verb} Donations",
+        doctype=doc.doctype,
+        docname=doc.name,
+        description=f"{processed} of {total} items processed",
+    )
@@ -21,19 +21,56 @@ doc_events = {
         "validate": "united_way.uw_core.doctype.pledge.pledge.validate_pledge",
         "on_submit": "united_way.uw_core.doctype.pledge.pledge.on_submit_pledge",
         "on_cancel": "united_way.uw_core.doctype.pledge.pledge.on_cancel_pledge",
+        "on_change": "united_way.identity_map.forget_doc",
+        "on_trash": "united_way.identity_map.forget_doc",
     },
     "Donation": {
         "validate": "united_way.uw_core.doctype.donation.donation.validate_donation",
         "on_submit": "united_way.uw_core.doctype.donation.donation.on_submit_donation",
     },
+    # No cancelling while a background job is still creating the donations
+    "Remittance": {
+        "before_cancel": "united_way.donation_batches.before_cancel",
+    },
+    "Batch Deposit": {
+        "before_cancel": "united_way.donation_batches.before_cancel",
+    },
+    # Keep the request-scoped identity map in step with saves
+    "Contact": {
+        "on_change": "united_way.identity_map.forget_doc",
+        "on_trash": "united_way.identity_map.forget_doc",
+    },
+    "Campaign": {
+        "on_change": [
+            "united_way.identity_map.forget_doc",
+            "united_way.reporting.bump_doc_campaign",
+        ],
+        "on_trash": "united_way.identity_map.forget_doc",
+    },
+    # Cached campaign reports (Executive Summary) follow drive edits
+    "Campaign Drive": {
+        "on_change": "united_way.reporting.bump_doc_campaign",
+        "on_trash": "united_way.reporting.bump_doc_campaign",
+    },
 }
 
 # Scheduled Tasks (like Salesforce Scheduled Apex)
 # --------------------------------------------------------------------------
 scheduler_events = {
+    "cron": {
+        # Safety net; submits also enqueue the drain after they commit
+        "* * * * *": [
+            "united_way.tasks.drain_journal_entry_outbox",
+        ],
+    },
     "daily": [
         "united_way.tasks.daily_pledge_reminders",
         "united_way.tasks.mark_overdue_payment_schedules",
+        "united_way.tasks.snapshot_receivable_aging",
+        "united_way.tasks.reconcile_campaign_totals",
+        "united_way.tasks.reconcile_agency_facts",
+        "united_way.tasks.purge_journal_entry_outbox",
+        "united_way.tasks.extend_fiscal_dates",
     ],
     "weekly": [
         "united_way.tasks.weekly_campaign_summary",
@@ -47,6 +84,16 @@ scheduler_events = {
 # --------------------------------------------------------------------------
 after_install = "united_way.setup.after_install"
 
+# Composite indexes that doctype JSON can't declare (see united_way/indexes.py),
+# and the Fiscal Date rows reports group by (see united_way/periods.py)
+after_migrate = [
+    "united_way.indexes.ensure_indexes",
+    "united_way.uw_core.doctype.fiscal_date.fiscal_date.ensure_fiscal_dates",
+]
+
+# Invalidate the per-worker settings / Organization cache on bench clear-cache
+clear_cache = "united_way.cache.clear_cache"
+
 # Website / Portal
 # --------------------------------------------------------------------------
 # website_generators = ["Campaign"]
@@ -56,6 +103,7 @@ after_install = "united_way.setup.after_install"
 jinja = {
     "methods": [
         "united_way.utils.format_currency_short",
+        "united_way.cache.get_uw_settings",
     ],
 }
 
@@ -0,0 +1,87 @@
+"""Request-scoped identity map for Pledge, Contact and Campaign reads.
+
+A single donation submit used to load the same Pledge, Contact and
+Campaign several times across the hook chain, each time with every child
+table. Hooks and helpers read through this module instead:
+
+``get_header`` / ``get_headers`` read only the parent columns they ask
+for (no child tables), and remember them for the rest of the request.
+
+Everything is dropped on commit or rollback. Saving a cached doctype
+(on_change / on_trash hooks) and the rollup flushes, which update rows
+with SQL, forget the affected names.
+"""
+import frappe
+
+
+def get_header(doctype, name, fields):
+    """Parent-table columns of one record as a dict, or None if it doesn't exist."""
+    if not name:
+        return None
+    return get_headers(doctype, [name], fields).get(name)
+
+
+def get_headers(doctype, names, fields):
+    """Parent-table columns for many records with at most one query.
+
+    Returns:
+        {name: frappe._dict(fields)} for the names that exist
+    """
+    store = _get_store()
+    fields = list(fields)
+    result = {}
+    missing = []
+
+    for name in set(filter(None, names)):
+        header = store.headers.get((doctype, name))
+        if header is not None and all(field in header for field in fields):
+            result[name] = header
+        else:
+            missing.append(name)
+
+    if missing:
+        # Fetch the union of fields already seen for these rows, so that a
+        # second caller asking for a different column set hits the map
+        wanted = set(fields)
+        for name in missing:
+            wanted.update(store.headers.get((doctype, name), {}))
+        wanted.discard("name")
+
+        for row in frappe.get_all(
+            doctype,
+            filters={"name": ["in", missing]},
+            fields=["name"] + sorted(wanted),
+        ):
+            store.headers[(doctype, row.name)] = row
+            result[row.name] = row
+
+    return result
+
+
+def forget(doctype, names=None):
+    """Drop cached headers for some (or all) records of a doctype."""
+    store = getattr(frappe.local, "uw_identity_map", None)
+    if not store:
+        return
+
+    names = set(names) if names is not None else None
+    for key in [k for k in store.headers if k[0] == doctype and (names is None or k[1] in names)]:
+        del store.headers[key]
+
+
+def forget_doc(doc, method=None):
+    """doc_events hook: a cached record was saved or deleted."""
+    forget(doc.doctype, [doc.name])
+
+
+def clear():
+    frappe.local.uw_identity_map = None
+
+
+def _get_store():
+    store = getattr(frappe.local, "uw_identity_map", None)
+    if store is None:
+        store = frappe.local.uw_identity_map = frappe._dict(headers={})
+        frappe.db.after_commit.add(clear)
+        frappe.db.after_rollback.add(clear)
+    return store
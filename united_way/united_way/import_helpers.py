@@ -83,7 +83,7 @@ def import_contacts_from_csv(filepath):
         try:
             doc = frappe.new_doc("Contact")
             for field in [
-                "first_name", "last_name", "organization", "title",
+                "first_name", "last_name", "organization", "employee_id", "department", "title",
                 "contact_type", "status", "email", "phone", "mobile",
                 "preferred_contact_method", "street_address", "street_address_2",
                 "city", "state", "zip_code",
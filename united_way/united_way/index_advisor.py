@@ -0,0 +1,284 @@
+"""EXPLAIN the app's queries against the current site and flag full table scans.
+
+Queries are collected from two places:
+
+- Script reports under uw_core/report are executed (in a transaction that
+  is rolled back) and every SELECT they issue is captured.
+- tasks.py, permissions.py and api.py are parsed, since running them would
+  send emails or depend on a session. ``frappe.db.sql`` string literals,
+  ``frappe.get_all``-style calls and permission query conditions are
+  rebuilt as SQL with an empty string in place of each runtime value.
+
+Used by the ``uw-index-advisor`` bench command.
+"""
+import ast
+import glob
+import importlib
+import inspect
+import os
+import re
+from contextlib import contextmanager
+
+import frappe
+
+STATIC_MODULES = ["united_way.tasks", "united_way.permissions", "united_way.api"]
+
+LIST_CALLS = {"frappe.get_all", "frappe.get_list", "frappe.db.get_all", "frappe.db.get_list"}
+VALUE_CALLS = {"frappe.db.get_value", "frappe.db.count", "frappe.db.exists"}
+
+_PLACEHOLDER_IN = re.compile(r"\bIN\s+%(\(\w+\))?s", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%(\(\w+\))?s")
+
+
+def run_advisor(filters=None, min_rows=0):
+    """Collect and EXPLAIN the app's queries.
+
+    Args:
+        filters: Report filters to use instead of the defaults
+        min_rows: Only flag scans estimated to read at least this many rows
+
+    Returns:
+        list of dicts with source, query and, per finding, table, type,
+        key and rows (or an error)
+    """
+    queries = collect_report_queries(filters) + collect_static_queries()
+
+    results = []
+    seen = set()
+    for source, query in queries:
+        key = " ".join(query.split())
+        if key in seen:
+            continue
+        seen.add(key)
+        results.extend(explain(source, query, min_rows))
+
+    return results
+
+
+def explain(source, query, min_rows=0):
+    """EXPLAIN one query and return its full-scan findings."""
+    try:
+        plan = frappe.db.sql(f"EXPLAIN {query}", as_dict=True)
+    except Exception as e:
+        frappe.db.rollback()
+        return [{"source": source, "query": query, "error": str(e)}]
+
+    findings = []
+    for row in plan:
+        table = row.get("table") or ""
+        # Derived tables and subquery results are always scanned
+        if row.get("type") != "ALL" or table.startswith("<"):
+            continue
+        if (row.get("rows") or 0) < min_rows:
+            continue
+
+        findings.append({
+            "source": source,
+            "query": query,
+            "table": table,
+            "type": row.get("type"),
+            "possible_keys": row.get("possible_keys"),
+            "key": row.get("key"),
+            "rows": row.get("rows"),
+        })
+
+    return findings
+
+
+def collect_report_queries(filters=None):
+    """Run every script report and capture the SELECTs it issues."""
+    filter_sets = [filters] if filters else _default_report_filters()
+    report_dir = frappe.get_app_path("united_way", "uw_core", "report")
+
+    queries = []
+    for path in sorted(glob.glob(os.path.join(report_dir, "*", "*.py"))):
+        report = os.path.basename(os.path.dirname(path))
+        if os.path.basename(path) != f"{report}.py":
+            continue
+
+        module = importlib.import_module(f"united_way.uw_core.report.{report}.{report}")
+        for report_filters in filter_sets:
+            captured = []
+            try:
+                with _capture_selects(captured):
+                    module.execute(frappe._dict(report_filters))
+            except Exception:
+                frappe.logger().warning(f"Index advisor could not run report {report} with {report_filters}")
+            finally:
+                frappe.db.rollback()
+
+            queries.extend((f"report:{report}", query) for query in captured)
+
+    return queries
+
+
+def collect_static_queries(module_names=None):
+    """Rebuild the queries in module source without running it."""
+    queries = []
+    for module_name in module_names or STATIC_MODULES:
+        module = importlib.import_module(module_name)
+        tree = ast.parse(inspect.getsource(module))
+        source_file = module_name.rsplit(".", 1)[-1] + ".py"
+
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
+
+            query = _query_for_call(node)
+            if query:
+                queries.append((f"{source_file}:{node.lineno}", query))
+
+    queries.extend(_permission_queries())
+    return queries
+
+
+def _default_report_filters():
+    filter_sets = [{}]
+    campaign = frappe.get_all(
+        "Campaign",
+        filters={"docstatus": 1},
+        fields=["name", "campaign_year", "start_date", "end_date"],
+        order_by="start_date desc",
+        limit=1,
+    )
+    if campaign:
+        campaign = campaign[0]
+        filter_sets.append({
+            "campaign": campaign.name,
+            "campaign_year": campaign.campaign_year,
+            "from_date": campaign.start_date,
+            "to_date": campaign.end_date,
+        })
+    return filter_sets
+
+
+@contextmanager
+def _capture_selects(captured):
+    """Record the final SQL of every SELECT run through frappe.db.sql."""
+    original = frappe.db.sql
+
+    def sql(query, *args, **kwargs):
+        result = original(query, *args, **kwargs)
+        if str(query).lstrip().upper().startswith("SELECT"):
+            captured.append(str(frappe.db.last_query))
+        return result
+
+    frappe.db.sql = sql
+    # Cached report results would hide the queries behind them
+    frappe.flags.uw_skip_report_cache = True
+    try:
+        yield captured
+    finally:
+        frappe.db.sql = original
+        frappe.flags.uw_skip_report_cache = False
+
+
+def _query_for_call(node):
+    name = _dotted_name(node.func)
+
+    try:
+        if name == "frappe.db.sql" and node.args:
+            sql = _string_value(node.args[0])
+            if sql and sql.lstrip().upper().startswith("SELECT"):
+                return _fill_placeholders(sql)
+
+        elif name in LIST_CALLS and node.args:
+            doctype = _literal(node.args[0])
+            kwargs = {kw.arg: _literal(kw.value) for kw in node.keywords if kw.arg}
+            filters = kwargs.get("filters") or (_literal(node.args[1]) if len(node.args) > 1 else None)
+            return frappe.get_all(
+                doctype,
+                filters=filters,
+                fields=kwargs.get("fields") or ["name"],
+                order_by=kwargs.get("order_by") or None,
+                ignore_permissions=True,
+                run=0,
+            )
+
+        elif name in VALUE_CALLS and node.args:
+            doctype = _literal(node.args[0])
+            filters = _literal(node.args[1]) if len(node.args) > 1 else None
+            if not isinstance(filters, dict):
+                filters = {"name": ""}
+            fieldname = _literal(node.args[2]) if len(node.args) > 2 else "name"
+            return frappe.get_all(
+                doctype,
+                filters=filters,
+                fields=[fieldname if isinstance(fieldname, str) and fieldname else "name"],
+                ignore_permissions=True,
+                limit=1,
+                run=0,
+            )
+    except Exception:
+        return None
+
+
+def _permission_queries():
+    """Rebuild each permission_query_conditions hook as a list query."""
+    queries = []
+    hooks = frappe.get_hooks("permission_query_conditions", app_name="united_way")
+
+    for doctype, methods in hooks.items():
+        for method in methods if isinstance(methods, list) else [methods]:
+            function = frappe.get_attr(method)
+            tree = ast.parse(inspect.getsource(function).lstrip())
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Return) and node.value is not None:
+                    condition = _condition_template(node.value)
+                    if condition:
+                        queries.append((
+                            f"permissions.py:{function.__name__}",
+                            f"SELECT `tab{doctype}`.name FROM `tab{doctype}` WHERE {condition}",
+                        ))
+    return queries
+
+
+def _condition_template(node):
+    """Turn ``"... {0}".format(frappe.db.escape(x))`` into SQL with ''."""
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "format"
+        and isinstance(node.func.value, ast.Constant)
+    ):
+        return re.sub(r"\{\w*\}", "''", node.func.value.value)
+    return _string_value(node) or None
+
+
+def _dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+    return ".".join(reversed(parts))
+
+
+def _string_value(node):
+    """Constant strings as-is; f-strings with each interpolation left empty."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(
+            part.value if isinstance(part, ast.Constant) else ""
+            for part in node.values
+        )
+    return None
+
+
+def _literal(node):
+    """Evaluate a literal, using an empty string for runtime values."""
+    if isinstance(node, ast.Dict):
+        return {_literal(k): _literal(v) for k, v in zip(node.keys, node.values)}
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(element) for element in node.elts]
+    try:
+        return ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError):
+        return ""
+
+
+def _fill_placeholders(sql):
+    sql = _PLACEHOLDER_IN.sub("IN ('')", sql)
+    return _PLACEHOLDER.sub("''", sql).replace("%%", "%")
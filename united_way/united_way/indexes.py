@@ -0,0 +1,46 @@
+"""Composite indexes maintained by the app.
+
+Doctype JSON can only declare single-column ``search_index`` fields, so the
+multi-column indexes our hot queries rely on are declared here and created
+by ``ensure_indexes`` after every migrate. ``frappe.db.add_index`` skips
+indexes that already exist, so this is cheap to run repeatedly.
+
+Run ``bench --site <site> uw-index-advisor`` to EXPLAIN the app's queries
+and find candidates for this list.
+"""
+import frappe
+
+INDEXES = [
+    # Pledge collection rollups
+    ("Donation", ["pledge", "docstatus"]),
+    # Donor giving stats, giving history, latest donation lookup
+    ("Donation", ["donor", "docstatus", "donation_date"]),
+    # Campaign totals and reports
+    ("Donation", ["campaign", "docstatus"]),
+    ("Pledge", ["campaign", "docstatus"]),
+    ("Pledge", ["donor", "campaign"]),
+    # Agency reports and Agency Admin permission queries
+    ("Pledge Allocation", ["agency"]),
+    # Overdue schedule task and aging report
+    ("Payment Schedule Entry", ["status", "due_date"]),
+    # Portal and permission lookups by session user
+    ("Contact", ["email"]),
+    # Donor Giving History: donation aggregate per (donor, campaign) and its filters
+    ("Donation", ["donor", "campaign", "docstatus"]),
+    ("Pledge", ["docstatus", "pledge_date"]),
+    ("Contact", ["organization"]),
+    ("Contact", ["donor_level"]),
+    # Executive Summary new-donor anti-join
+    ("Campaign Donor", ["donor"]),
+    # Agency reports filtered by agency across campaigns
+    ("Agency Campaign Fact", ["agency", "period"]),
+    # Journal entry outbox drain and its idempotency check
+    ("Journal Entry Outbox", ["status", "next_attempt"]),
+    ("UW Journal Entry", ["reference_name", "entry_type"]),
+]
+
+
+def ensure_indexes():
+    """Create any declared index that is missing (after_migrate hook)."""
+    for doctype, fields in INDEXES:
+        frappe.db.add_index(doctype, fields)
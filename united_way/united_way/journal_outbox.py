@@ -0,0 +1,255 @@
+"""Transactional outbox for UW Journal Entry postings.
+
+Submits don't write journal entries. They record the entries they want
+posted in ``Journal Entry Outbox``, inside the submit's own transaction, so
+a posting can't be lost and can't exist for a submit that rolled back.
+``drain_outbox`` (enqueued after commit and run every minute as a safety
+net) posts pending rows in batches through accounting.post_journal_entries.
+
+Postings are idempotent on (reference_doctype, reference_name, entry_type):
+the outbox has a unique key on it, and a row whose entries already exist in
+UW Journal Entry is marked Posted without posting again. Drains claim their
+rows with SELECT ... FOR UPDATE SKIP LOCKED, so the enqueued job and the
+per-minute task never post the same row, and each posted entry carries a
+unique posting_key derived from its outbox row as a last line of defence. Failed rows are
+retried with backoff and stay in the outbox, with the error, once retries
+run out, until ``replay_outbox`` re-queues them.
+"""
+import json
+
+import frappe
+from frappe.utils import add_to_date, cint, flt, now, now_datetime
+
+BATCH_SIZE = 500
+MAX_ATTEMPTS = 8
+BACKLOG_WARNING = 5000
+
+
+def add_to_outbox(entries):
+    """Record journal entry dicts for posting, one outbox row per reference and entry type.
+
+    Does nothing if journal entry creation is disabled in UW Settings.
+    """
+    from united_way.accounting import should_create_journal_entries
+
+    if not entries or not should_create_journal_entries():
+        return
+
+    rows = {}
+    for entry in entries:
+        key = (entry.get("reference_doctype"), entry.get("reference_name"), entry.get("entry_type"))
+        rows.setdefault(key, []).append(entry)
+
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Journal Entry Outbox",
+        fields=["name", "creation", "modified", "owner", "modified_by",
+                "reference_doctype", "reference_name", "entry_type", "status", "attempts", "payload"],
+        values=[
+            (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+             reference_doctype, reference_name, entry_type, "Pending", 0,
+             json.dumps(group, default=str))
+            for (reference_doctype, reference_name, entry_type), group in rows.items()
+        ],
+        ignore_duplicates=True,
+    )
+
+    _schedule_drain()
+
+
+def drain_outbox(batch_size=BATCH_SIZE):
+    """Post pending outbox rows until the backlog is empty (background job)."""
+    from united_way.accounting import get_posting_settings
+
+    # Rows were only recorded while posting was enabled, so post them even
+    # if the setting has been switched off since
+    settings = get_posting_settings()
+    settings.auto_create_journal_entries = 1
+
+    while True:
+        rows = _claim_rows(batch_size=batch_size)
+        if not rows:
+            break
+
+        try:
+            _post_rows(rows, settings)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            # Post one row at a time so a single bad row doesn't hold up the rest.
+            # The rollback released the claim, so each row is claimed again.
+            for row in rows:
+                if not _claim_rows(name=row.name):
+                    continue
+                try:
+                    _post_rows([row], settings)
+                    frappe.db.commit()
+                except Exception:
+                    frappe.db.rollback()
+                    _record_failure(row, frappe.get_traceback())
+                    frappe.db.commit()
+
+        if len(rows) < batch_size:
+            break
+
+    backlog = get_outbox_status()
+    if backlog["pending"] > BACKLOG_WARNING:
+        frappe.logger().warning(f"Journal entry outbox backlog: {backlog}")
+
+
+def get_outbox_status():
+    """Backlog depth: row counts by status and age of the oldest pending row."""
+    counts = dict(frappe.db.sql("""
+        SELECT status, COUNT(*) FROM `tabJournal Entry Outbox` GROUP BY status
+    """))
+    oldest = frappe.db.sql("""
+        SELECT MIN(creation) FROM `tabJournal Entry Outbox` WHERE status = 'Pending'
+    """)[0][0]
+
+    return {
+        "pending": cint(counts.get("Pending")),
+        "failed": cint(counts.get("Failed")),
+        "posted": cint(counts.get("Posted")),
+        "oldest_pending": oldest,
+        "oldest_pending_seconds": int((now_datetime() - oldest).total_seconds()) if oldest else 0,
+    }
+
+
+def replay_outbox(reference_doctype=None, reference_name=None, include_posted=False):
+    """Re-queue failed outbox rows (and optionally posted ones) for posting.
+
+    Replaying a Posted row is safe: it is skipped if its journal entries
+    still exist, and re-posted if they were deleted.
+
+    Returns:
+        number of rows re-queued
+    """
+    statuses = ["Failed", "Posted"] if include_posted else ["Failed"]
+    filters = {"status": ["in", statuses]}
+    if reference_doctype:
+        filters["reference_doctype"] = reference_doctype
+    if reference_name:
+        filters["reference_name"] = reference_name
+
+    names = frappe.get_all("Journal Entry Outbox", filters=filters, pluck="name")
+    if names:
+        frappe.db.sql("""
+            UPDATE `tabJournal Entry Outbox`
+            SET status = 'Pending', attempts = 0, next_attempt = NULL, last_error = NULL
+            WHERE name IN %s
+        """, (tuple(names),))
+        _schedule_drain()
+
+    return len(names)
+
+
+def purge_posted(days=30):
+    """Delete Posted outbox rows older than ``days`` (daily task)."""
+    frappe.db.sql("""
+        DELETE FROM `tabJournal Entry Outbox`
+        WHERE status = 'Posted' AND posted_on < %s
+    """, add_to_date(now_datetime(), days=-days))
+
+
+def _claim_rows(batch_size=BATCH_SIZE, name=None):
+    """Lock due Pending rows until the transaction ends.
+
+    Rows locked by another drain are skipped rather than waited for, so
+    concurrent drains split the backlog instead of posting it twice.
+    """
+    condition = "AND name = %(name)s" if name else ""
+    return frappe.db.sql(f"""
+        SELECT name, reference_doctype, reference_name, entry_type, attempts, payload
+        FROM `tabJournal Entry Outbox`
+        WHERE status = 'Pending' AND (next_attempt IS NULL OR next_attempt <= %(now)s) {condition}
+        ORDER BY creation
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    """, {"now": now(), "name": name, "limit": batch_size}, as_dict=True)
+
+
+def _post_rows(rows, settings):
+    from united_way.accounting import post_journal_entries, summarize_journal_entries
+
+    existing = _existing_postings(rows)
+    entries = []
+    owners = []
+
+    for row in rows:
+        key = (row.reference_doctype, row.reference_name, row.entry_type)
+        if key in existing:
+            continue
+
+        row_entries = [frappe._dict(entry) for entry in json.loads(row.payload or "[]")]
+        if settings.journal_entry_summary_mode:
+            row_entries = summarize_journal_entries(row_entries)
+        # post_journal_entries skips zero amounts; drop them here so names line up
+        row_entries = [entry for entry in row_entries if flt(entry.amount)]
+        for i, entry in enumerate(row_entries):
+            entry.posting_key = f"{row.reference_doctype}:{row.reference_name}:{row.entry_type}:{i}"
+        entries.extend(row_entries)
+        owners.extend([row.name] * len(row_entries))
+
+    names = post_journal_entries(entries, settings=settings, summarize=False) if entries else []
+
+    posted = {row.name: [] for row in rows}
+    for owner, name in zip(owners, names):
+        posted[owner].append(name)
+
+    timestamp = now()
+    for row in rows:
+        frappe.db.set_value("Journal Entry Outbox", row.name, {
+            "status": "Posted",
+            "posted_on": timestamp,
+            "attempts": cint(row.attempts) + 1,
+            "journal_entries": "\n".join(posted[row.name]) or None,
+            "last_error": None,
+        }, update_modified=False)
+
+
+def _existing_postings(rows):
+    """(reference_doctype, reference_name, entry_type) keys that already have entries."""
+    names = tuple(row.reference_name for row in rows)
+    return {
+        (row.reference_doctype, row.reference_name, row.entry_type)
+        for row in frappe.db.sql("""
+            SELECT DISTINCT reference_doctype, reference_name, entry_type
+            FROM `tabUW Journal Entry`
+            WHERE reference_name IN %s
+        """, (names,), as_dict=True)
+    }
+
+
+def _record_failure(row, error):
+    attempts = cint(row.attempts) + 1
+    frappe.db.set_value("Journal Entry Outbox", row.name, {
+        "status": "Failed" if attempts >= MAX_ATTEMPTS else "Pending",
+        "attempts": attempts,
+        "next_attempt": add_to_date(now_datetime(), minutes=min(2 ** attempts, 60)),
+        "last_error": error.strip().splitlines()[-1],
+    }, update_modified=False)
+
+    if attempts >= MAX_ATTEMPTS:
+        frappe.log_error(error, f"Journal Entry Outbox: {row.reference_doctype} {row.reference_name}")
+
+
+def _schedule_drain():
+    """Enqueue the drain job once per request, after the submit commits."""
+    if getattr(frappe.local, "uw_outbox_drain_scheduled", False):
+        return
+
+    frappe.local.uw_outbox_drain_scheduled = True
+    frappe.db.after_commit.add(_reset_drain_flag)
+    frappe.db.after_rollback.add(_reset_drain_flag)
+    frappe.enqueue(
+        "united_way.journal_outbox.drain_outbox",
+        queue="short",
+        job_id="uw_journal_entry_outbox",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def _reset_drain_flag():
+    frappe.local.uw_outbox_drain_scheduled = False
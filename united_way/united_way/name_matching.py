@@ -0,0 +1,241 @@
+"""
+Fuzzy matching of payroll names to donor Contacts.
+
+Comparing every unmatched payroll name with every employee of a large
+employer is O(rows x contacts). NameIndex instead files each Contact
+under a few blocking keys:
+
+- Soundex code of the last name + first initial (of the first name and
+  of its nickname forms, so Bob is filed under B and R)
+- department + Soundex code of the last name, for first names that
+  differ entirely
+- Soundex code of the last name alone, used only for rows without a
+  first name
+
+A payroll name is scored only against the Contacts sharing one of its
+keys, by character bigram similarity of the last and first names, giving a
+confidence between 0 and 1. Accents are folded first, so Zoë and Zoe
+block and score alike.
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+# Candidate donor with its confidence (0-1)
+NameCandidate = namedtuple("NameCandidate", ["donor", "confidence"])
+
+# Bigrams rather than trigrams: names are short, and one typo costs a trigram score too much
+NGRAM_SIZE = 2
+LAST_NAME_WEIGHT = 0.6
+FIRST_NAME_WEIGHT = 0.4
+# Added when the departments agree, subtracted when they differ
+DEPARTMENT_WEIGHT = 0.05
+# First name scores for names that are not spelled alike
+NICKNAME_SCORE = 0.95
+INITIAL_SCORE = 0.8
+# The best candidate must beat the runner-up by this much to be accepted
+AMBIGUITY_MARGIN = 0.05
+
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+# Formal first name -> common nicknames
+NICKNAMES = {
+    "abigail": ("abby", "gail"),
+    "albert": ("al", "bert"),
+    "alexander": ("alex", "al", "xander"),
+    "alexandra": ("alex", "sandra", "sandy"),
+    "andrew": ("andy", "drew"),
+    "anthony": ("tony",),
+    "barbara": ("barb", "barbie"),
+    "benjamin": ("ben", "benny"),
+    "catherine": ("cathy", "kate", "katie"),
+    "charles": ("charlie", "chuck", "chas"),
+    "christopher": ("chris", "kit"),
+    "daniel": ("dan", "danny"),
+    "david": ("dave", "davey"),
+    "deborah": ("deb", "debbie"),
+    "donald": ("don", "donnie"),
+    "dorothy": ("dot", "dottie"),
+    "edward": ("ed", "eddie", "ted", "ned"),
+    "elizabeth": ("liz", "beth", "betty", "eliza", "lisa", "libby"),
+    "frederick": ("fred", "freddie"),
+    "gerald": ("gerry", "jerry"),
+    "gregory": ("greg",),
+    "james": ("jim", "jimmy", "jamie"),
+    "jeffrey": ("jeff",),
+    "jennifer": ("jen", "jenny"),
+    "jessica": ("jess", "jessie"),
+    "john": ("jack", "johnny", "jon"),
+    "joseph": ("joe", "joey"),
+    "katherine": ("kathy", "kate", "katie", "kat"),
+    "kenneth": ("ken", "kenny"),
+    "kimberly": ("kim",),
+    "lawrence": ("larry",),
+    "margaret": ("maggie", "peggy", "meg", "marge"),
+    "matthew": ("matt",),
+    "michael": ("mike", "mikey", "mick"),
+    "nicholas": ("nick", "nicky"),
+    "pamela": ("pam",),
+    "patricia": ("pat", "patty", "trish"),
+    "patrick": ("pat", "paddy"),
+    "rebecca": ("becky", "becca"),
+    "richard": ("rick", "rich", "richie", "dick"),
+    "robert": ("bob", "bobby", "rob", "robbie", "bert"),
+    "ronald": ("ron", "ronnie"),
+    "samantha": ("sam", "sammy"),
+    "samuel": ("sam", "sammy"),
+    "stephen": ("steve",),
+    "steven": ("steve",),
+    "susan": ("sue", "susie"),
+    "theodore": ("ted", "teddy", "theo"),
+    "thomas": ("tom", "tommy"),
+    "timothy": ("tim", "timmy"),
+    "victoria": ("vicky", "tori"),
+    "william": ("bill", "billy", "will", "willie", "liam"),
+}
+
+# Any first name -> the formal names it can stand for
+FORMAL_NAMES = {}
+for _formal, _nicknames in NICKNAMES.items():
+    for _name in (_formal,) + _nicknames:
+        FORMAL_NAMES.setdefault(_name, set()).add(_formal)
+
+
+def fold_accents(value):
+    """A name without diacritics, so Zoë and Zoe are spelled alike."""
+    return "".join(c for c in unicodedata.normalize("NFKD", value) if not unicodedata.combining(c))
+
+
+def soundex(name):
+    """American Soundex code of a name, e.g. Robert -> R163 and Müller -> M460."""
+    letters = [c for c in fold_accents(name).lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+
+    code = letters[0].upper()
+    previous = SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if c not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def ngrams(value, n=NGRAM_SIZE):
+    """Character n-grams of a name, padded so the first and last letters count."""
+    padded = f"{' ' * (n - 1)}{value} "
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def dice(a, b):
+    """Dice coefficient of two n-gram sets."""
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def normalize_name_part(value):
+    """Lowercase words of a name part without accents, punctuation or suffixes."""
+    value = re.sub(r"['.]", "", fold_accents(value or "").lower())
+    return [word for word in re.findall(r"[^\W\d_]+", value) if word not in NAME_SUFFIXES]
+
+
+class NamePerson:
+    """A name prepared for blocking and scoring."""
+
+    __slots__ = ("donor", "last", "first", "department", "last_grams", "first_grams", "phonetic", "initials")
+
+    def __init__(self, last, first, department=None, donor=None):
+        last_words = normalize_name_part(last)
+        first_words = normalize_name_part(first)
+
+        self.donor = donor
+        self.last = " ".join(last_words)
+        # Only the first word of the first name; middle names and initials vary too much
+        self.first = first_words[0] if first_words else ""
+        self.department = (department or "").strip().lower()
+        self.last_grams = ngrams(self.last)
+        self.first_grams = ngrams(self.first)
+        self.phonetic = soundex(last_words[-1]) if last_words else ""
+        self.initials = {name[0] for name in FORMAL_NAMES.get(self.first, {self.first}) | {self.first} if name}
+
+    def get_blocking_keys(self):
+        if not self.phonetic:
+            return []
+
+        keys = [("name", self.phonetic, initial) for initial in self.initials]
+        if self.department:
+            keys.append(("department", self.department, self.phonetic))
+        if not self.first:
+            keys.append(("last", self.phonetic))
+        return keys
+
+    def score(self, other):
+        """Confidence (0-1) that two names are the same person."""
+        confidence = LAST_NAME_WEIGHT * dice(self.last_grams, other.last_grams)
+        if self.first and other.first:
+            confidence += FIRST_NAME_WEIGHT * self.first_name_score(other)
+
+        if self.department and other.department:
+            confidence += DEPARTMENT_WEIGHT if self.department == other.department else -DEPARTMENT_WEIGHT
+        return min(max(confidence, 0.0), 1.0)
+
+    def first_name_score(self, other):
+        if self.first == other.first:
+            return 1.0
+        if FORMAL_NAMES.get(self.first, {self.first}) & FORMAL_NAMES.get(other.first, {other.first}):
+            return NICKNAME_SCORE
+        # "R." stands for Robert, and so for Bob
+        if (len(self.first) == 1 or len(other.first) == 1) and self.initials & other.initials:
+            return INITIAL_SCORE
+        return dice(self.first_grams, other.first_grams)
+
+
+class NameIndex:
+    """Donor names filed under their blocking keys."""
+
+    def __init__(self):
+        self.blocks = {}
+        self.size = 0
+
+    def add(self, donor, last, first, department=None):
+        person = NamePerson(last, first, department, donor=donor)
+        keys = person.get_blocking_keys()
+        # Contacts are filed under the last-name-only key too, for rows without a first name
+        if person.first and person.phonetic:
+            keys.append(("last", person.phonetic))
+
+        for key in keys:
+            self.blocks.setdefault(key, []).append(person)
+        self.size += 1
+
+    def search(self, last, first, department=None):
+        """Best candidate donors for a name, most confident first.
+
+        Returns:
+            list of up to two NameCandidate: the best, and the runner-up to
+            tell whether the best is clearly ahead
+        """
+        person = NamePerson(last, first, department)
+        best = {}
+        for key in person.get_blocking_keys():
+            for candidate in self.blocks.get(key, ()):
+                if candidate.donor not in best:
+                    best[candidate.donor] = person.score(candidate)
+
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:2]
+        return [NameCandidate(donor, round(confidence, 3)) for donor, confidence in ranked]
@@ -0,0 +1,5 @@
+def execute():
+    """Populate Agency Campaign Fact rows from existing submitted pledges, donations and write-offs."""
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import rebuild_agency_facts
+
+    rebuild_agency_facts()
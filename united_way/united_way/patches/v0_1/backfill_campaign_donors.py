@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+    """Populate Campaign Donor membership for existing campaigns and resync their totals."""
+    from united_way.uw_core.doctype.campaign.campaign import recalculate_campaign
+    from united_way.uw_core.doctype.campaign_donor.campaign_donor import rebuild_campaign_donors
+
+    for campaign in frappe.get_all("Campaign", filters={"docstatus": 1}, pluck="name"):
+        rebuild_campaign_donors(campaign)
+        recalculate_campaign(campaign)
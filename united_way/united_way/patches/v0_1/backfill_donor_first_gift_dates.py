@@ -0,0 +1,5 @@
+def execute():
+    """Rebuild Donor Giving Year rows so existing years get their first gift date."""
+    from united_way.uw_core.doctype.donor_giving_year.donor_giving_year import rebuild_giving_years
+
+    rebuild_giving_years()
@@ -0,0 +1,5 @@
+def execute():
+    """Populate Donor Giving Year rows from existing submitted donations."""
+    from united_way.uw_core.doctype.donor_giving_year.donor_giving_year import rebuild_giving_years
+
+    rebuild_giving_years()
@@ -0,0 +1,5 @@
+def execute():
+    """Add the fiscal-year Number Cards to existing sites (existing cards are skipped)."""
+    from united_way.setup_dashboard import create_number_cards
+
+    create_number_cards()
@@ -0,0 +1,11 @@
+import frappe
+
+
+def execute():
+    """Give existing sites the default background submission settings."""
+    defaults = {"background_item_threshold": 200, "item_chunk_size": 500}
+
+    for fieldname, value in defaults.items():
+        # Both fields are new, so an unset value can only mean "never configured"
+        if not frappe.db.get_single_value("UW Settings", fieldname):
+            frappe.db.set_single_value("UW Settings", fieldname, value)
@@ -1,12 +1,118 @@
 import frappe
-from frappe.utils import flt, nowdate, cint
+from frappe.utils import cint, flt, nowdate, now
+import codecs
 import csv
 import io
 import json
+import math
+import re
+import struct
+
+from united_way.cache import get_settings
+
+# Payroll Upload file_format -> built-in layout
+FILE_FORMATS = {
+    "CSV": "csv",
+    "ADP Fixed Width": "adp_fixed",
+    "Tab Delimited": "tab_delimited",
+}
+
+# Attached files are read from disk in binary chunks of this size
+READ_CHUNK_SIZE = 64 * 1024
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+# Fuzzy name matching confidence (percent) for organizations without their own thresholds
+FUZZY_MATCH_THRESHOLD = 90
+FUZZY_REVIEW_THRESHOLD = 75
+
+PAYROLL_FIELDS = ("employee_id", "employee_name", "amount", "deduction_code", "department")
+DELIMITERS = {"Comma": ",", "Tab": "\t", "Pipe": "|", "Semicolon": ";"}
+HEADER_CELLS = ("employee_id", "emp_id", "id", "employee id", "ssn", "employee")
+
+# The standard layouts, declared like Payroll Format records: (field, column or start, width)
+BUILTIN_FORMATS = {
+    "csv": {
+        "format_type": "Delimited",
+        "delimiter": "Comma",
+        "header_aliases": HEADER_CELLS,
+        "columns": [("employee_id", 1), ("employee_name", 2), ("amount", 3), ("deduction_code", 4), ("department", 5)],
+    },
+    "tab_delimited": {
+        "format_type": "Delimited",
+        "delimiter": "Tab",
+        "header_aliases": HEADER_CELLS,
+        "columns": [("employee_id", 1), ("employee_name", 2), ("amount", 3), ("deduction_code", 4), ("department", 5)],
+    },
+    # ADP: ID 1-9, name 10-39 ("Last, First"), amount 40-49, deduction code 50-59, department 60-69
+    "adp_fixed": {
+        "format_type": "Fixed Width",
+        "columns": [
+            ("employee_id", 1, 9), ("employee_name", 10, 30), ("amount", 40, 10),
+            ("deduction_code", 50, 10), ("department", 60, 10),
+        ],
+    },
+}
+
+
+class PayrollRow:
+    """One valid deduction line of a payroll file."""
+
+    __slots__ = ("source_line", "employee_id", "employee_name", "amount", "deduction_code", "department")
+
+    def __init__(self, source_line, employee_id, employee_name, amount, deduction_code="", department=""):
+        self.source_line = source_line
+        self.employee_id = employee_id
+        self.employee_name = employee_name
+        self.amount = amount
+        self.deduction_code = deduction_code
+        self.department = department
+
+    def as_dict(self):
+        return {
+            "employee_id": self.employee_id,
+            "employee_name": self.employee_name,
+            "amount": self.amount,
+            "department": self.department,
+            "deduction_code": self.deduction_code,
+            "source_line": self.source_line,
+        }
+
+
+class ParseErrors:
+    """Counts every unparseable line but keeps at most ``limit`` messages (None: all)."""
+
+    def __init__(self, limit=50):
+        self.limit = limit
+        self.count = 0
+        self.messages = []
+
+    def add(self, line_num, message):
+        self.count += 1
+        if self.limit is None or len(self.messages) < self.limit:
+            self.messages.append(f"Row {line_num}: {message}")
+
+
+class ParseSummary:
+    """Running totals of the rows passing through a pipeline, in constant memory."""
+
+    def __init__(self):
+        self.total_rows = 0
+        self.total_amount = 0
+
+    def add(self, row):
+        self.total_rows += 1
+        self.total_amount += row.amount
+        return row
+
+    def as_dict(self):
+        return {
+            "total_rows": self.total_rows,
+            "total_amount": flt(self.total_amount),
+        }
 
 
 @frappe.whitelist()
-def parse_payroll_file(file_content, file_format="csv", organization=None, campaign=None):
+def parse_payroll_file(file_content, file_format="csv", organization=None, campaign=None, payroll_format=None):
     """Parse a payroll deduction file and return structured data.
 
     Args:
@@ -14,6 +120,7 @@ def parse_payroll_file(file_content, file_format="csv", organization=None, campa
         file_format: "csv", "adp_fixed", or "tab_delimited"
         organization: The employer Organization name
         campaign: The Campaign to associate with
+        payroll_format: Payroll Format to parse with instead of file_format
 
     Returns:
         dict with:
@@ -24,353 +131,804 @@ def parse_payroll_file(file_content, file_format="csv", organization=None, campa
     if not file_content or not file_content.strip():
         frappe.throw("File content is empty.")
 
-    parsers = {
-        "csv": _parse_csv,
-        "adp_fixed": _parse_adp_fixed,
-        "tab_delimited": _parse_tab_delimited,
-    }
-
-    parser = parsers.get(file_format)
-    if not parser:
-        frappe.throw(f"Unsupported file format: {file_format}. Supported: csv, adp_fixed, tab_delimited")
+    if isinstance(file_content, str):
+        file_content = file_content.encode("utf-8")
 
-    rows, errors = parser(file_content)
+    layout = get_payroll_layout(file_format, payroll_format)
+    errors = ParseErrors(limit=None)
+    summary = ParseSummary()
+    rows = [summary.add(row).as_dict() for row in layout.parse(io.BytesIO(file_content), errors)]
 
-    # Calculate summary
-    total_amount = flt(sum(flt(r.get("amount", 0)) for r in rows))
-    unique_employees = len(set(r.get("employee_id", "") for r in rows if r.get("employee_id")))
+    # The rows are all returned anyway, so counting employees here costs no extra memory
+    summary = summary.as_dict()
+    summary["unique_employees"] = len({row["employee_id"] for row in rows if row["employee_id"]})
 
     return {
         "rows": rows,
-        "summary": {
-            "total_rows": len(rows),
-            "total_amount": total_amount,
-            "unique_employees": unique_employees,
-        },
-        "errors": errors,
+        "summary": summary,
+        "errors": errors.messages,
     }
 
 
-def _parse_csv(file_content):
-    """Parse CSV format payroll file.
+def open_payroll_file(file_url):
+    """Open an attached payroll file as a buffered binary stream, without reading it into memory."""
+    if not file_url:
+        frappe.throw("No file attached.")
 
-    Expected columns: employee_id, employee_name, deduction_amount, deduction_code, department
-    """
-    rows = []
-    errors = []
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    file_path = file_doc.get_full_path()
 
-    # Try UTF-8 first, fall back to Latin-1
     try:
-        content = file_content if isinstance(file_content, str) else file_content.decode("utf-8")
-    except (UnicodeDecodeError, AttributeError):
-        try:
-            content = file_content.decode("latin-1")
-        except AttributeError:
-            content = str(file_content)
-
-    reader = csv.reader(io.StringIO(content))
-
-    header_skipped = False
-    for line_num, row in enumerate(reader, start=1):
-        # Skip blank lines
-        if not row or all(cell.strip() == "" for cell in row):
-            continue
-
-        # Skip header row: detect if first column looks like a header
-        if not header_skipped:
-            first_cell = row[0].strip().lower()
-            if first_cell in ("employee_id", "emp_id", "id", "employee id", "ssn", "employee"):
-                header_skipped = True
-                continue
-            header_skipped = True  # Even if no header detected, don't skip again
+        return open(file_path, "rb", buffering=READ_CHUNK_SIZE)
+    except FileNotFoundError:
+        frappe.throw(f"Attached file not found at path: {file_path}")
 
-        try:
-            if len(row) < 3:
-                errors.append(f"Row {line_num}: Expected at least 3 columns, got {len(row)}")
-                continue
 
-            employee_id = row[0].strip()
-            employee_name = row[1].strip()
-            amount_str = row[2].strip().replace("$", "").replace(",", "")
-            amount = flt(amount_str)
+def detect_encoding(raw):
+    """Encoding of a seekable binary stream, from a sample of its first bytes.
 
-            if amount <= 0:
-                errors.append(f"Row {line_num}: Invalid or zero amount '{row[2].strip()}'")
-                continue
+    UTF-8 (skipping any BOM) if the sample decodes as UTF-8, otherwise
+    Latin-1 for Windows-origin files. Leaves the stream positioned after
+    the BOM, or at the start. Bytes past the sample may still turn out not
+    to be UTF-8; see decode_lines.
+    """
+    sample = raw.read(ENCODING_SAMPLE_SIZE)
+    try:
+        # final=False tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
 
-            department = row[4].strip() if len(row) > 4 else ""
-            deduction_code = row[3].strip() if len(row) > 3 else ""
+    raw.seek(len(codecs.BOM_UTF8) if encoding == "utf-8" and sample.startswith(codecs.BOM_UTF8) else 0)
+    return encoding
 
-            rows.append({
-                "employee_id": employee_id,
-                "employee_name": employee_name,
-                "amount": amount,
-                "department": department,
-                "deduction_code": deduction_code,
-                "source_line": line_num,
-            })
 
-        except Exception as e:
-            errors.append(f"Row {line_num}: {str(e)}")
+def decode_lines(raw, encoding):
+    """Yield the decoded lines of a binary stream, line endings included.
 
-    return rows, errors
+    The first line that is not valid in ``encoding`` switches it and the
+    rest of the file to Latin-1, which decodes every byte, so Windows text
+    after a UTF-8 looking sample is kept rather than replaced with U+FFFD.
+    """
+    for line in raw:
+        try:
+            yield line.decode(encoding)
+        except UnicodeDecodeError:
+            encoding = "latin-1"
+            yield line.decode(encoding)
 
 
-def _parse_adp_fixed(file_content):
-    """Parse ADP fixed-width format.
+def iter_payroll_rows(raw, layout="csv", errors=None):
+    """Yield a PayrollRow for each valid line of a binary payroll stream.
 
-    Columns 1-9:   Employee ID (SSN or ID)
-    Columns 10-39:  Employee Name (Last, First)
-    Columns 40-49:  Deduction Amount (right-justified, 2 decimal places)
-    Columns 50-59:  Deduction Code (e.g., "UW" or "UNWAY")
-    Columns 60-69:  Department Code
+    Args:
+        raw: Seekable binary stream (see open_payroll_file), read line by line
+        layout: PayrollLayout, or the key of a built-in format
+        errors: ParseErrors collecting the lines that were skipped
+    """
+    if not isinstance(layout, PayrollLayout):
+        layout = get_payroll_layout(layout)
+    return layout.parse(raw, errors if errors is not None else ParseErrors())
+
+
+def get_payroll_layout(file_format="csv", payroll_format=None):
+    """The compiled layout of a Payroll Format, or of a built-in file format."""
+    if payroll_format:
+        doc = frappe.get_cached_doc("Payroll Format", payroll_format)
+        return doc.get_layout()
+
+    spec = BUILTIN_FORMATS.get(file_format)
+    if not spec:
+        frappe.throw(f"Unsupported file format: {file_format}. Supported: {', '.join(BUILTIN_FORMATS)}")
+    return PayrollLayout(**spec)
+
+
+class PayrollLayout:
+    """A payroll file layout compiled into a row parser.
+
+    Delimited layouts read each field from a fixed csv column. Fixed-width
+    layouts compile to one struct.Struct that cuts every field out of a
+    full-length line in a single call; shorter lines fall back to
+    memoryview slices. Only the text fields are decoded, and amounts go
+    through float() on the raw value before any "$" and "," cleanup.
+    Byte offsets are character offsets only for Latin-1 and pure ASCII
+    lines, so a UTF-8 line with multi-byte characters is decoded first and
+    cut by character.
     """
-    rows = []
-    errors = []
 
-    # Try UTF-8 first, fall back to Latin-1
-    try:
-        content = file_content if isinstance(file_content, str) else file_content.decode("utf-8")
-    except (UnicodeDecodeError, AttributeError):
-        try:
-            content = file_content.decode("latin-1")
-        except AttributeError:
-            content = str(file_content)
+    def __init__(self, format_type, columns, delimiter="Comma", header_aliases=(),
+                 amount_format="Decimal", name_order="Auto"):
+        self.format_type = format_type
+        self.fixed_width = format_type == "Fixed Width"
+        self.delimiter = DELIMITERS.get(delimiter or "Comma", delimiter)
+        self.header_aliases = {alias.strip().lower() for alias in header_aliases or () if alias.strip()}
+        self.name_order = name_order or "Auto"
+        self.parse_amount = _parse_implied_decimal if amount_format == "Implied Decimal" else _parse_decimal
+
+        # (field, 0-based column or start, width), in file order
+        self.columns = sorted(
+            ((column[0], cint(column[1]) - 1, cint(column[2]) if len(column) > 2 else 0) for column in columns),
+            key=lambda column: column[1],
+        )
+        self._validate()
+
+        # Where each field sits in a parsed row (csv cells, or the unpacked struct fields)
+        if self.fixed_width:
+            self.index = {field: i for i, (field, start, width) in enumerate(self.columns)}
+            self.slices = [(start, start + width) for field, start, width in self.columns]
+            self.unpacker = struct.Struct(self._struct_format())
+            self.min_length = max(
+                start + width for field, start, width in self.columns
+                if field in ("employee_id", "employee_name", "amount")
+            )
+        else:
+            self.index = {field: start for field, start, width in self.columns}
+            self.min_columns = max(
+                start + 1 for field, start, width in self.columns
+                if field in ("employee_id", "employee_name", "amount")
+            )
 
-    lines = content.splitlines()
+    def _validate(self):
+        fields = [field for field, start, width in self.columns]
+        for field in fields:
+            if field not in PAYROLL_FIELDS:
+                frappe.throw(f"Unknown payroll field '{field}'.")
+            if fields.count(field) > 1:
+                frappe.throw(f"Payroll field '{field}' is mapped more than once.")
+        if "amount" not in fields:
+            frappe.throw("A payroll format must include the amount column.")
+        if "employee_id" not in fields and "employee_name" not in fields:
+            frappe.throw("A payroll format must include the employee ID or employee name column.")
+
+        for field, start, width in self.columns:
+            if start < 0:
+                frappe.throw(f"The position of '{field}' must be 1 or more.")
+            if self.fixed_width and width <= 0:
+                frappe.throw(f"The width of '{field}' must be 1 or more.")
+
+        if self.fixed_width:
+            for (field, start, width), (next_field, next_start, next_width) in zip(self.columns, self.columns[1:]):
+                if start + width > next_start:
+                    frappe.throw(f"Columns '{field}' and '{next_field}' overlap.")
+        elif not self.delimiter or len(self.delimiter) != 1:
+            frappe.throw("The delimiter must be a single character.")
+
+    def _struct_format(self):
+        """Pad bytes ("x") over the gaps and one bytes field ("s") per column."""
+        parts = []
+        offset = 0
+        for field, start, width in self.columns:
+            if start > offset:
+                parts.append(f"{start - offset}x")
+            parts.append(f"{width}s")
+            offset = start + width
+        return "".join(parts)
+
+    def parse(self, raw, errors):
+        """Yield a PayrollRow for each valid line of a binary stream."""
+        encoding = detect_encoding(raw)
+        if self.fixed_width:
+            return self._parse_fixed_width(raw, encoding, errors)
+
+        # Lines keep their endings, for the csv module to handle quoted newlines
+        return self._parse_delimited(csv.reader(decode_lines(raw, encoding), delimiter=self.delimiter), errors)
+
+    def _parse_delimited(self, reader, errors):
+        index = self.index
+        id_index = index.get("employee_id")
+        name_index = index.get("employee_name")
+        amount_index = index["amount"]
+        code_index = index.get("deduction_code")
+        department_index = index.get("department")
+        first_index = self.columns[0][1]
+        min_columns = self.min_columns
+        parse_amount = self.parse_amount
+        header_aliases = self.header_aliases
+        header_pending = bool(header_aliases)
+
+        for line_num, row in enumerate(reader, start=1):
+            # Skip blank lines
+            if not row or not "".join(row).strip():
+                continue
 
-    for line_num, line in enumerate(lines, start=1):
-        # Skip blank lines
-        if not line.strip():
-            continue
+            # Skip header row: only the first non-blank line can be one
+            if header_pending:
+                header_pending = False
+                if len(row) > first_index and row[first_index].strip().lower() in header_aliases:
+                    continue
 
-        # Lines shorter than minimum expected length (at least 49 chars for amount)
-        if len(line) < 49:
-            errors.append(f"Row {line_num}: Line too short ({len(line)} chars), expected at least 49")
-            continue
+            columns = len(row)
+            if columns < min_columns:
+                errors.add(line_num, f"Expected at least {min_columns} columns, got {columns}")
+                continue
 
-        try:
-            employee_id = line[0:9].strip()
-            employee_name = line[9:39].strip()
+            employee_id = row[id_index].strip() if id_index is not None else ""
+            employee_name = row[name_index].strip() if name_index is not None else ""
+            if not employee_id and not employee_name:
+                errors.add(line_num, "Missing both employee ID and name")
+                continue
 
-            amount_str = line[39:49].strip().replace("$", "").replace(",", "")
-            amount = flt(amount_str)
+            amount = parse_amount(row[amount_index])
+            if amount <= 0:
+                errors.add(line_num, f"Invalid or zero amount '{row[amount_index].strip()}'")
+                continue
 
-            deduction_code = line[49:59].strip() if len(line) > 49 else ""
-            department = line[59:69].strip() if len(line) > 59 else ""
+            yield PayrollRow(
+                line_num,
+                employee_id,
+                employee_name,
+                amount,
+                deduction_code=row[code_index].strip() if code_index is not None and code_index < columns else "",
+                department=row[department_index].strip()
+                if department_index is not None and department_index < columns else "",
+            )
+
+    def _parse_fixed_width(self, raw, encoding, errors):
+        index = self.index
+        id_index = index.get("employee_id")
+        name_index = index.get("employee_name")
+        amount_index = index["amount"]
+        code_index = index.get("deduction_code")
+        department_index = index.get("department")
+        unpack_from = self.unpacker.unpack_from
+        full_length = self.unpacker.size
+        min_length = self.min_length
+        slices = self.slices
+        parse_amount = self.parse_amount
+        header_aliases = self.header_aliases
+        header_pending = bool(header_aliases)
+
+        def text(values, i):
+            if i is None:
+                return ""
+            value = values[i].strip()
+            return value.decode(encoding) if isinstance(value, bytes) else value
+
+        for line_num, line in enumerate(raw, start=1):
+            line = line.rstrip(b"\r\n")
+
+            # Multi-byte characters would shift every later column: cut such lines by character
+            if encoding != "latin-1" and not line.isascii():
+                try:
+                    line = line.decode(encoding)
+                except UnicodeDecodeError:
+                    # As in decode_lines: the first line that is not valid UTF-8 switches the rest to Latin-1
+                    encoding = "latin-1"
+
+            if len(line) >= full_length and isinstance(line, bytes):
+                values = unpack_from(line)
+            elif not line.strip():
+                continue
+            elif len(line) < min_length:
+                errors.add(line_num, f"Line too short ({len(line)} chars), expected at least {min_length}")
+                continue
+            elif isinstance(line, bytes):
+                # Optional trailing columns may be cut short or missing
+                view = memoryview(line)
+                values = [view[start:end].tobytes() for start, end in slices]
+            else:
+                values = [line[start:end] for start, end in slices]
+
+            if header_pending:
+                header_pending = False
+                if text(values, 0).lower() in header_aliases:
+                    continue
 
+            employee_id = text(values, id_index)
+            employee_name = text(values, name_index)
             if not employee_id and not employee_name:
-                errors.append(f"Row {line_num}: Missing both employee ID and name")
+                if line.strip():
+                    errors.add(line_num, "Missing both employee ID and name")
                 continue
 
+            amount = parse_amount(values[amount_index])
             if amount <= 0:
-                errors.append(f"Row {line_num}: Invalid or zero amount '{line[39:49].strip()}'")
+                errors.add(line_num, f"Invalid or zero amount '{text(values, amount_index)}'")
                 continue
 
-            rows.append({
-                "employee_id": employee_id,
-                "employee_name": employee_name,
-                "amount": amount,
-                "department": department,
-                "deduction_code": deduction_code,
-                "source_line": line_num,
-            })
+            yield PayrollRow(
+                line_num,
+                employee_id,
+                employee_name,
+                amount,
+                deduction_code=text(values, code_index),
+                department=text(values, department_index),
+            )
 
-        except Exception as e:
-            errors.append(f"Row {line_num}: {str(e)}")
 
-    return rows, errors
+def _parse_decimal(value):
+    """Amount from a csv cell or fixed-width field: plain numbers first, then "$1,234.50"."""
+    try:
+        amount = float(value)
+    except ValueError:
+        if isinstance(value, bytes):
+            value = value.decode("latin-1")
+        amount = flt(value.strip().replace("$", "").replace(",", ""))
+    return amount if math.isfinite(amount) else 0
 
 
-def _parse_tab_delimited(file_content):
-    """Parse tab-delimited format.
+def _parse_implied_decimal(value):
+    """Amount with two implied decimal places: "0000012550" is 125.50."""
+    try:
+        return int(value) / 100
+    except ValueError:
+        return _parse_decimal(value) / 100
 
-    Same column layout as CSV but tab-separated.
-    """
-    rows = []
-    errors = []
 
-    # Try UTF-8 first, fall back to Latin-1
-    try:
-        content = file_content if isinstance(file_content, str) else file_content.decode("utf-8")
-    except (UnicodeDecodeError, AttributeError):
-        try:
-            content = file_content.decode("latin-1")
-        except AttributeError:
-            content = str(file_content)
-
-    reader = csv.reader(io.StringIO(content), delimiter="\t")
-
-    header_skipped = False
-    for line_num, row in enumerate(reader, start=1):
-        # Skip blank lines
-        if not row or all(cell.strip() == "" for cell in row):
-            continue
-
-        # Skip header row
-        if not header_skipped:
-            first_cell = row[0].strip().lower()
-            if first_cell in ("employee_id", "emp_id", "id", "employee id", "ssn", "employee"):
-                header_skipped = True
-                continue
-            header_skipped = True
+def get_match_key(employee_id=None, employee_name=None):
+    """Employee Crosswalk key of a payroll employee.
 
-        try:
-            if len(row) < 3:
-                errors.append(f"Row {line_num}: Expected at least 3 columns, got {len(row)}")
-                continue
+    The employee ID when there is one, otherwise the name reduced to its
+    sorted lowercase words, so "Smith, John", "JOHN SMITH" and "John  Smith"
+    are the same employee.
+    """
+    employee_id = (employee_id or "").strip()
+    if employee_id:
+        return f"id:{employee_id.lower()}"
 
-            employee_id = row[0].strip()
-            employee_name = row[1].strip()
-            amount_str = row[2].strip().replace("$", "").replace(",", "")
-            amount = flt(amount_str)
+    name = re.sub(r"['.]", "", (employee_name or "").lower())
+    return "name:" + " ".join(sorted(re.findall(r"\w+", name)))
 
-            if amount <= 0:
-                errors.append(f"Row {line_num}: Invalid or zero amount '{row[2].strip()}'")
-                continue
 
-            department = row[4].strip() if len(row) > 4 else ""
-            deduction_code = row[3].strip() if len(row) > 3 else ""
+class DonorMatcher:
+    """Matches payroll employees to an employer's donor Contacts.
 
-            rows.append({
-                "employee_id": employee_id,
-                "employee_name": employee_name,
-                "amount": amount,
-                "department": department,
-                "deduction_code": deduction_code,
-                "source_line": line_num,
-            })
+    The Employee Crosswalk and Contact lookups are loaded once per
+    organization and reused for every row, so matching a file costs a few
+    queries rather than one per row.
 
-        except Exception as e:
-            errors.append(f"Row {line_num}: {str(e)}")
+    Matching strategy:
+    1. Manual Employee Crosswalk entry for the employee ID or name
+    2. Exact match on the Contact's employee_id
+    3. Learned Employee Crosswalk entry for the employee ID or name
+    4. Match on name (last_name, first_name) within the organization,
+       unless several contacts share that name
+    5. Fuzzy match on name (see united_way.name_matching), accepted at or
+       above the Organization's Fuzzy Match Threshold; closer candidates
+       than its Fuzzy Review Threshold are suggested for review
+    6. Unmatched rows flagged for manual review
+
+    Fuzzy matches are not learned into the crosswalk; resolving them with
+    resolve_payroll_employee confirms them.
+
+    With learn_from set to a Payroll Upload, name matches are recorded in
+    the crosswalk (as Learned) and crosswalk hits are counted, in chunks
+    as the file is matched. Both are written in the caller's transaction,
+    so they are kept only if the upload's remittance is.
+    """
 
-    return rows, errors
+    def __init__(self, organization, name_order="Auto", learn_from=None):
+        self.organization = organization
+        # How names without a comma are read: "Auto"/"First Last", or "Last First"
+        self.name_order = name_order
+        self.learn_from = learn_from
+        self.chunk_size = get_settings().item_chunk_size
+
+        # Key: match key -> crosswalk entry (name, donor, source, hit_count)
+        self.crosswalk = {}
+        for entry in frappe.db.sql("""
+            SELECT crosswalk.name, crosswalk.match_key, crosswalk.donor, crosswalk.source, crosswalk.hit_count
+            FROM `tabEmployee Crosswalk` crosswalk
+            INNER JOIN `tabContact` contact ON contact.name = crosswalk.donor
+            WHERE crosswalk.organization = %s AND contact.status = 'Active'
+        """, organization, as_dict=True):
+            self.crosswalk[entry.match_key] = entry
+
+        thresholds = frappe.db.get_value(
+            "Organization", organization, ["fuzzy_match_threshold", "fuzzy_review_threshold"], as_dict=True
+        ) or {}
+        # 0 is a valid threshold; only a missing one takes the default
+        match_threshold = thresholds.get("fuzzy_match_threshold")
+        review_threshold = thresholds.get("fuzzy_review_threshold")
+        self.fuzzy_match_threshold = flt(FUZZY_MATCH_THRESHOLD if match_threshold is None else match_threshold)
+        self.fuzzy_review_threshold = flt(FUZZY_REVIEW_THRESHOLD if review_threshold is None else review_threshold)
+        self.fuzzy_matches = 0
+        self.fuzzy_reviews = 0
+        # Built from self.contacts on the first row that needs fuzzy matching
+        self.name_index = None
+
+        self.crosswalk_hits = 0
+        self.crosswalk_misses = 0
+        # Match key -> crosswalk hits not yet written
+        self._pending_hits = {}
+        # New crosswalk rows not yet written, and every key learned so far
+        self._pending_entries = []
+        self._learned_keys = set()
+
+        # Fetch all active contacts linked to this organization
+        self.contacts = frappe.get_all(
+            "Contact",
+            filters={
+                "organization": organization,
+                "status": "Active",
+            },
+            fields=["name", "first_name", "last_name", "full_name", "employee_id", "department"],
+        )
+
+        # Key: employee_id -> Contact name (unique within the organization)
+        self.employee_lookup = {}
+        # Build lookup maps for name-based matching (case-insensitive)
+        # Key: (last_name_lower, first_name_lower) -> Contact name
+        self.name_lookup = {}
+        # Key: full_name_lower -> Contact name
+        self.full_name_lookup = {}
+        # Name keys of both maps shared by more than one contact
+        self.ambiguous_names = set()
+
+        for contact in self.contacts:
+            first = (contact.get("first_name") or "").strip().lower()
+            last = (contact.get("last_name") or "").strip().lower()
+            full = (contact.get("full_name") or "").strip().lower()
+
+            if last and first:
+                if self.name_lookup.setdefault((last, first), contact["name"]) != contact["name"]:
+                    self.ambiguous_names.add((last, first))
+            if full:
+                if self.full_name_lookup.setdefault(full, contact["name"]) != contact["name"]:
+                    self.ambiguous_names.add(full)
+            if contact.get("employee_id"):
+                self.employee_lookup[contact["employee_id"]] = contact["name"]
+
+    def match(self, employee_id, employee_name, department=None):
+        """Returns:
+            (Contact name or None, match_status 'crosswalk', 'exact', 'name_match',
+            'fuzzy', 'review' or 'unmatched')
+        """
+        return self.match_row(employee_id, employee_name, department)[:2]
+
+    def match_row(self, employee_id, employee_name, department=None):
+        """Like match(), with the fuzzy candidate behind a 'fuzzy' or 'review' status.
+
+        Returns:
+            (Contact name or None, match_status, NameCandidate or None)
+        """
+        employee_id = (employee_id or "").strip()
+        employee_name = (employee_name or "").strip()
+
+        # Crosswalk entries, by ID first and then by name
+        keys = [get_match_key(employee_id=employee_id)] if employee_id else []
+        if employee_name:
+            keys.append(get_match_key(employee_name=employee_name))
+        entries = [(key, self.crosswalk[key]) for key in keys if key in self.crosswalk]
+
+        # Strategy 1: manual crosswalk entry
+        for key, entry in entries:
+            if entry.source == "Manual":
+                return self.use_crosswalk(key, entry)
+
+        # Strategy 2: exact match on employee_id, which no learned entry can override
+        if employee_id and employee_id in self.employee_lookup:
+            self.crosswalk_misses += 1
+            return self.employee_lookup[employee_id], "exact", None
+
+        # Strategy 3: learned crosswalk entry
+        if entries:
+            return self.use_crosswalk(*entries[0])
+        self.crosswalk_misses += 1
+
+        # Strategy 4: Name-based matching
+        if not employee_name:
+            return None, "unmatched", None
+
+        donor = self.match_name(employee_name)
+        if donor:
+            if self.learn_from:
+                self.learn(keys[0], donor, employee_id, employee_name)
+            return donor, "name_match", None
+
+        # Strategy 5: fuzzy matching within the name's blocks
+        return self.match_fuzzy(employee_name, department)
+
+    def use_crosswalk(self, match_key, entry):
+        self.crosswalk_hits += 1
+        self._pending_hits[match_key] = self._pending_hits.get(match_key, 0) + 1
+        return entry.donor, "crosswalk", None
+
+    def match_name(self, employee_name):
+        """Contact name matching a payroll name, or None.
+
+        A name shared by several contacts matches none of them; fuzzy
+        matching then leaves it for review.
+        """
+        last_name, first_name = self.split_name(employee_name)
+        ambiguous = self.ambiguous_names
+
+        # Try exact (last, first) match
+        key = (last_name, first_name)
+        if last_name and first_name and key in self.name_lookup:
+            return self.name_lookup[key] if key not in ambiguous else None
+
+        # Try full name match as fallback, and the reversed "First Last" if original was "Last, First"
+        full_names = [employee_name.lower()]
+        if "," in employee_name:
+            full_names.append(f"{first_name} {last_name}")
+
+        for full_name in full_names:
+            if full_name in ambiguous:
+                return None
+            if full_name in self.full_name_lookup:
+                return self.full_name_lookup[full_name]
+        return None
+
+    def match_fuzzy(self, employee_name, department=None):
+        """Returns:
+            (Contact name or None, 'fuzzy', 'review' or 'unmatched', NameCandidate or None)
+        """
+        from united_way.name_matching import AMBIGUITY_MARGIN
+
+        candidates = self.get_name_index().search(*self.split_name(employee_name), department)
+        if not candidates:
+            return None, "unmatched", None
+
+        best = candidates[0]
+        confidence = best.confidence * 100
+        # Two donors about as close as each other are left for a person to pick
+        ambiguous = len(candidates) > 1 and best.confidence - candidates[1].confidence < AMBIGUITY_MARGIN
+
+        if confidence >= self.fuzzy_match_threshold and not ambiguous:
+            self.fuzzy_matches += 1
+            return best.donor, "fuzzy", best
+        if confidence >= self.fuzzy_review_threshold:
+            self.fuzzy_reviews += 1
+            return None, "review", best
+        return None, "unmatched", None
+
+    def get_name_index(self):
+        from united_way.name_matching import NameIndex
+
+        if self.name_index is None:
+            self.name_index = NameIndex()
+            for contact in self.contacts:
+                self.name_index.add(
+                    contact["name"], contact.get("last_name"), contact.get("first_name"), contact.get("department")
+                )
+        return self.name_index
+
+    def split_name(self, employee_name):
+        """(last name, first name) of a payroll name, lowercased."""
+        # Try "Last, First" format (common in ADP files)
+        if "," in employee_name:
+            parts = employee_name.split(",", 1)
+            last_name = parts[0].strip().lower()
+            first_name = parts[1].strip().lower()
+        else:
+            # Try "First Last" (or the layout's "Last First") format
+            name_parts = employee_name.split()
+            if len(name_parts) >= 2 and self.name_order == "Last First":
+                last_name = name_parts[0].strip().lower()
+                first_name = " ".join(name_parts[1:]).strip().lower()
+            elif len(name_parts) >= 2:
+                first_name = name_parts[0].strip().lower()
+                last_name = " ".join(name_parts[1:]).strip().lower()
+            else:
+                first_name = ""
+                last_name = name_parts[0].strip().lower() if name_parts else ""
+
+        return last_name, first_name
+
+    def learn(self, match_key, donor, employee_id, employee_name):
+        """Queue a crosswalk entry for an employee matched by name.
+
+        Matches on the Contact's employee_id are not recorded, as the
+        Contact already holds that mapping.
+        """
+        if match_key in self._learned_keys:
+            return
+
+        self._learned_keys.add(match_key)
+        self._pending_entries.append((match_key, donor, employee_id or None, employee_name))
+        if len(self._pending_entries) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write queued crosswalk entries and hit counts."""
+        from united_way.utils import bulk_update
+
+        if not self.learn_from:
+            return
+
+        today = nowdate()
+        if self._pending_entries:
+            timestamp = now()
+            user = frappe.session.user
+            # A concurrent upload may have learned the same employee first
+            frappe.db.bulk_insert(
+                "Employee Crosswalk",
+                fields=["name", "creation", "modified", "owner", "modified_by",
+                        "organization", "employee_id", "employee_name", "donor", "match_key",
+                        "source", "hit_count", "last_matched", "payroll_upload"],
+                values=[
+                    (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+                     self.organization, employee_id, employee_name, donor, match_key,
+                     "Learned", 1, today, self.learn_from)
+                    for match_key, donor, employee_id, employee_name in self._pending_entries
+                ],
+                ignore_duplicates=True,
+            )
+            self._pending_entries = []
+
+        if self._pending_hits:
+            updates = {}
+            for match_key, hits in self._pending_hits.items():
+                entry = self.crosswalk[match_key]
+                entry.hit_count = cint(entry.hit_count) + hits
+                updates[entry.name] = {"hit_count": entry.hit_count, "last_matched": today}
+            bulk_update("Employee Crosswalk", updates, chunk_size=self.chunk_size)
+            self._pending_hits = {}
+
+    def get_crosswalk_summary(self):
+        """One line of crosswalk statistics for the match log."""
+        looked_up = self.crosswalk_hits + self.crosswalk_misses
+        hit_rate = flt(100.0 * self.crosswalk_hits / looked_up, 1) if looked_up else 0
+        summary = (
+            f"Crosswalk: {self.crosswalk_hits} hits, {self.crosswalk_misses} misses "
+            f"({hit_rate}% matched from {len(self.crosswalk)} known employees)"
+        )
+        if self.learn_from:
+            summary += f", {len(self._learned_keys)} learned"
+        return summary
+
+    def get_fuzzy_summary(self):
+        """One line of fuzzy matching statistics for the match log."""
+        return (
+            f"Fuzzy: {self.fuzzy_matches} matched at {flt(self.fuzzy_match_threshold)}%+, "
+            f"{self.fuzzy_reviews} for review at {flt(self.fuzzy_review_threshold)}%+"
+        )
 
 
 @frappe.whitelist()
 def match_employees_to_donors(rows, organization):
     """Try to match parsed employee records to existing Contact records.
 
-    Matching strategy:
-    1. Exact match on employee_id if Contact has an employee_id field
-    2. Fuzzy match on name (last_name, first_name) within the organization
-    3. Unmatched rows flagged for manual review
+    See DonorMatcher for the matching strategy.
 
     Args:
         rows: list of parsed row dicts from parse_payroll_file
         organization: The employer Organization name to scope matching
 
     Returns:
-        list of rows with added 'donor' field (Contact name or None)
-        and 'match_status' field ('exact', 'name_match', 'unmatched')
+        list of rows with added 'donor' field (Contact name or None),
+        'match_status' field ('crosswalk', 'exact', 'name_match', 'fuzzy',
+        'review', 'unmatched'), and for fuzzy and review rows the closest
+        donor as 'candidate' with its 'confidence' (percent)
     """
     if isinstance(rows, str):
         rows = json.loads(rows)
 
-    # Build a lookup of contacts for this organization
-    # Fetch all active contacts linked to this organization
-    contacts = frappe.get_all(
-        "Contact",
-        filters={
-            "organization": organization,
-            "status": "Active",
-        },
-        fields=["name", "first_name", "last_name", "full_name"],
-    )
-
-    # Build lookup maps for name-based matching (case-insensitive)
-    # Key: (last_name_lower, first_name_lower) -> Contact name
-    name_lookup = {}
-    # Key: full_name_lower -> Contact name
-    full_name_lookup = {}
-
-    for contact in contacts:
-        first = (contact.get("first_name") or "").strip().lower()
-        last = (contact.get("last_name") or "").strip().lower()
-        full = (contact.get("full_name") or "").strip().lower()
-
-        if last and first:
-            name_lookup[(last, first)] = contact["name"]
-        if full:
-            full_name_lookup[full] = contact["name"]
+    matcher = DonorMatcher(organization)
 
     matched_rows = []
-
     for row in rows:
-        employee_name = row.get("employee_name", "").strip()
-        donor = None
-        match_status = "unmatched"
-
-        # Strategy 1: Check if Contact has employee_id field and try exact match
-        # (Contact currently has no employee_id field, but we check dynamically
-        # in case it is added later)
-        employee_id = row.get("employee_id", "").strip()
-        if employee_id:
-            has_employee_id_field = "employee_id" in [
-                f.fieldname for f in frappe.get_meta("Contact").fields
-            ]
-            if has_employee_id_field:
-                match = frappe.get_all(
-                    "Contact",
-                    filters={
-                        "employee_id": employee_id,
-                        "organization": organization,
-                        "status": "Active",
-                    },
-                    fields=["name"],
-                    limit=1,
-                )
-                if match:
-                    donor = match[0]["name"]
-                    match_status = "exact"
-
-        # Strategy 2: Name-based matching
-        if not donor and employee_name:
-            # Try "Last, First" format (common in ADP files)
-            if "," in employee_name:
-                parts = employee_name.split(",", 1)
-                last_name = parts[0].strip().lower()
-                first_name = parts[1].strip().lower()
-            else:
-                # Try "First Last" format
-                name_parts = employee_name.split()
-                if len(name_parts) >= 2:
-                    first_name = name_parts[0].strip().lower()
-                    last_name = " ".join(name_parts[1:]).strip().lower()
-                elif len(name_parts) == 1:
-                    first_name = ""
-                    last_name = name_parts[0].strip().lower()
-                else:
-                    first_name = ""
-                    last_name = ""
-
-            # Try exact (last, first) match
-            if last_name and first_name and (last_name, first_name) in name_lookup:
-                donor = name_lookup[(last_name, first_name)]
-                match_status = "name_match"
-
-            # Try full name match as fallback
-            if not donor:
-                full_lower = employee_name.strip().lower()
-                if full_lower in full_name_lookup:
-                    donor = full_name_lookup[full_lower]
-                    match_status = "name_match"
-
-                # Also try reversed "First Last" if original was "Last, First"
-                if not donor and "," in employee_name:
-                    reversed_name = f"{first_name} {last_name}"
-                    if reversed_name in full_name_lookup:
-                        donor = full_name_lookup[reversed_name]
-                        match_status = "name_match"
-
+        donor, match_status, candidate = matcher.match_row(
+            row.get("employee_id"), row.get("employee_name"), row.get("department")
+        )
         matched_row = dict(row)
         matched_row["donor"] = donor
         matched_row["match_status"] = match_status
+        if candidate:
+            matched_row["candidate"] = candidate.donor
+            matched_row["confidence"] = flt(candidate.confidence * 100, 1)
         matched_rows.append(matched_row)
 
     return matched_rows
 
 
+class RemittanceWriter:
+    """Builds a Remittance from a stream of matched items, one chunk at a time.
+
+    The first chunk is inserted through the document API, so Remittance
+    validation and naming run as usual; later chunks are written with bulk
+    inserts. Each chunk looks up its donors' names and payroll pledges in
+    one query apiece, and only one chunk is held in memory.
+    """
+
+    def __init__(self, organization, campaign, remittance_date, total_amount=None,
+                 reference_number=None, chunk_size=None):
+        self.organization = organization
+        self.campaign = campaign
+        self.remittance_date = remittance_date or nowdate()
+        self.expected_total = flt(total_amount)
+        self.reference_number = reference_number or ""
+        self.chunk_size = chunk_size or get_settings().item_chunk_size or 500
+
+        self.remittance = None
+        self.pending = []
+        self.item_count = 0
+        self.items_total = 0
+
+    def add(self, donor, amount, pledge=None):
+        self.pending.append((donor, flt(amount), pledge))
+        if len(self.pending) >= self.chunk_size:
+            self._flush()
+
+    def finish(self):
+        """Write the remaining items.
+
+        Returns:
+            The Remittance name, or None if no items were added
+        """
+        self._flush()
+        if not self.remittance:
+            return None
+
+        items_total = flt(self.items_total)
+        if items_total != flt(self.remittance.items_total):
+            # Totals of the bulk-inserted chunks; the same rules as Remittance.calculate_totals
+            total_amount = self.expected_total if self.expected_total > 0 else items_total
+            self.remittance.db_set({
+                "total_amount": total_amount,
+                "items_total": items_total,
+                "variance": flt(total_amount - items_total),
+            })
+
+        return self.remittance.name
+
+    def _flush(self):
+        if not self.pending:
+            return
+
+        chunk, self.pending = self.pending, []
+        donors = tuple({donor for donor, amount, pledge in chunk})
+        names = dict(frappe.db.sql("""
+            SELECT name, full_name FROM `tabContact` WHERE name IN %(donors)s
+        """, {"donors": donors}))
+        pledges = self._get_payroll_pledges(donors)
+
+        items = [
+            {"donor": donor, "donor_name": names.get(donor), "pledge": pledge or pledges.get(donor) or "", "amount": amount}
+            for donor, amount, pledge in chunk
+        ]
+        self.items_total += sum(item["amount"] for item in items)
+
+        if not self.remittance:
+            self._insert_header(items)
+        else:
+            self._insert_items(items)
+        self.item_count += len(items)
+
+    def _insert_header(self, items):
+        remittance = frappe.new_doc("Remittance")
+        remittance.organization = self.organization
+        remittance.campaign = self.campaign
+        remittance.remittance_date = self.remittance_date
+        remittance.total_amount = self.expected_total if self.expected_total > 0 else flt(self.items_total)
+        remittance.payment_method = "ACH/Bank Transfer"
+        remittance.reference_number = self.reference_number
+        for item in items:
+            remittance.append("items", item)
+        remittance.insert()
+        self.remittance = remittance
+
+    def _insert_items(self, items):
+        timestamp = now()
+        user = frappe.session.user
+        frappe.db.bulk_insert(
+            "Remittance Item",
+            fields=["name", "creation", "modified", "owner", "modified_by", "parent", "parenttype",
+                    "parentfield", "idx", "donor", "donor_name", "pledge", "amount"],
+            values=[
+                (frappe.generate_hash(length=10), timestamp, timestamp, user, user, self.remittance.name,
+                 "Remittance", "items", self.item_count + idx, item["donor"], item["donor_name"],
+                 item["pledge"] or None, item["amount"])
+                for idx, item in enumerate(items, start=1)
+            ],
+        )
+
+    def _get_payroll_pledges(self, donors):
+        """Each donor's latest submitted payroll pledge in the campaign."""
+        pledges = {}
+        for donor, pledge in frappe.db.sql("""
+            SELECT donor, name
+            FROM `tabPledge`
+            WHERE donor IN %(donors)s AND campaign = %(campaign)s
+              AND docstatus = 1 AND payment_method = 'Payroll Deduction'
+            ORDER BY creation DESC
+        """, {"donors": donors, "campaign": self.campaign}):
+            pledges.setdefault(donor, pledge)
+        return pledges
+
+
 @frappe.whitelist()
 def create_remittance_from_payroll(organization, campaign, remittance_date,
                                    rows, total_amount=None, reference_number=None):
@@ -390,56 +948,17 @@ def create_remittance_from_payroll(organization, campaign, remittance_date,
     if isinstance(rows, str):
         rows = json.loads(rows)
 
-    # Filter to only rows with matched donors
-    matched_rows = [r for r in rows if r.get("donor")]
-
-    if not matched_rows:
-        frappe.throw("No matched donor rows to create a remittance from.")
+    writer = RemittanceWriter(organization, campaign, remittance_date, total_amount, reference_number)
 
-    # Calculate items total from matched rows
-    items_total = flt(sum(flt(r.get("amount", 0)) for r in matched_rows))
-
-    # Use items_total as total_amount if no expected total provided
-    remittance_total = flt(total_amount) if flt(total_amount) > 0 else items_total
-
-    remittance = frappe.new_doc("Remittance")
-    remittance.organization = organization
-    remittance.campaign = campaign
-    remittance.remittance_date = remittance_date or nowdate()
-    remittance.total_amount = remittance_total
-    remittance.payment_method = "ACH/Bank Transfer"
-    remittance.reference_number = reference_number or ""
-
-    # Try to find active pledges for each donor in this campaign
-    for row in matched_rows:
-        donor = row["donor"]
-        amount = flt(row.get("amount", 0))
-
-        # Look up the donor's active pledge for this campaign
-        pledge = row.get("pledge")
-        if not pledge:
-            pledge_match = frappe.get_all(
-                "Pledge",
-                filters={
-                    "donor": donor,
-                    "campaign": campaign,
-                    "docstatus": 1,
-                    "payment_method": "Payroll Deduction",
-                },
-                fields=["name"],
-                order_by="creation desc",
-                limit=1,
-            )
-            if pledge_match:
-                pledge = pledge_match[0]["name"]
+    # Only rows with matched donors; each donor's active payroll pledge is looked up
+    for row in rows:
+        if row.get("donor"):
+            writer.add(row["donor"], row.get("amount", 0), row.get("pledge"))
 
-        remittance.append("items", {
-            "donor": donor,
-            "pledge": pledge or "",
-            "amount": amount,
-        })
+    remittance_name = writer.finish()
+    if not remittance_name:
+        frappe.throw("No matched donor rows to create a remittance from.")
 
-    remittance.insert()
     frappe.db.commit()
 
-    return remittance.name
+    return remittance_name
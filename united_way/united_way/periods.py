@@ -0,0 +1,134 @@
+"""Calendar and fiscal periods, and date-range predicates for reports.
+
+The fiscal year starts in ``UW Settings.fiscal_year_start_month`` and is
+named after the calendar year it ends in: with a July start, FY 2026 runs
+from 2025-07-01 to 2026-06-30. Pay periods are 14-day periods counted from
+the start of the fiscal year.
+
+Reports should filter dates with ``date_range_condition`` instead of
+``YEAR(column) = ...``: a half-open range on the bare column can use the
+column's index. To group or join by fiscal period in SQL, use the
+precomputed ``Fiscal Date`` rows (one per calendar date).
+"""
+import datetime
+
+import frappe
+from frappe.utils import add_days, add_months, cint, getdate
+
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+]
+
+PAY_PERIOD_DAYS = 14
+
+
+def get_fiscal_start_month(month=None):
+    """Month number (1-12) the fiscal year starts in (month name defaults to UW Settings)."""
+    if not month:
+        from united_way.cache import get_settings
+
+        month = get_settings().get("fiscal_year_start_month")
+    return MONTHS.index(month) + 1 if month in MONTHS else 1
+
+
+def get_fiscal_year(date, start_month=None):
+    start_month = start_month or get_fiscal_start_month()
+    date = getdate(date)
+    return date.year + 1 if start_month > 1 and date.month >= start_month else date.year
+
+
+def get_fiscal_year_start(fiscal_year, start_month=None):
+    start_month = start_month or get_fiscal_start_month()
+    fiscal_year = cint(fiscal_year)
+    return datetime.date(fiscal_year - 1 if start_month > 1 else fiscal_year, start_month, 1)
+
+
+def get_fiscal_period(date, start_month=None):
+    """Calendar and fiscal attributes of a date, as stored on Fiscal Date."""
+    start_month = start_month or get_fiscal_start_month()
+    date = getdate(date)
+    fiscal_year = get_fiscal_year(date, start_month)
+    fiscal_month = (date.month - start_month) % 12 + 1
+
+    return frappe._dict(
+        calendar_date=date,
+        calendar_year=date.year,
+        calendar_quarter=(date.month - 1) // 3 + 1,
+        calendar_month=date.month,
+        fiscal_year=fiscal_year,
+        fiscal_quarter=(fiscal_month - 1) // 3 + 1,
+        fiscal_month=fiscal_month,
+        pay_period=(date - get_fiscal_year_start(fiscal_year, start_month)).days // PAY_PERIOD_DAYS + 1,
+    )
+
+
+def get_period_range(year=None, fiscal_year=None, fiscal_quarter=None, from_date=None, to_date=None):
+    """Half-open [start, end) date range matching every given filter.
+
+    Args:
+        year: calendar year
+        fiscal_year: fiscal year, optionally narrowed by fiscal_quarter (1-4)
+        from_date, to_date: inclusive bounds
+
+    Returns:
+        (start, end); either is None when unbounded
+    """
+    starts, ends = [], []
+
+    if cint(year):
+        starts.append(datetime.date(cint(year), 1, 1))
+        ends.append(datetime.date(cint(year) + 1, 1, 1))
+
+    if cint(fiscal_year):
+        start = get_fiscal_year_start(fiscal_year)
+        months = 12
+        if cint(fiscal_quarter):
+            if not 1 <= cint(fiscal_quarter) <= 4:
+                frappe.throw(f"Fiscal quarter must be between 1 and 4, not {fiscal_quarter}.")
+            start = add_months(start, (cint(fiscal_quarter) - 1) * 3)
+            months = 3
+        starts.append(getdate(start))
+        ends.append(getdate(add_months(start, months)))
+    elif cint(fiscal_quarter):
+        frappe.throw("Select a fiscal year to filter by fiscal quarter.")
+
+    if from_date:
+        starts.append(getdate(from_date))
+    if to_date:
+        ends.append(getdate(add_days(to_date, 1)))
+
+    return (max(starts) if starts else None, min(ends) if ends else None)
+
+
+def date_range_condition(column, filters=None, key=None):
+    """Index-friendly SQL predicate on a date column for period filters.
+
+    Args:
+        column: the date column, e.g. ``d.donation_date``
+        filters: any of year, fiscal_year, fiscal_quarter, from_date, to_date
+        key: prefix for the placeholder names, so several ranges can share
+            one values dict (defaults to the column name)
+
+    Returns:
+        (condition, values); the condition is ``1 = 1`` when no filter is set
+    """
+    filters = filters or {}
+    start, end = get_period_range(
+        year=filters.get("year"),
+        fiscal_year=filters.get("fiscal_year"),
+        fiscal_quarter=filters.get("fiscal_quarter"),
+        from_date=filters.get("from_date"),
+        to_date=filters.get("to_date"),
+    )
+
+    key = key or column.rsplit(".", 1)[-1].strip("`")
+    conditions, values = [], {}
+    if start:
+        conditions.append(f"{column} >= %({key}_start)s")
+        values[f"{key}_start"] = start
+    if end:
+        conditions.append(f"{column} < %({key}_end)s")
+        values[f"{key}_end"] = end
+
+    return " AND ".join(conditions) or "1 = 1", values
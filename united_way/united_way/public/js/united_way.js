@@ -1 +1,63 @@
 // United Way custom scripts
+
+frappe.provide("united_way");
+
+// Background CSV / Excel export for UW Core script reports (united_way/report_export.py)
+united_way.EXPORT_REPORTS = [
+	"Agency Allocation Report",
+	"Campaign Drive Progress",
+	"Campaign Summary",
+	"Distribution Summary",
+	"Donor Giving History",
+	"Donor Retention",
+	"Executive Summary",
+	"Payment Schedule Aging",
+	"Receivable Aging Trend",
+	"Remittance Summary",
+];
+
+united_way.export_report = function (report) {
+	frappe.prompt(
+		{
+			fieldname: "file_format",
+			fieldtype: "Select",
+			label: __("Format"),
+			options: "CSV\nExcel",
+			default: "CSV",
+		},
+		(values) => {
+			frappe.call({
+				method: "united_way.report_export.export_report",
+				args: {
+					report_name: report.report_name,
+					filters: report.get_filter_values(),
+					file_format: values.file_format,
+				},
+			});
+		},
+		__("Export in Background"),
+		__("Export")
+	);
+};
+
+united_way.add_export_menu_item = function (report_name, attempts = 10) {
+	const report = frappe.query_report;
+	if (!report || report.report_name !== report_name || !report.page) {
+		// The report view is created after the route changes
+		if (attempts > 0) {
+			setTimeout(() => united_way.add_export_menu_item(report_name, attempts - 1), 300);
+		}
+		return;
+	}
+	if (report.__uw_export_added) return;
+
+	report.__uw_export_added = true;
+	report.page.add_menu_item(__("Export in Background"), () => united_way.export_report(report));
+};
+
+frappe.router.on("change", () => {
+	const [view, report_name] = frappe.get_route();
+	if (view === "query-report" && united_way.EXPORT_REPORTS.includes(report_name)) {
+		united_way.add_export_menu_item(report_name);
+	}
+});
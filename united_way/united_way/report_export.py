@@ -0,0 +1,158 @@
+"""Background CSV / Excel export for UW Core script reports.
+
+``export_report`` enqueues a job that writes the report's rows straight
+to a private File and notifies the user when it is ready, so large
+exports never build the full result in a web worker.
+
+A report streams its rows if its module defines ``get_export_query(filters)``
+returning ``frappe._dict(query=, values=)`` (and optionally
+``prepare_row(row)``). The query runs on an unbuffered server-side cursor
+and each row is written as soon as it is read, so memory use does not
+depend on the row count. While the cursor is open no other query can run
+on the connection: ``prepare_row`` must only use the row itself and
+already-loaded caches. ``get_export_query`` may return None for filter
+combinations that produce small results (grouped views), and reports
+without it are exported from ``execute``.
+"""
+import csv
+import os
+
+import frappe
+from frappe.modules import get_report_module_dotted_path
+from frappe.utils import now_datetime
+
+FORMATS = {"CSV": "csv", "Excel": "xlsx"}
+
+
+@frappe.whitelist()
+def export_report(report_name, filters=None, file_format="CSV"):
+    """Queue a background export of a UW Core script report for the current user."""
+    report = frappe.get_doc("Report", report_name)
+    if report.module != "UW Core" or report.report_type != "Script Report":
+        frappe.throw(f"Background export is not available for {report_name}.")
+    if not report.is_permitted():
+        frappe.throw(f"Not permitted to export {report_name}.", frappe.PermissionError)
+    if file_format not in FORMATS:
+        frappe.throw(f"Export format must be one of {', '.join(FORMATS)}.")
+
+    frappe.enqueue(
+        "united_way.report_export.run_export",
+        queue="long",
+        timeout=3600,
+        report_name=report_name,
+        filters=frappe.parse_json(filters) or {},
+        file_format=file_format,
+    )
+    frappe.msgprint(
+        f"{report_name} is being exported. You will be notified when the file is ready.",
+        title="Export Queued",
+        indicator="blue",
+    )
+
+
+def run_export(report_name, filters, file_format="CSV"):
+    """Background job: write the report to a private File and notify the user."""
+    user = frappe.session.user
+    try:
+        file_doc = write_report_file(report_name, filters, file_format)
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), f"{report_name} Export Error")
+        _notify(user, f"Export of {report_name} failed. See the Error Log for details.")
+        frappe.db.commit()
+        return
+
+    _notify(user, f"Export of {report_name} is ready: {file_doc.file_name}", file_doc)
+    frappe.db.commit()
+
+
+def write_report_file(report_name, filters, file_format="CSV"):
+    """Write a report's rows to a new private File.
+
+    Returns:
+        the File document
+    """
+    module = frappe.get_module(get_report_module_dotted_path("UW Core", report_name))
+    filters = frappe._dict(filters or {})
+
+    export = module.get_export_query(filters) if hasattr(module, "get_export_query") else None
+    if export:
+        columns = export.get("columns") or module.get_columns()
+        rows = _stream_rows(export.query, export.values, export.get("prepare_row"))
+    else:
+        columns, data = module.execute(filters)[:2]
+        rows = iter(data)
+
+    file_name = "{}-{}-{}.{}".format(
+        frappe.scrub(report_name), now_datetime().strftime("%Y%m%d-%H%M%S"),
+        frappe.generate_hash(length=6), FORMATS[file_format],
+    )
+    path = frappe.get_site_path("private", "files", file_name)
+
+    try:
+        if file_format == "Excel":
+            _write_xlsx(path, report_name, columns, rows)
+        else:
+            _write_csv(path, columns, rows)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+    })
+    file_doc.insert(ignore_permissions=True)
+    return file_doc
+
+
+def _stream_rows(query, values, prepare_row=None):
+    with frappe.db.unbuffered_cursor():
+        for row in frappe.db.sql(query, values, as_dict=True, as_iterator=True):
+            yield prepare_row(row) if prepare_row else row
+
+
+def _fieldnames(columns):
+    return [column["fieldname"] if isinstance(column, dict) else column for column in columns]
+
+
+def _labels(columns):
+    return [column.get("label") or column["fieldname"] if isinstance(column, dict) else column for column in columns]
+
+
+def _write_csv(path, columns, rows):
+    fieldnames = _fieldnames(columns)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(_labels(columns))
+        for row in rows:
+            writer.writerow([row.get(fieldname) for fieldname in fieldnames])
+
+
+def _write_xlsx(path, report_name, columns, rows):
+    from openpyxl import Workbook
+
+    # Write-only workbooks flush each row to a temporary file as it is appended
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=report_name[:31])
+    fieldnames = _fieldnames(columns)
+
+    sheet.append(_labels(columns))
+    for row in rows:
+        sheet.append([row.get(fieldname) for fieldname in fieldnames])
+    workbook.save(path)
+
+
+def _notify(user, subject, file_doc=None):
+    notification = {
+        "doctype": "Notification Log",
+        "for_user": user,
+        "type": "Alert",
+        "subject": subject,
+    }
+    if file_doc:
+        notification.update(document_type="File", document_name=file_doc.name)
+    frappe.get_doc(notification).insert(ignore_permissions=True)
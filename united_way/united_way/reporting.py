@@ -0,0 +1,361 @@
+"""Shared query layer for agency reporting.
+
+Agency-level numbers come from ``Agency Campaign Fact``, which Pledge,
+Donation and Pledge Writeoff submit/cancel keep up to date through the
+rollup queue. Reads are a single grouped query over the fact rows, so
+their cost depends on the number of campaigns, agencies and months, not
+on pledge volume. Agency names and codes come from the cached
+Organization directory instead of a join.
+
+Collected amounts are donations against a submitted pledge, split by the
+pledge's allocation percentages. Donations without a pledge are not
+attributed to an agency.
+
+If the fact rows are ever suspect, rebuild them with
+``bench --site <site> uw-rebuild-agency-facts [--campaign <name>]``.
+
+Receivable aging is bucketed in SQL by ``get_aging_buckets``, for the
+Payment Schedule Aging report and the daily Receivable Aging Snapshot.
+
+The fiscal-year Number Cards on the workspace are also served from here.
+
+Campaign-level report results can be cached in Redis with
+``get_cached_report``. Each campaign has a data version counter; rollup
+flushes (Pledge, Donation and Pledge Writeoff submit/cancel) and Campaign
+or Campaign Drive saves bump it after commit, so a cached result is
+served until the campaign's data actually changes.
+"""
+import frappe
+from frappe.utils import cint, flt, getdate, nowdate
+
+from united_way.cache import get_organization
+from united_way.periods import date_range_condition, get_fiscal_year
+
+REPORT_CACHE_SECONDS = 24 * 60 * 60
+
+GROUP_BY = ("campaign", "agency", "designation_type", "period")
+MEASURES = ("allocated_amount", "collected_amount", "written_off_amount", "pledge_count", "donor_count")
+
+# Open balance by days past due: (fieldname, label, first day, last day)
+AGING_BUCKETS = (
+    ("current_amount", "Not Yet Due", None, 0),
+    ("bucket_0_30", "0-30 Days", 1, 30),
+    ("bucket_31_60", "31-60 Days", 31, 60),
+    ("bucket_61_90", "61-90 Days", 61, 90),
+    ("bucket_90_plus", "90+ Days", 91, None),
+)
+AGING_GROUPS = {
+    "campaign": "p.campaign",
+    "employer": "p.donor_organization",
+    "donor": "p.donor",
+}
+OPEN_SCHEDULE_STATUSES = ("Pending", "Overdue", "Partially Paid")
+
+
+def get_agency_totals(filters=None, group_by=("agency",), order_by="allocated_amount desc"):
+    """Fact measures summed over the requested dimensions.
+
+    Args:
+        filters: optional campaign, campaign_year, agency, designation_type,
+            from_date and to_date (matched against the fact month)
+        group_by: any of GROUP_BY
+        order_by: a measure or dimension, optionally followed by asc/desc
+
+    Returns:
+        list of frappe._dict with the group_by columns, every measure, and
+        agency_name / agency_code when grouped by agency.
+
+    pledge_count and donor_count are distinct per (campaign, agency); summed
+    over several agencies, a pledge or donor split between them counts
+    once for each.
+    """
+    filters = frappe._dict(filters or {})
+    group_by = list(group_by)
+    for column in group_by:
+        if column not in GROUP_BY:
+            frappe.throw(f"Cannot group agency facts by '{column}'.")
+
+    order_column, _, direction = order_by.partition(" ")
+    if order_column not in GROUP_BY + MEASURES or direction.lower() not in ("", "asc", "desc"):
+        frappe.throw(f"Cannot order agency facts by '{order_by}'.")
+
+    conditions = ["1 = 1"]
+    join = ""
+
+    if filters.campaign:
+        conditions.append("f.campaign = %(campaign)s")
+    if filters.campaign_year:
+        join = "JOIN `tabCampaign` c ON f.campaign = c.name"
+        conditions.append("c.campaign_year = %(campaign_year)s")
+    if filters.agency:
+        conditions.append("f.agency = %(agency)s")
+    if filters.designation_type:
+        conditions.append("f.designation_type = %(designation_type)s")
+    if filters.from_date:
+        conditions.append("f.period >= DATE_FORMAT(%(from_date)s, '%%Y-%%m-01')")
+    if filters.to_date:
+        conditions.append("f.period <= %(to_date)s")
+
+    select = [f"f.{column}" for column in group_by] + [
+        f"SUM(f.{measure}) AS {measure}" for measure in MEASURES
+    ]
+
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(select)}
+        FROM `tabAgency Campaign Fact` f
+        {join}
+        WHERE {" AND ".join(conditions)}
+        {"GROUP BY " + ", ".join(f"f.{column}" for column in group_by) if group_by else ""}
+        ORDER BY {order_column} {direction or "asc"}
+    """, filters, as_dict=True)
+
+    for row in rows:
+        for measure in MEASURES:
+            row[measure] = flt(row[measure])
+        row.pledge_count = cint(row.pledge_count)
+        row.donor_count = cint(row.donor_count)
+
+        if "agency" in group_by:
+            agency = get_organization(row.agency) or frappe._dict()
+            row.agency_name = agency.organization_name
+            row.agency_code = agency.agency_code
+
+    return rows
+
+
+def get_agency_collections(filters=None, group_by=("agency",)):
+    """Submitted donations split across their pledge's allocations, in one query.
+
+    This is the set-based split the fact table is built from: each donation
+    against a submitted pledge contributes ``amount * percentage / 100`` to
+    every agency on that pledge, so a multi-agency pledge is never counted
+    twice. Reads the source tables; reports should normally use
+    ``get_agency_totals``.
+
+    Args:
+        filters: optional campaign, campaign_year and agency
+        group_by: any of GROUP_BY (period is the donation month)
+
+    Returns:
+        list of frappe._dict with the group_by columns and collected_amount
+    """
+    filters = frappe._dict(filters or {})
+    dimensions = {
+        "campaign": "p.campaign",
+        "agency": "pa.agency",
+        "designation_type": "IFNULL(pa.designation_type, '')",
+        "period": "DATE_FORMAT(d.donation_date, '%%Y-%%m-01')",
+    }
+    for column in group_by:
+        if column not in dimensions:
+            frappe.throw(f"Cannot group agency collections by '{column}'.")
+
+    conditions = ["d.docstatus = 1", "p.docstatus = 1", "pa.agency IS NOT NULL"]
+    join = ""
+
+    if filters.campaign:
+        conditions.append("d.campaign = %(campaign)s")
+        conditions.append("p.campaign = %(campaign)s")
+    if filters.campaign_year:
+        join = "JOIN `tabCampaign` c ON p.campaign = c.name"
+        conditions.append("c.campaign_year = %(campaign_year)s")
+    if filters.agency:
+        conditions.append("pa.agency = %(agency)s")
+
+    select = [f"{dimensions[column]} AS {column}" for column in group_by]
+
+    return frappe.db.sql(f"""
+        SELECT {", ".join(select + ["SUM(d.amount * pa.percentage / 100) AS collected_amount"])}
+        FROM `tabDonation` d
+        JOIN `tabPledge` p ON d.pledge = p.name
+        JOIN `tabPledge Allocation` pa ON pa.parent = p.name AND pa.parenttype = 'Pledge'
+        {join}
+        WHERE {" AND ".join(conditions)}
+        {"GROUP BY " + ", ".join(dimensions[column] for column in group_by) if group_by else ""}
+    """, filters, as_dict=True)
+
+
+def get_distributed_by_agency(campaign):
+    """{agency: amount} paid out by submitted Distribution Runs of a campaign."""
+    return {
+        row.agency: flt(row.distributed)
+        for row in frappe.db.sql("""
+            SELECT di.agency, SUM(di.distribution_amount) AS distributed
+            FROM `tabDistribution Item` di
+            JOIN `tabDistribution Run` dr ON di.parent = dr.name
+            WHERE dr.campaign = %s
+              AND dr.docstatus = 1
+            GROUP BY di.agency
+        """, campaign, as_dict=True)
+    }
+
+
+def get_aging_buckets(filters=None, group_by=("campaign",), as_of_date=None):
+    """Open payment schedule balances summed into days-overdue buckets, in one query.
+
+    Args:
+        filters: optional campaign, organization (the donor's employer),
+            status, and due date period filters (see periods.date_range_condition)
+        group_by: any of AGING_GROUPS; empty for a single total row
+        as_of_date: day the ages are counted from (defaults to today)
+
+    Returns:
+        list of frappe._dict with the group_by columns, one column per
+        AGING_BUCKETS entry, total_outstanding, expected_amount,
+        actual_amount, entry_count and overdue_count
+    """
+    from united_way.periods import date_range_condition
+
+    filters = frappe._dict(filters or {})
+    for column in group_by:
+        if column not in AGING_GROUPS:
+            frappe.throw(f"Cannot group aging by '{column}'.")
+
+    conditions = ["p.docstatus = 1"]
+    values = {"as_of_date": getdate(as_of_date or nowdate()), "open_statuses": OPEN_SCHEDULE_STATUSES}
+
+    if filters.campaign:
+        conditions.append("p.campaign = %(campaign)s")
+        values["campaign"] = filters.campaign
+    if filters.organization:
+        conditions.append("p.donor_organization = %(organization)s")
+        values["organization"] = filters.organization
+    if filters.status and filters.status != "All":
+        conditions.append("pse.status = %(status)s")
+        values["status"] = filters.status
+
+    due_date_condition, due_date_values = date_range_condition("pse.due_date", filters)
+    conditions.append(due_date_condition)
+    values.update(due_date_values)
+
+    balance = "GREATEST(pse.expected_amount - IFNULL(pse.actual_amount, 0), 0)"
+    is_open = "pse.status IN %(open_statuses)s"
+    days = "DATEDIFF(%(as_of_date)s, pse.due_date)"
+
+    select = [f"{AGING_GROUPS[column]} AS {column}" for column in group_by]
+    for fieldname, label, first_day, last_day in AGING_BUCKETS:
+        bounds = [is_open]
+        if first_day is not None:
+            bounds.append(f"{days} >= {first_day}")
+        if last_day is not None:
+            bounds.append(f"{days} <= {last_day}")
+        select.append(f"SUM(CASE WHEN {' AND '.join(bounds)} THEN {balance} ELSE 0 END) AS {fieldname}")
+
+    select += [
+        f"SUM(CASE WHEN {is_open} THEN {balance} ELSE 0 END) AS total_outstanding",
+        "SUM(pse.expected_amount) AS expected_amount",
+        "SUM(IFNULL(pse.actual_amount, 0)) AS actual_amount",
+        "COUNT(*) AS entry_count",
+        f"SUM(CASE WHEN {is_open} AND {days} > 0 THEN 1 ELSE 0 END) AS overdue_count",
+    ]
+
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(select)}
+        FROM `tabPayment Schedule Entry` pse
+        JOIN `tabPledge` p ON pse.parent = p.name AND pse.parenttype = 'Pledge'
+        WHERE {" AND ".join(conditions)}
+        {"GROUP BY " + ", ".join(AGING_GROUPS[column] for column in group_by) if group_by else ""}
+    """, values, as_dict=True)
+
+    for row in rows:
+        for fieldname in [bucket[0] for bucket in AGING_BUCKETS] + ["total_outstanding", "expected_amount", "actual_amount"]:
+            row[fieldname] = flt(row[fieldname])
+        row.entry_count = cint(row.entry_count)
+        row.overdue_count = cint(row.overdue_count)
+
+    return rows
+
+
+@frappe.whitelist()
+def get_fiscal_year_collected(filters=None):
+    """Number Card: submitted donations dated in the current fiscal year."""
+    return {"value": _fiscal_year_total("Donation", "amount", "donation_date"), "fieldtype": "Currency"}
+
+
+@frappe.whitelist()
+def get_fiscal_year_pledged(filters=None):
+    """Number Card: submitted pledges dated in the current fiscal year."""
+    return {"value": _fiscal_year_total("Pledge", "pledge_amount", "pledge_date"), "fieldtype": "Currency"}
+
+
+def _fiscal_year_total(doctype, amount_field, date_field):
+    condition, values = date_range_condition(date_field, {"fiscal_year": get_fiscal_year(nowdate())})
+    return flt(frappe.db.sql(f"""
+        SELECT SUM({amount_field})
+        FROM `tab{doctype}`
+        WHERE docstatus = 1 AND {condition}
+    """, values)[0][0])
+
+
+def get_cached_report(report_name, campaign, compute):
+    """Result of ``compute()``, cached until the campaign's data version changes."""
+    if frappe.flags.uw_skip_report_cache:
+        return compute()
+
+    # Read the version before computing: a write that commits meanwhile
+    # bumps it, so a result built from older data is never served again
+    key = f"uw_report:{frappe.scrub(report_name)}:{campaign}:{get_campaign_version(campaign)}"
+    result = frappe.cache().get_value(key)
+    if result is None:
+        result = compute()
+        frappe.cache().set_value(key, result, expires_in_sec=REPORT_CACHE_SECONDS)
+    return result
+
+
+def get_campaign_version(campaign):
+    redis = frappe.cache()
+    return cint(redis.get(redis.make_key(f"uw_report_version:{campaign}")))
+
+
+def bump_campaign_versions(campaigns):
+    """Invalidate cached reports for these campaigns once the transaction commits.
+
+    Campaigns of the following year are invalidated too: their new donor
+    counts are measured against this year's donors.
+    """
+    campaigns = set(filter(None, campaigns))
+    if not campaigns:
+        return
+
+    pending = getattr(frappe.local, "uw_report_versions", None)
+    if pending is None:
+        pending = frappe.local.uw_report_versions = set()
+        frappe.db.after_commit.add(_bump_pending_versions)
+        frappe.db.after_rollback.add(_discard_pending_versions)
+    pending.update(campaigns)
+
+
+def bump_doc_campaign(doc, method=None):
+    """doc_events hook for Campaign and Campaign Drive saves."""
+    campaigns = [doc.name if doc.doctype == "Campaign" else doc.campaign]
+
+    # Moving a campaign to another year also changes the year after its old one
+    previous = doc.get_doc_before_save() if doc.doctype == "Campaign" else None
+    if previous and previous.campaign_year and previous.campaign_year != doc.campaign_year:
+        campaigns += frappe.get_all(
+            "Campaign", filters={"campaign_year": cint(previous.campaign_year) + 1}, pluck="name"
+        )
+
+    bump_campaign_versions(campaigns)
+
+
+def _bump_pending_versions():
+    pending = getattr(frappe.local, "uw_report_versions", None) or set()
+    frappe.local.uw_report_versions = None
+    if not pending:
+        return
+
+    pending.update(frappe.db.sql_list("""
+        SELECT name FROM `tabCampaign`
+        WHERE campaign_year IN (
+            SELECT campaign_year + 1 FROM `tabCampaign` WHERE name IN %(campaigns)s
+        )
+    """, {"campaigns": tuple(pending)}))
+
+    redis = frappe.cache()
+    for campaign in sorted(pending):
+        redis.incr(redis.make_key(f"uw_report_version:{campaign}"))
+
+
+def _discard_pending_versions():
+    frappe.local.uw_report_versions = None
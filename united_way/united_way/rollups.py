@@ -0,0 +1,238 @@
+"""Request-scoped rollup queue.
+
+Donation, Pledge and Pledge Writeoff hooks mark the pledges and campaign
+drives they touch as dirty instead of recalculating them inline, and
+accumulate campaign total deltas, donor giving deltas, agency fact deltas
+and journal entries for the outbox. The queue is flushed once per key, either when the outermost
+``batch()`` block exits or right before the transaction commits, so a
+Remittance with 5,000 items updates its campaign row once instead of
+5,000 times and records its journal entries with one bulk insert.
+
+Usage:
+    with rollups.batch():
+        for item in items:
+            make_donation(item).submit()
+"""
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import flt, getdate
+
+from united_way import identity_map
+from united_way.reporting import bump_campaign_versions
+
+
+def mark_pledge(pledge):
+    """Queue a pledge for collection field recalculation."""
+    if pledge:
+        _get_queue().pledges.add(pledge)
+
+
+def add_campaign_delta(campaign, pledged=0, pledges=0, donors=0, collected=0):
+    """Accumulate a change to a campaign's rollup totals."""
+    if not campaign:
+        return
+
+    deltas = _get_queue().campaigns.setdefault(
+        campaign, frappe._dict(pledged=0, pledges=0, donors=0, collected=0)
+    )
+    deltas.pledged += flt(pledged)
+    deltas.pledges += pledges
+    deltas.donors += donors
+    deltas.collected += flt(collected)
+
+
+def mark_drive(campaign, organization):
+    """Queue the Campaign Drive(s) for a campaign + employer pair."""
+    if campaign and organization:
+        _get_queue().drives.add((campaign, organization))
+
+
+def add_donor_gift(contact, donation_date, amount, cancelled=False):
+    """Accumulate a submitted (or cancelled) donation into a donor's giving stats."""
+    if not contact:
+        return
+
+    deltas = _get_queue().contacts.setdefault(
+        contact, frappe._dict(amount=0, years={}, last_gift=None, removed_dates=[])
+    )
+    sign = -1 if cancelled else 1
+    deltas.amount += sign * flt(amount)
+
+    if donation_date:
+        donation_date = getdate(donation_date)
+        # [amount, count, earliest submitted date, earliest cancelled date]
+        year = deltas.years.setdefault(donation_date.year, [0, 0, None, None])
+        year[0] += sign * flt(amount)
+        year[1] += sign
+        slot = 3 if cancelled else 2
+        if not year[slot] or donation_date < year[slot]:
+            year[slot] = donation_date
+
+        if cancelled:
+            deltas.removed_dates.append(donation_date)
+        elif not deltas.last_gift or donation_date >= deltas.last_gift[0]:
+            deltas.last_gift = (donation_date, flt(amount))
+
+
+def add_agency_fact(campaign, agency, designation_type, period, **measures):
+    """Accumulate a change to one Agency Campaign Fact row."""
+    if not (campaign and agency):
+        return
+
+    cell = _get_queue().agency_facts.setdefault((campaign, agency, designation_type or "", period), {})
+    for measure, delta in measures.items():
+        cell[measure] = cell.get(measure, 0) + delta
+
+
+def add_agency_split(pledge, period, **measures):
+    """Accumulate an amount to be spread across a pledge's agency allocations.
+
+    The pledge's allocations are read once for the whole queue at flush time.
+    """
+    if not pledge:
+        return
+
+    amounts = _get_queue().agency_splits.setdefault((pledge, period), {})
+    for measure, amount in measures.items():
+        amounts[measure] = amounts.get(measure, 0) + flt(amount)
+
+
+def add_journal_entry(entry):
+    """Queue a UW Journal Entry dict to be posted with the rest of the batch."""
+    _get_queue().journal_entries.append(entry)
+
+
+@contextmanager
+def batch():
+    """Defer rollup recalculation until the outermost batch exits.
+
+    Nested batches (a Remittance submitting Donations that each open their
+    own batch) only flush when the outermost one finishes. If the block
+    raises, nothing is flushed; the transaction is expected to roll back.
+    """
+    queue = _get_queue()
+    queue.depth += 1
+    try:
+        yield queue
+    finally:
+        queue.depth -= 1
+
+    if not queue.depth:
+        flush()
+
+
+def flush():
+    """Recalculate every queued entity exactly once and empty the queue."""
+    queue = getattr(frappe.local, "uw_rollup_queue", None)
+    if not queue or queue.depth:
+        return
+
+    # Detach first so that anything marked while flushing starts a new queue
+    frappe.local.uw_rollup_queue = None
+
+    _flush_pledges(sorted(queue.pledges))
+    _flush_campaigns(queue.campaigns)
+    _flush_drives(sorted(queue.drives))
+    fact_campaigns = _flush_agency_facts(queue.agency_facts, queue.agency_splits)
+    _flush_contacts(queue.contacts)
+    _flush_journal_entries(queue.journal_entries)
+
+    bump_campaign_versions(
+        set(queue.campaigns) | {campaign for campaign, organization in queue.drives} | fact_campaigns
+    )
+
+
+def discard():
+    """Drop queued work without recalculating (used on rollback)."""
+    frappe.local.uw_rollup_queue = None
+
+
+def _get_queue():
+    queue = getattr(frappe.local, "uw_rollup_queue", None)
+    if queue is None:
+        queue = frappe._dict(
+            pledges=set(),
+            campaigns={},
+            drives=set(),
+            contacts={},
+            agency_facts={},
+            agency_splits={},
+            journal_entries=[],
+            depth=0,
+        )
+        frappe.local.uw_rollup_queue = queue
+
+        # Safety net for marks made outside a batch() block
+        frappe.db.before_commit.add(flush)
+        frappe.db.after_rollback.add(discard)
+
+    return queue
+
+
+def _flush_pledges(pledge_names):
+    from united_way.uw_core.doctype.pledge.pledge import recompute_pledge_collections
+
+    recompute_pledge_collections(pledge_names)
+    identity_map.forget("Pledge", pledge_names)
+
+
+def _flush_campaigns(campaign_deltas):
+    from united_way.uw_core.doctype.campaign.campaign import apply_campaign_delta
+
+    for campaign_name in sorted(campaign_deltas):
+        deltas = campaign_deltas[campaign_name]
+        if any((deltas.pledged, deltas.pledges, deltas.donors, deltas.collected)):
+            apply_campaign_delta(campaign_name, **deltas)
+    identity_map.forget("Campaign", campaign_deltas)
+
+
+def _flush_drives(drive_keys):
+    for campaign, organization in drive_keys:
+        drive_names = frappe.get_all(
+            "Campaign Drive",
+            filters={"campaign": campaign, "organization": organization},
+            pluck="name",
+        )
+        for drive_name in drive_names:
+            frappe.get_doc("Campaign Drive", drive_name).update_drive_totals()
+
+
+def _flush_agency_facts(cells, splits):
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+        apply_fact_deltas,
+        split_by_allocation,
+    )
+
+    cells = dict(cells)
+    for key, amounts in split_by_allocation(splits).items():
+        cell = cells.setdefault(key, {})
+        for measure, amount in amounts.items():
+            cell[measure] = cell.get(measure, 0) + amount
+
+    if cells:
+        apply_fact_deltas(cells)
+    return {campaign for campaign, agency, designation_type, period in cells}
+
+
+def _flush_contacts(contact_deltas):
+    from united_way.uw_core.doctype.contact.contact import apply_donor_delta
+
+    identity_map.forget("Contact", contact_deltas)
+    for contact_name in sorted(contact_deltas):
+        frappe.db.savepoint("uw_donor_stats")
+        try:
+            apply_donor_delta(contact_name, **contact_deltas[contact_name])
+        except Exception:
+            frappe.db.rollback(save_point="uw_donor_stats")
+            # Don't block donation processing if stats update fails
+            frappe.log_error(
+                f"Failed to update donor stats for Contact {contact_name}",
+                "Donor Stats Rollup Error",
+            )
+
+
+def _flush_journal_entries(entries):
+    from united_way.journal_outbox import add_to_outbox
+
+    add_to_outbox(entries)
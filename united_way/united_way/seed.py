@@ -10,6 +10,8 @@ import frappe
 from frappe.utils import add_days, nowdate, getdate
 import random
 
+from united_way import rollups
+
 
 def run():
     """Main entry point for seeding data."""
@@ -20,8 +22,9 @@ def run():
     agencies = create_organizations()
     contacts = create_contacts(agencies)
     campaigns = create_campaigns()
-    pledges = create_pledges(contacts, campaigns, agencies)
-    create_donations(pledges)
+    with rollups.batch():
+        pledges = create_pledges(contacts, campaigns, agencies)
+        create_donations(pledges)
 
     frappe.db.commit()
     frappe.flags.ignore_permissions = False
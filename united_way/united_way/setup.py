@@ -3,11 +3,16 @@ import frappe
 
 def after_install():
     """Run after app installation to set up roles and defaults."""
+    from united_way.indexes import ensure_indexes
+    from united_way.uw_core.doctype.fiscal_date.fiscal_date import ensure_fiscal_dates
+
     create_roles()
     create_default_settings()
     create_pledge_workflow()
     create_email_templates()
     setup_dashboard()
+    ensure_indexes()
+    ensure_fiscal_dates()
     frappe.db.commit()
     print("United Way app setup complete.")
 
@@ -57,6 +62,8 @@ def create_default_settings():
             "pledge_reminder_days": 30,
             "send_pledge_confirmations": 1,
             "send_donation_receipts": 1,
+            "background_item_threshold": 200,
+            "item_chunk_size": 500,
         })
         settings.insert(ignore_permissions=True)
         print("  Created default UW Settings")
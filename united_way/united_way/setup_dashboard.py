@@ -38,6 +38,20 @@ def create_number_cards():
             "stats_time_interval": "Monthly",
             "color": "#5AD8A6",
         },
+        {
+            "name": "Collected This Fiscal Year",
+            "label": "Collected This Fiscal Year",
+            "type": "Custom",
+            "method": "united_way.reporting.get_fiscal_year_collected",
+            "color": "#5AD8A6",
+        },
+        {
+            "name": "Pledged This Fiscal Year",
+            "label": "Pledged This Fiscal Year",
+            "type": "Custom",
+            "method": "united_way.reporting.get_fiscal_year_pledged",
+            "color": "#5B8FF9",
+        },
         {
             "name": "Active Campaigns",
             "label": "Active Campaigns",
@@ -65,8 +79,10 @@ def create_number_cards():
             "doctype": "Number Card",
             "name": card_data["name"],
             "label": card_data["label"],
-            "document_type": card_data["document_type"],
-            "function": card_data["function"],
+            "type": card_data.get("type", "Document Type"),
+            "method": card_data.get("method"),
+            "document_type": card_data.get("document_type"),
+            "function": card_data.get("function", "Count"),
             "aggregate_function_based_on": card_data.get("aggregate_function_based_on", ""),
             "filters_json": card_data.get("filters_json", "{}"),
             "show_percentage_stats": card_data.get("show_percentage_stats", 0),
@@ -0,0 +1,390 @@
+"""
+Synthetic data generator for load and performance testing.
+
+Usage:
+    bench --site uw.localhost uw-generate-synthetic --scale 100k
+    bench --site uw.localhost execute united_way.synthetic.generate --kwargs "{'contacts': 5000}"
+
+Unlike seed.py, which builds a small demo through the document API, this
+writes submitted rows straight to the tables with frappe.db.bulk_insert.
+Every name is pre-allocated from a counter under the SYN- prefix (so
+naming series are never touched and a run can be purged), every value
+comes from one seeded random.Random (the same parameters always produce
+the same data), and the rollups are rebuilt once at the end instead of
+per document. Accounting is skipped: no journal entries or outbox rows.
+"""
+import random
+
+import frappe
+from frappe.utils import add_days, add_months, cint, flt, getdate, nowdate
+
+PREFIX = "SYN-"
+
+DEFAULTS = {
+    "seed": 42,
+    "agencies": 25,
+    "employers": 100,
+    "contacts": 5000,
+    "campaigns": 3,
+    "pledges_per_campaign": 2000,
+    # Each pledge is split across 1..max_allocations agencies
+    "max_allocations": 3,
+    # Relative weights of the pledge payment frequencies
+    "frequency_mix": {
+        "One-Time": 35,
+        "Weekly": 10,
+        "Bi-Weekly": 25,
+        "Monthly": 20,
+        "Quarterly": 5,
+        "Annually": 5,
+    },
+    # Average donations per installment pledge, capped by its installments
+    "donations_per_pledge": 6,
+    "with_schedules": False,
+    # Month-end Receivable Aging Snapshots taken after loading (needs with_schedules)
+    "aging_snapshots": 0,
+    "first_year": 2021,
+    # Pledges generated, inserted and committed together
+    "chunk_size": 5000,
+}
+
+SCALES = {
+    "10k": {"contacts": 8000, "employers": 50, "campaigns": 2, "pledges_per_campaign": 5000},
+    "100k": {"contacts": 60000, "employers": 200, "campaigns": 4, "pledges_per_campaign": 25000},
+    "1m": {
+        "contacts": 300000, "employers": 1000, "agencies": 60, "campaigns": 5,
+        "pledges_per_campaign": 200000, "donations_per_pledge": 15,
+    },
+}
+
+INSTALLMENTS = {"One-Time": 1, "Weekly": 52, "Bi-Weekly": 26, "Monthly": 12, "Quarterly": 4, "Annually": 1}
+INTERVALS = {"Weekly": (7, 0), "Bi-Weekly": (14, 0), "Monthly": (0, 1), "Quarterly": (0, 3), "Annually": (0, 12)}
+PLEDGE_AMOUNTS = [52, 104, 260, 520, 1000, 1300, 2600, 5200, 10000]
+DESIGNATIONS = ["Donor Designated", "Community Impact Fund", "Specific Program", "Undesignated"]
+DONATION_METHODS = {
+    "Payroll Deduction": "Payroll Deduction",
+    "Credit Card": "Credit Card",
+    "Check": "Check",
+    "One-Time Gift": "Online",
+}
+
+STANDARD_FIELDS = ["name", "creation", "modified", "owner", "modified_by", "docstatus"]
+CHILD_FIELDS = STANDARD_FIELDS + ["parent", "parenttype", "parentfield", "idx"]
+
+
+def get_params(params=None, scale=None):
+    """DEFAULTS overlaid with a named scale and then explicit parameters."""
+    unknown = set(params or {}) - set(DEFAULTS)
+    if unknown:
+        frappe.throw(f"Unknown synthetic data parameter(s): {', '.join(sorted(unknown))}")
+    if scale and scale not in SCALES:
+        frappe.throw(f"Scale must be one of {', '.join(SCALES)}.")
+
+    result = frappe._dict(DEFAULTS)
+    result.update(SCALES.get(scale) or {})
+    result.update({key: value for key, value in (params or {}).items() if value is not None})
+    return result
+
+
+def generate(scale=None, **params):
+    """Purge any earlier synthetic data and generate a new set.
+
+    Returns:
+        {doctype: rows inserted}
+    """
+    params = get_params(params, scale)
+    rng = random.Random(cint(params.seed))
+    timestamp = f"{params.first_year}-01-01 00:00:00"
+    counts = {}
+
+    purge()
+
+    agencies = _insert_organizations(params.agencies, "Agency", timestamp, agency_codes=True)
+    employers = _insert_organizations(params.employers, "Employer", timestamp)
+    counts["Organization"] = len(agencies) + len(employers)
+
+    contact_employers = [
+        rng.choice(employers) if employers and rng.random() < 0.8 else None
+        for i in range(params.contacts)
+    ]
+    counts["Contact"] = _insert_contacts(contact_employers, timestamp)
+
+    campaigns = _insert_campaigns(params, timestamp)
+    counts["Campaign"] = len(campaigns)
+    frappe.db.commit()
+
+    frequencies = list(params.frequency_mix)
+    weights = [params.frequency_mix[frequency] for frequency in frequencies]
+    counters = {"pledge": 0, "donation": 0, "allocation": 0, "schedule": 0}
+    today = getdate(nowdate())
+
+    for campaign in campaigns:
+        if params.pledges_per_campaign <= params.contacts:
+            donors = rng.sample(range(params.contacts), params.pledges_per_campaign)
+        else:
+            donors = [rng.randrange(params.contacts) for i in range(params.pledges_per_campaign)]
+
+        for start in range(0, len(donors), params.chunk_size):
+            rows = {"Pledge": [], "Pledge Allocation": [], "Donation": [], "Payment Schedule Entry": []}
+            for donor_index in donors[start:start + params.chunk_size]:
+                _add_pledge(
+                    rows, rng, params, campaign, donor_index, contact_employers[donor_index],
+                    agencies, rng.choices(frequencies, weights)[0], counters, timestamp, today,
+                )
+            _insert_rows(rows, params.chunk_size)
+            frappe.db.commit()
+
+    counts["Pledge"] = counters["pledge"]
+    counts["Pledge Allocation"] = counters["allocation"]
+    counts["Donation"] = counters["donation"]
+    counts["Payment Schedule Entry"] = counters["schedule"]
+
+    rebuild_rollups([campaign.name for campaign in campaigns])
+    frappe.db.commit()
+
+    if params.with_schedules and params.aging_snapshots:
+        counts["Receivable Aging Snapshot"] = take_aging_snapshots(cint(params.aging_snapshots), today)
+    return counts
+
+
+def rebuild_rollups(campaigns):
+    """Rebuild every rollup the document hooks would have maintained, once."""
+    from united_way.cache import clear_organization_cache
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import rebuild_agency_facts
+    from united_way.uw_core.doctype.campaign.campaign import recalculate_campaign
+    from united_way.uw_core.doctype.campaign_donor.campaign_donor import rebuild_campaign_donors
+    from united_way.uw_core.doctype.contact.contact import rebuild_all_donor_stats
+    from united_way.uw_core.doctype.fiscal_date.fiscal_date import ensure_fiscal_dates
+
+    rebuild_all_donor_stats()
+    frappe.db.commit()
+
+    for campaign in campaigns:
+        rebuild_campaign_donors(campaign)
+        recalculate_campaign(campaign)
+        rebuild_agency_facts(campaign)
+        frappe.db.commit()
+
+    ensure_fiscal_dates()
+    clear_organization_cache()
+
+
+def take_aging_snapshots(months, today):
+    """Aging snapshots at the end of each of the last ``months`` months, for the trend report.
+
+    Returns:
+        Number of snapshot rows written
+    """
+    from united_way.uw_core.doctype.receivable_aging_snapshot.receivable_aging_snapshot import (
+        take_aging_snapshot,
+    )
+
+    rows = 0
+    for i in range(months - 1, -1, -1):
+        rows += take_aging_snapshot(add_days(add_months(today.replace(day=1), -i), -1))
+        frappe.db.commit()
+    return rows
+
+
+def purge(batch_size=50000):
+    """Delete all SYN- rows and the rollup rows built from them."""
+    from united_way.cache import clear_organization_cache
+
+    like = f"{PREFIX}%"
+    campaigns = frappe.get_all("Campaign", filters={"name": ("like", like)}, pluck="name")
+    if campaigns:
+        for doctype in ("Campaign Donor", "Agency Campaign Fact", "Agency Campaign Donor",
+                        "Receivable Aging Snapshot"):
+            frappe.db.delete(doctype, {"campaign": ("in", campaigns)})
+    frappe.db.delete("Donor Giving Year", {"donor": ("like", like)})
+
+    for doctype in ("Payment Schedule Entry", "Pledge Allocation", "Donation", "Pledge",
+                    "Contact", "Campaign", "Organization"):
+        # Small batches keep each transaction's undo log bounded
+        while frappe.db.sql(f"SELECT 1 FROM `tab{doctype}` WHERE name LIKE %s LIMIT 1", like):
+            frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name LIKE %s LIMIT {cint(batch_size)}", like)
+            frappe.db.commit()
+
+    clear_organization_cache()
+
+
+def _insert_organizations(count, kind, timestamp, agency_codes=False):
+    names = [f"{PREFIX}{kind}-{i:05d}" for i in range(1, count + 1)]
+    fields = STANDARD_FIELDS + ["organization_name", "organization_type", "status"]
+    if agency_codes:
+        fields.append("agency_code")
+    else:
+        fields.append("workplace_campaign")
+
+    organization_type = "Member Agency" if agency_codes else "Corporate Donor"
+    frappe.db.bulk_insert("Organization", fields=fields, values=[
+        (name, timestamp, timestamp, "Administrator", "Administrator", 0,
+         name, organization_type, "Active", f"S{i:05d}" if agency_codes else 1)
+        for i, name in enumerate(names, 1)
+    ])
+    return names
+
+
+def _insert_contacts(contact_employers, timestamp):
+    frappe.db.bulk_insert(
+        "Contact",
+        fields=STANDARD_FIELDS + ["first_name", "last_name", "full_name", "contact_type", "organization", "status"],
+        values=(
+            (_contact_name(i), timestamp, timestamp, "Administrator", "Administrator", 0,
+             "Synthetic", f"Donor {i:07d}", f"Synthetic Donor {i:07d}", "Individual Donor", employer, "Active")
+            for i, employer in enumerate(contact_employers)
+        ),
+        chunk_size=10000,
+    )
+    return len(contact_employers)
+
+
+def _insert_campaigns(params, timestamp):
+    campaigns = []
+    for i in range(params.campaigns):
+        year = params.first_year + i
+        campaigns.append(frappe._dict(
+            name=f"{PREFIX}CAMP-{i + 1:03d}",
+            campaign_name=f"Synthetic {year} Annual Campaign",
+            campaign_year=year,
+            start_date=getdate(f"{year}-01-15"),
+            end_date=getdate(f"{year}-12-31"),
+            fundraising_goal=params.pledges_per_campaign * 1000,
+            status="Closed" if year < getdate(nowdate()).year else "Active",
+        ))
+
+    frappe.db.bulk_insert(
+        "Campaign",
+        fields=STANDARD_FIELDS + ["campaign_name", "campaign_type", "campaign_year", "start_date",
+                                  "end_date", "fundraising_goal", "status"],
+        values=[
+            (c.name, timestamp, timestamp, "Administrator", "Administrator", 1,
+             c.campaign_name, "Annual Campaign", c.campaign_year, c.start_date,
+             c.end_date, c.fundraising_goal, c.status)
+            for c in campaigns
+        ],
+    )
+    return campaigns
+
+
+def _add_pledge(rows, rng, params, campaign, donor_index, employer, agencies, frequency,
+                counters, timestamp, today):
+    """Append one submitted pledge with its allocations, donations and schedule to rows."""
+    counters["pledge"] += 1
+    pledge = f"{PREFIX}PLG-{counters['pledge']:08d}"
+    donor = _contact_name(donor_index)
+    donor_name = f"Synthetic Donor {donor_index:07d}"
+    amount = rng.choice(PLEDGE_AMOUNTS)
+    pledge_date = add_days(campaign.start_date, rng.randint(0, 60))
+    installments = INSTALLMENTS[frequency]
+
+    if frequency == "One-Time":
+        payment_method = rng.choice(["One-Time Gift", "Credit Card", "Check"])
+        paid = 1 if rng.random() < 0.8 else 0
+    else:
+        payment_method = "Payroll Deduction" if employer else "Credit Card"
+        paid = min(installments, rng.randint(0, 2 * cint(params.donations_per_pledge)))
+
+    # Installment due dates and amounts; the last one absorbs the rounding
+    first_due = add_days(pledge_date, 14) if installments > 1 else pledge_date
+    installment_amount = flt(amount / installments, 2)
+    schedule = []
+    for i in range(installments):
+        days, months = INTERVALS.get(frequency, (0, 0))
+        due_date = add_months(first_due, i * months) if months else add_days(first_due, i * days)
+        expected = installment_amount if i < installments - 1 else flt(amount - installment_amount * i, 2)
+        schedule.append((getdate(due_date), expected))
+
+    collected = 0
+    last_payment_date = None
+    donations = []
+    for due_date, expected in schedule[:paid]:
+        counters["donation"] += 1
+        donation = f"{PREFIX}DON-{counters['donation']:09d}"
+        donations.append(donation)
+        collected += expected
+        last_payment_date = due_date
+        rows["Donation"].append((
+            donation, timestamp, timestamp, "Administrator", "Administrator", 1,
+            due_date, donor, donor_name, campaign.name, pledge, expected,
+            DONATION_METHODS[payment_method], 1, expected,
+        ))
+
+    collected = flt(collected, 2)
+    if not collected:
+        collection_status = "Not Started"
+    elif collected >= amount:
+        collection_status = "Fully Collected"
+    else:
+        collection_status = "In Progress"
+
+    payroll = payment_method == "Payroll Deduction"
+    rows["Pledge"].append((
+        pledge, timestamp, timestamp, "Administrator", "Administrator", 1,
+        campaign.name, donor, donor_name, employer, pledge_date, amount, payment_method, frequency,
+        employer if payroll else None,
+        installment_amount if payroll else 0,
+        installments if payroll else 0,
+        first_due if payroll else None,
+        schedule[-1][0] if payroll else None,
+        collected, flt(amount - collected, 2), collected / amount * 100, collection_status,
+        last_payment_date, "Approved",
+    ))
+
+    # Whole-percent split across distinct agencies
+    count = min(rng.randint(1, params.max_allocations), len(agencies))
+    cuts = sorted(rng.sample(range(1, 100), count - 1))
+    percentages = [b - a for a, b in zip([0] + cuts, cuts + [100])]
+    for idx, (agency_index, percentage) in enumerate(zip(rng.sample(range(len(agencies)), count), percentages), 1):
+        counters["allocation"] += 1
+        rows["Pledge Allocation"].append((
+            f"{PREFIX}PA-{counters['allocation']:09d}", timestamp, timestamp, "Administrator", "Administrator", 1,
+            pledge, "Pledge", "allocations", idx,
+            agencies[agency_index], f"S{agency_index + 1:05d}", rng.choice(DESIGNATIONS),
+            percentage, flt(amount * percentage / 100, 2),
+        ))
+
+    if params.with_schedules:
+        for idx, (due_date, expected) in enumerate(schedule, 1):
+            donation = donations[idx - 1] if idx <= paid else None
+            if donation:
+                status = "Paid"
+            else:
+                status = "Overdue" if due_date < today else "Pending"
+            counters["schedule"] += 1
+            rows["Payment Schedule Entry"].append((
+                f"{PREFIX}PSE-{counters['schedule']:09d}", timestamp, timestamp, "Administrator", "Administrator", 1,
+                pledge, "Pledge", "payment_schedule", idx,
+                due_date, expected, status, expected if donation else 0, donation,
+            ))
+
+
+ROW_FIELDS = {
+    "Pledge": STANDARD_FIELDS + [
+        "campaign", "donor", "donor_name", "donor_organization", "pledge_date", "pledge_amount",
+        "payment_method", "payment_frequency", "employer", "deduction_per_period",
+        "number_of_deductions", "payroll_start_date", "payroll_end_date",
+        "total_collected", "outstanding_balance", "collection_percentage", "collection_status",
+        "last_payment_date", "workflow_state",
+    ],
+    "Pledge Allocation": CHILD_FIELDS + [
+        "agency", "agency_code", "designation_type", "percentage", "allocated_amount",
+    ],
+    "Donation": STANDARD_FIELDS + [
+        "donation_date", "donor", "donor_name", "campaign", "pledge", "amount",
+        "payment_method", "tax_deductible", "tax_deductible_amount",
+    ],
+    "Payment Schedule Entry": CHILD_FIELDS + [
+        "due_date", "expected_amount", "status", "actual_amount", "donation",
+    ],
+}
+
+
+def _insert_rows(rows, chunk_size):
+    for doctype, values in rows.items():
+        if values:
+            frappe.db.bulk_insert(doctype, fields=ROW_FIELDS[doctype], values=values, chunk_size=chunk_size)
+
+
+def _contact_name(index):
+    return f"{PREFIX}CON-{index:07d}"
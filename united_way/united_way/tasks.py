@@ -1,10 +1,14 @@
 import frappe
 from frappe.utils import add_days, nowdate, getdate
 
+from united_way import identity_map
+
 
 def daily_pledge_reminders():
     """Send reminders for pledges with outstanding balances past the reminder threshold."""
-    settings = frappe.get_single("UW Settings")
+    from united_way.cache import get_settings
+
+    settings = get_settings()
     reminder_days = settings.pledge_reminder_days or 30
 
     cutoff_date = add_days(nowdate(), -reminder_days)
@@ -19,9 +23,15 @@ def daily_pledge_reminders():
         fields=["name", "donor", "donor_name", "pledge_amount", "total_collected", "outstanding_balance", "campaign"],
     )
 
+    contacts = identity_map.get_headers(
+        "Contact",
+        [pledge.donor for pledge in overdue_pledges],
+        ["email", "do_not_contact", "do_not_email"],
+    )
+
     for pledge in overdue_pledges:
         # Check if donor has email and is contactable
-        contact = frappe.get_doc("Contact", pledge.donor)
+        contact = contacts.get(pledge.donor) or frappe._dict()
         if contact.email and not contact.do_not_contact and not contact.do_not_email:
             # TODO: Send email notification
             frappe.logger().info(
@@ -53,6 +63,67 @@ def mark_overdue_payment_schedules():
         frappe.db.commit()
 
 
+def snapshot_receivable_aging():
+    """Record today's payment schedule aging buckets for receivables trending."""
+    from united_way.uw_core.doctype.receivable_aging_snapshot.receivable_aging_snapshot import (
+        take_aging_snapshot,
+    )
+
+    take_aging_snapshot()
+    frappe.db.commit()
+
+
+def reconcile_campaign_totals():
+    """Check delta-maintained campaign totals against their source rows and repair drift."""
+    from united_way.uw_core.doctype.campaign.campaign import reconcile_campaign_totals as reconcile
+
+    drifted = reconcile(repair=True)
+    if drifted:
+        frappe.logger().warning(
+            f"Repaired campaign totals drift on {len(drifted)} campaign(s): "
+            + ", ".join(row["campaign"] for row in drifted)
+        )
+    frappe.db.commit()
+
+
+def reconcile_agency_facts():
+    """Check every agency fact measure against its source documents and rebuild drifted campaigns."""
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+        reconcile_agency_facts as reconcile,
+    )
+
+    drifted = reconcile(repair=True)
+    if drifted:
+        frappe.logger().warning(
+            f"Rebuilt agency facts for {len(drifted)} campaign(s): "
+            + ", ".join(row["campaign"] for row in drifted)
+        )
+    frappe.db.commit()
+
+
+def extend_fiscal_dates():
+    """Keep the Fiscal Date rows covering every dated record and the coming years."""
+    from united_way.uw_core.doctype.fiscal_date.fiscal_date import ensure_fiscal_dates
+
+    ensure_fiscal_dates()
+    frappe.db.commit()
+
+
+def drain_journal_entry_outbox():
+    """Post any journal entries still waiting in the outbox."""
+    from united_way.journal_outbox import drain_outbox
+
+    drain_outbox()
+
+
+def purge_journal_entry_outbox():
+    """Remove posted outbox rows older than 30 days."""
+    from united_way.journal_outbox import purge_posted
+
+    purge_posted()
+    frappe.db.commit()
+
+
 def weekly_campaign_summary():
     """Generate weekly summary of active campaign progress."""
     active_campaigns = frappe.get_all(
@@ -74,6 +145,8 @@ def weekly_campaign_summary():
 
 def monthly_agency_distribution():
     """Calculate and log monthly agency distribution summaries for active campaigns."""
+    from united_way.reporting import get_agency_totals
+
     active_campaigns = frappe.get_all(
         "Campaign",
         filters={"status": "Active", "docstatus": 1},
@@ -81,24 +154,12 @@ def monthly_agency_distribution():
     )
 
     for campaign_name in active_campaigns:
-        distributions = frappe.db.sql("""
-            SELECT
-                pa.agency,
-                o.organization_name,
-                SUM(pa.allocated_amount) as total_allocated,
-                COUNT(DISTINCT p.donor) as donor_count
-            FROM `tabPledge Allocation` pa
-            JOIN `tabPledge` p ON pa.parent = p.name
-            JOIN `tabOrganization` o ON pa.agency = o.name
-            WHERE p.campaign = %s AND p.docstatus = 1
-            GROUP BY pa.agency, o.organization_name
-            ORDER BY total_allocated DESC
-        """, campaign_name, as_dict=True)
+        distributions = get_agency_totals({"campaign": campaign_name})
 
         for dist in distributions:
             frappe.logger().info(
-                f"Distribution [{campaign_name}] {dist.organization_name}: "
-                f"${dist.total_allocated:,.2f} from {dist.donor_count} donors"
+                f"Distribution [{campaign_name}] {dist.agency_name or dist.agency}: "
+                f"${dist.allocated_amount:,.2f} from {dist.donor_count} donors"
             )
 
     frappe.db.commit()
@@ -0,0 +1,58 @@
+import frappe
+import unittest
+
+from united_way.benchmark import NO_BUDGET, check_budget, load_budgets, run_case
+
+
+class TestBenchmark(unittest.TestCase):
+    """Tests for the report benchmark measurements and budget checks."""
+
+    @classmethod
+    def setUpClass(cls):
+        frappe.flags.ignore_permissions = True
+
+        if not frappe.db.exists("Campaign", {"campaign_name": "_Test Benchmark Campaign"}):
+            camp = frappe.get_doc({
+                "doctype": "Campaign",
+                "campaign_name": "_Test Benchmark Campaign",
+                "campaign_type": "Annual Campaign",
+                "campaign_year": 2099,
+                "status": "Active",
+                "start_date": "2099-01-01",
+                "end_date": "2099-12-31",
+                "fundraising_goal": 100000,
+            })
+            camp.insert()
+            camp.submit()
+
+        cls.campaign_name = frappe.db.get_value(
+            "Campaign", {"campaign_name": "_Test Benchmark Campaign"}, "name"
+        )
+
+    def test_run_case_counts_queries(self):
+        """run_case should time a report and count the queries it sends."""
+        result = run_case("Executive Summary", {"campaign": self.campaign_name}, repeat=2)
+        self.assertNotIn("error", result)
+        self.assertGreater(result["queries"], 0)
+        self.assertGreater(result["rows"], 0)
+
+    def test_check_budget_flags_measures_over_budget(self):
+        """Measures over budget plus tolerance should be reported; query counts are exact."""
+        result = {"wall_time": 0.5, "queries": 12, "rows_examined": 1000}
+        tolerance = {"wall_time": 0.25, "queries": 0, "rows_examined": 0.1}
+
+        budget = {"wall_time": 0.45, "queries": 12, "rows_examined": 950}
+        self.assertEqual(check_budget(result, budget, tolerance), [])
+
+        budget["queries"] = 11
+        self.assertEqual(check_budget(result, budget, tolerance), ["queries: 12 > 11"])
+
+    def test_missing_budget_is_reported(self):
+        """A case without a budget should fail the run instead of passing silently."""
+        result = {"wall_time": 0.5, "queries": 12, "rows_examined": 1000}
+        self.assertEqual(check_budget(result, None, {}), [NO_BUDGET])
+        self.assertEqual(check_budget(dict(result, error="Traceback"), None, {}), [])
+
+        budget_file = load_budgets()
+        self.assertIn("budgets", budget_file)
+        self.assertIn("tolerance", budget_file)
@@ -12,3 +12,38 @@ def format_currency_short(value):
         return f"${value / 1_000:.1f}K"
     else:
         return f"${value:,.0f}"
+
+
+def bulk_update(doctype, updates, chunk_size=500):
+    """Write per-row column values with one UPDATE ... CASE statement per chunk.
+
+    Args:
+        doctype: DocType (or child table) to update
+        updates: {name: {fieldname: value}}; every row must set the same fields
+        chunk_size: Rows per statement
+    """
+    names = list(updates)
+    if not names:
+        return
+
+    fieldnames = list(updates[names[0]])
+    for start in range(0, len(names), chunk_size):
+        chunk = names[start:start + chunk_size]
+        values = {}
+        assignments = []
+
+        for i, name in enumerate(chunk):
+            values[f"n{i}"] = name
+
+        for fieldname in fieldnames:
+            cases = []
+            for i, name in enumerate(chunk):
+                values[f"{fieldname}_{i}"] = updates[name][fieldname]
+                cases.append(f"WHEN %(n{i})s THEN %({fieldname}_{i})s")
+            assignments.append(f"`{fieldname}` = CASE name {' '.join(cases)} END")
+
+        frappe.db.sql(f"""
+            UPDATE `tab{doctype}`
+            SET {', '.join(assignments)}
+            WHERE name IN ({', '.join(f'%(n{i})s' for i in range(len(chunk)))})
+        """, values)
@@ -0,0 +1,77 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate
+
+
+class AgencyCampaignDonor(Document):
+    pass
+
+
+def on_doctype_update():
+    """One membership row per (campaign, agency, donor)."""
+    frappe.db.add_unique(
+        "Agency Campaign Donor", ["campaign", "agency", "donor"],
+        constraint_name="unique_agency_campaign_donor",
+    )
+
+
+def update_agency_donor(campaign, agency, donor):
+    """Re-derive the bucket a donor is counted under at an agency, after a pledge submit or cancel.
+
+    Like rebuild_agency_facts, the donor is counted under the first
+    allocation to the agency of their earliest submitted pledge in the
+    campaign, by (pledge_date, name). Call this after the pledge's docstatus
+    is saved.
+
+    Returns:
+        list of ((designation_type, period), donor_count delta) to apply to
+        the Agency Campaign Fact rows: the bucket the donor left (-1) and the
+        one they are now counted under (+1), or nothing if it did not change
+    """
+    from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import get_period
+
+    row = frappe.db.get_value(
+        "Agency Campaign Donor",
+        {"campaign": campaign, "agency": agency, "donor": donor},
+        ["name", "designation_type", "period"],
+        as_dict=True,
+        for_update=True,
+    )
+
+    first = frappe.db.sql("""
+        SELECT IFNULL(pa.designation_type, '') AS designation_type, p.pledge_date,
+               COUNT(*) OVER () AS pledge_count
+        FROM `tabPledge Allocation` pa
+        JOIN `tabPledge` p ON pa.parent = p.name
+        WHERE p.campaign = %(campaign)s AND p.donor = %(donor)s AND pa.agency = %(agency)s
+          AND p.docstatus = 1 AND pa.parenttype = 'Pledge'
+        ORDER BY p.pledge_date, p.name, pa.idx
+        LIMIT 1
+    """, {"campaign": campaign, "agency": agency, "donor": donor}, as_dict=True)
+
+    old_bucket = (row.designation_type or "", getdate(row.period)) if row else None
+    new_bucket = (first[0].designation_type, get_period(first[0].pledge_date)) if first else None
+
+    if not first:
+        if row:
+            frappe.db.delete("Agency Campaign Donor", {"name": row.name})
+    elif row:
+        frappe.db.set_value("Agency Campaign Donor", row.name, {
+            "pledge_count": first[0].pledge_count,
+            "designation_type": new_bucket[0],
+            "period": new_bucket[1],
+        }, update_modified=False)
+    else:
+        frappe.get_doc({
+            "doctype": "Agency Campaign Donor",
+            "campaign": campaign,
+            "agency": agency,
+            "donor": donor,
+            "pledge_count": first[0].pledge_count,
+            "designation_type": new_bucket[0],
+            "period": new_bucket[1],
+        }).db_insert()
+
+    if old_bucket == new_bucket:
+        return []
+    return [(bucket, delta) for bucket, delta in ((old_bucket, -1), (new_bucket, 1)) if bucket]
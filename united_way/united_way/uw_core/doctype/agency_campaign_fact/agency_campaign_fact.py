@@ -0,0 +1,257 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, getdate, now
+
+DIMENSIONS = ["campaign", "agency", "designation_type", "period"]
+MEASURES = ["allocated_amount", "collected_amount", "written_off_amount", "pledge_count", "donor_count"]
+
+
+class AgencyCampaignFact(Document):
+    pass
+
+
+def on_doctype_update():
+    """One row per (campaign, agency, designation type, month)."""
+    frappe.db.add_unique("Agency Campaign Fact", DIMENSIONS, constraint_name="unique_agency_campaign_fact")
+
+
+def get_period(date):
+    """Month a pledge, donation or write-off is reported under (its first day)."""
+    return getdate(date).replace(day=1)
+
+
+def split_by_allocation(splits):
+    """Spread per-pledge amounts across each pledge's agency allocations.
+
+    Args:
+        splits: {(pledge, period): {measure: amount}}
+
+    Returns:
+        {(campaign, agency, designation_type, period): {measure: amount}}
+    """
+    pledges = sorted({pledge for pledge, period in splits})
+    if not pledges:
+        return {}
+
+    allocations = {}
+    for row in frappe.db.sql("""
+        SELECT pa.parent AS pledge, p.campaign, pa.agency,
+               IFNULL(pa.designation_type, '') AS designation_type, pa.percentage
+        FROM `tabPledge Allocation` pa
+        JOIN `tabPledge` p ON pa.parent = p.name
+        WHERE pa.parent IN %(pledges)s AND pa.parenttype = 'Pledge'
+          AND p.campaign IS NOT NULL AND pa.agency IS NOT NULL
+    """, {"pledges": tuple(pledges)}, as_dict=True):
+        allocations.setdefault(row.pledge, []).append(row)
+
+    cells = {}
+    for (pledge, period), amounts in splits.items():
+        for allocation in allocations.get(pledge, []):
+            cell = cells.setdefault(
+                (allocation.campaign, allocation.agency, allocation.designation_type, period), {}
+            )
+            for measure, amount in amounts.items():
+                cell[measure] = cell.get(measure, 0) + flt(amount) * flt(allocation.percentage) / 100
+
+    return cells
+
+
+def apply_fact_deltas(cells, chunk_size=500):
+    """Add measure deltas to fact rows, creating missing rows.
+
+    Each chunk is a single INSERT ... ON DUPLICATE KEY UPDATE against the
+    unique (campaign, agency, designation_type, period) key. Rows left with
+    nothing in them (everything behind them was cancelled) are deleted.
+
+    Args:
+        cells: {(campaign, agency, designation_type, period): {measure: delta}}
+    """
+    rows = [
+        (key, deltas) for key, deltas in sorted(cells.items(), key=lambda item: str(item[0]))
+        if any(flt(deltas.get(measure)) for measure in MEASURES)
+    ]
+
+    timestamp = now()
+    user = frappe.session.user
+    columns = ["name", "creation", "modified", "owner", "modified_by"] + DIMENSIONS + MEASURES
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    updates = ", ".join(f"`{m}` = `{m}` + VALUES(`{m}`)" for m in MEASURES)
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        values = []
+        for (campaign, agency, designation_type, period), deltas in chunk:
+            values.extend([frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+                           campaign, agency, designation_type or "", period])
+            values.extend(
+                cint(deltas.get(m)) if m.endswith("_count") else flt(deltas.get(m))
+                for m in MEASURES
+            )
+
+        frappe.db.sql(f"""
+            INSERT INTO `tabAgency Campaign Fact` ({", ".join(f"`{c}`" for c in columns)})
+            VALUES {", ".join([placeholders] * len(chunk))}
+            ON DUPLICATE KEY UPDATE {updates}, `modified` = VALUES(`modified`)
+        """, values)
+
+    if rows:
+        frappe.db.sql("""
+            DELETE FROM `tabAgency Campaign Fact`
+            WHERE campaign IN %(campaigns)s
+              AND pledge_count = 0 AND donor_count = 0
+              AND ABS(allocated_amount) < 0.005
+              AND ABS(collected_amount) < 0.005
+              AND ABS(written_off_amount) < 0.005
+        """, {"campaigns": tuple({key[0] for key, deltas in rows})})
+
+
+def rebuild_agency_facts(campaign=None):
+    """Rebuild fact and agency donor rows from submitted documents (one campaign, or all)."""
+    cells, donors = get_source_facts(campaign)
+
+    filters = {"campaign": campaign} if campaign else {}
+    frappe.db.delete("Agency Campaign Fact", filters)
+    frappe.db.delete("Agency Campaign Donor", filters)
+
+    apply_fact_deltas(cells)
+
+    if donors:
+        timestamp = now()
+        user = frappe.session.user
+        frappe.db.bulk_insert(
+            "Agency Campaign Donor",
+            fields=["name", "creation", "modified", "owner", "modified_by", "campaign", "agency",
+                    "donor", "pledge_count", "designation_type", "period"],
+            values=[
+                (frappe.generate_hash(length=10), timestamp, timestamp, user, user, row.campaign,
+                 row.agency, row.donor, row.pledge_count, row.designation_type, row.period)
+                for row in donors
+            ],
+        )
+
+
+def get_source_facts(campaign=None):
+    """Every fact measure computed set-based from submitted documents (one campaign, or all).
+
+    Returns:
+        (cells, donors): {(campaign, agency, designation_type, period): {measure: value}},
+        and the agency donor rows, one per (campaign, agency, donor)
+    """
+    from united_way.reporting import get_agency_collections
+
+    condition = "AND p.campaign = %(campaign)s" if campaign else ""
+    values = {"campaign": campaign}
+    cells = {}
+
+    def add(rows, measures):
+        for row in rows:
+            cell = cells.setdefault(
+                (row.campaign, row.agency, row.designation_type, get_period(row.period)), {}
+            )
+            for measure in measures:
+                cell[measure] = cell.get(measure, 0) + flt(row[measure])
+
+    add(frappe.db.sql(f"""
+        SELECT p.campaign, pa.agency, IFNULL(pa.designation_type, '') AS designation_type,
+               MIN(p.pledge_date) AS period, SUM(pa.allocated_amount) AS allocated_amount
+        FROM `tabPledge Allocation` pa
+        JOIN `tabPledge` p ON pa.parent = p.name
+        WHERE p.docstatus = 1 AND pa.parenttype = 'Pledge' AND pa.agency IS NOT NULL {condition}
+        GROUP BY p.campaign, pa.agency, pa.designation_type, YEAR(p.pledge_date), MONTH(p.pledge_date)
+    """, values, as_dict=True), ["allocated_amount"])
+
+    # Each pledge is counted once per agency, under its first allocation to it
+    add(frappe.db.sql(f"""
+        SELECT campaign, agency, designation_type, MIN(period) AS period, COUNT(DISTINCT pledge) AS pledge_count
+        FROM (
+            SELECT p.campaign, pa.agency, p.name AS pledge, p.pledge_date AS period,
+                   IFNULL(pa.designation_type, '') AS designation_type,
+                   ROW_NUMBER() OVER (PARTITION BY p.name, pa.agency ORDER BY pa.idx) AS allocation_rank
+            FROM `tabPledge Allocation` pa
+            JOIN `tabPledge` p ON pa.parent = p.name
+            WHERE p.docstatus = 1 AND pa.parenttype = 'Pledge' AND pa.agency IS NOT NULL {condition}
+        ) first_allocation
+        WHERE allocation_rank = 1
+        GROUP BY campaign, agency, designation_type, YEAR(period), MONTH(period)
+    """, values, as_dict=True), ["pledge_count"])
+
+    add(get_agency_collections({"campaign": campaign}, group_by=DIMENSIONS), ["collected_amount"])
+
+    add(frappe.db.sql(f"""
+        SELECT p.campaign, pa.agency, IFNULL(pa.designation_type, '') AS designation_type,
+               MIN(w.writeoff_date) AS period,
+               SUM(w.writeoff_amount * pa.percentage / 100) AS written_off_amount
+        FROM `tabPledge Writeoff` w
+        JOIN `tabPledge` p ON w.pledge = p.name
+        JOIN `tabPledge Allocation` pa ON pa.parent = p.name AND pa.parenttype = 'Pledge'
+        WHERE w.docstatus = 1 AND p.docstatus = 1 AND pa.agency IS NOT NULL {condition}
+        GROUP BY p.campaign, pa.agency, pa.designation_type, YEAR(w.writeoff_date), MONTH(w.writeoff_date)
+    """, values, as_dict=True), ["written_off_amount"])
+
+    # Each donor is counted once per (campaign, agency), under their first pledge
+    # (as agency_campaign_donor.update_agency_donor keeps it between rebuilds)
+    donors = frappe.db.sql(f"""
+        SELECT campaign, agency, donor, designation_type, period, pledge_count
+        FROM (
+            SELECT p.campaign, pa.agency, p.donor,
+                   IFNULL(pa.designation_type, '') AS designation_type,
+                   p.pledge_date AS period,
+                   COUNT(*) OVER (PARTITION BY p.campaign, pa.agency, p.donor) AS pledge_count,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY p.campaign, pa.agency, p.donor ORDER BY p.pledge_date, p.name, pa.idx
+                   ) AS pledge_rank
+            FROM `tabPledge Allocation` pa
+            JOIN `tabPledge` p ON pa.parent = p.name
+            WHERE p.docstatus = 1 AND pa.parenttype = 'Pledge'
+              AND pa.agency IS NOT NULL AND p.donor IS NOT NULL {condition}
+        ) first_pledge
+        WHERE pledge_rank = 1
+    """, values, as_dict=True)
+
+    for row in donors:
+        row.period = get_period(row.period)
+        row.donor_count = 1
+    add(donors, ["donor_count"])
+
+    return cells, donors
+
+
+def reconcile_agency_facts(campaign=None, repair=False):
+    """Compare every measure of the fact rows against the queries rebuild_agency_facts uses.
+
+    Args:
+        campaign: Limit the check to one campaign (default: every campaign)
+        repair: Rebuild the facts of drifted campaigns
+
+    Returns:
+        list of dicts describing each drifted campaign, with the drift as
+        {(agency, designation_type, period): {measure: (stored, source)}}
+    """
+    source = get_source_facts(campaign)[0]
+
+    stored = {}
+    for row in frappe.db.sql(f"""
+        SELECT {", ".join(DIMENSIONS + MEASURES)}
+        FROM `tabAgency Campaign Fact`
+        {"WHERE campaign = %(campaign)s" if campaign else ""}
+    """, {"campaign": campaign}, as_dict=True):
+        stored[(row.campaign, row.agency, row.designation_type or "", getdate(row.period))] = row
+
+    drift = {}
+    for key in set(stored) | set(source):
+        for measure in MEASURES:
+            stored_value = flt((stored.get(key) or {}).get(measure))
+            source_value = flt(source.get(key, {}).get(measure))
+            if abs(stored_value - source_value) > 0.005:
+                cell = drift.setdefault(key[0], {}).setdefault(key[1:], {})
+                cell[measure] = (stored_value, source_value)
+
+    drifted = []
+    for campaign_name in sorted(drift):
+        drifted.append({"campaign": campaign_name, "drift": drift[campaign_name]})
+        frappe.logger().warning(f"Agency facts drift [{campaign_name}]: {drift[campaign_name]}")
+
+        if cint(repair):
+            rebuild_agency_facts(campaign_name)
+
+    return drifted
@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from united_way.donation_batches import process_or_enqueue
+
 
 class BatchDeposit(Document):
     def validate(self):
@@ -30,44 +32,39 @@ class BatchDeposit(Document):
         self.item_count = len(self.items)
 
     def on_submit(self):
-        """Create a Donation for each item."""
-        count = 0
-        for item in self.items:
-            donation = frappe.new_doc("Donation")
-            donation.donation_date = self.deposit_date
-            donation.donor = item.donor
-            donation.campaign = item.campaign or self.default_campaign
-            donation.amount = flt(item.amount)
-            donation.pledge = item.pledge
-            donation.payment_method = item.payment_method
-            donation.reference_number = item.check_number
-            donation.batch_number = self.name
-            donation.insert()
-            donation.submit()
+        """Create a Donation for each item.
 
-            item.donation = donation.name
-            item.db_update()
-            count += 1
-
-        self.donations_created = count
-        self.db_update()
+        Large deposits are processed in the background; see
+        united_way.donation_batches."""
+        process_or_enqueue(self, "submit")
 
     def on_cancel(self):
         """Cancel each linked donation, clear item.donation, reset donations_created."""
-        for item in self.items:
-            if item.donation:
-                try:
-                    donation = frappe.get_doc("Donation", item.donation)
-                    if donation.docstatus == 1:
-                        donation.cancel()
-                except Exception:
-                    frappe.log_error(
-                        f"Failed to cancel Donation {item.donation} from Batch Deposit {self.name}",
-                        "Batch Deposit Cancel Error"
-                    )
+        process_or_enqueue(self, "cancel")
 
-                item.donation = None
-                item.db_update()
+    def make_donation(self, item):
+        """Create and submit the Donation for one deposit item."""
+        donation = frappe.new_doc("Donation")
+        donation.donation_date = self.deposit_date
+        donation.donor = item.donor
+        donation.campaign = item.campaign or self.default_campaign
+        donation.amount = flt(item.amount)
+        donation.pledge = item.pledge
+        donation.payment_method = item.payment_method
+        donation.reference_number = item.check_number
+        donation.batch_number = self.name
+        donation.insert()
+        donation.submit()
+        return donation.name
 
-        self.donations_created = 0
-        self.db_update()
+    def cancel_donation(self, item):
+        """Cancel the Donation created for one deposit item."""
+        try:
+            donation = frappe.get_doc("Donation", item.donation)
+            if donation.docstatus == 1:
+                donation.cancel()
+        except Exception:
+            frappe.log_error(
+                f"Failed to cancel Donation {item.donation} from Batch Deposit {self.name}",
+                "Batch Deposit Cancel Error"
+            )
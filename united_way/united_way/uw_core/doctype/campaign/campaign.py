@@ -1,5 +1,8 @@
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, flt
+
+from united_way.reporting import bump_campaign_versions
 
 
 class Campaign(Document):
@@ -9,7 +12,10 @@ class Campaign(Document):
 
     def update_totals(self):
         """Recalculate campaign totals from pledges and donations.
-        Called by Pledge and Donation hooks after submit/cancel."""
+
+        Pledge and Donation submit/cancel keep the totals current with
+        apply_campaign_delta(); this full rescan is used by the drift
+        reconciler and for manual repairs."""
 
         # Total pledged
         pledged = frappe.db.sql("""
@@ -43,11 +49,132 @@ class Campaign(Document):
             self.collection_rate = 0
 
         self.db_update()
-        frappe.db.commit()
+        bump_campaign_versions([self.name])
 
 
 def recalculate_campaign(campaign_name):
-    """Utility function to trigger campaign recalculation."""
+    """Utility function to trigger a full campaign recalculation."""
     if campaign_name:
         campaign = frappe.get_doc("Campaign", campaign_name)
         campaign.update_totals()
+
+
+def apply_campaign_delta(campaign_name, pledged=0, pledges=0, donors=0, collected=0):
+    """Apply accumulated changes to the campaign rollup fields in one UPDATE.
+
+    The derived percentages are assigned before the base columns because
+    MariaDB evaluates single-table SET clauses left to right against the
+    already-updated row.
+    """
+    if not campaign_name:
+        return
+
+    frappe.db.sql("""
+        UPDATE `tabCampaign`
+        SET
+            percent_of_goal = CASE
+                WHEN fundraising_goal > 0
+                THEN (total_pledged + %(pledged)s) / fundraising_goal * 100
+                ELSE percent_of_goal
+            END,
+            collection_rate = CASE
+                WHEN total_pledged + %(pledged)s <> 0
+                THEN (total_collected + %(collected)s) / (total_pledged + %(pledged)s) * 100
+                ELSE 0
+            END,
+            total_pledged = total_pledged + %(pledged)s,
+            pledge_count = pledge_count + %(pledges)s,
+            donor_count = donor_count + %(donors)s,
+            total_collected = total_collected + %(collected)s
+        WHERE name = %(campaign)s
+    """, {
+        "campaign": campaign_name,
+        "pledged": flt(pledged),
+        "pledges": cint(pledges),
+        "donors": cint(donors),
+        "collected": flt(collected),
+    })
+
+
+def reconcile_campaign_totals(campaign=None, repair=False):
+    """Compare stored campaign rollups against a rescan of pledges and donations.
+
+    Args:
+        campaign: Limit the check to one campaign (default: all submitted campaigns)
+        repair: Recalculate drifted campaigns, their donor membership and
+            their pledges' collection fields
+
+    Returns:
+        list of dicts describing each drifted campaign
+    """
+    from united_way.uw_core.doctype.campaign_donor.campaign_donor import rebuild_campaign_donors
+    from united_way.uw_core.doctype.pledge.pledge import recompute_pledge_collections
+
+    repair = cint(repair)
+    condition = "AND c.name = %(campaign)s" if campaign else ""
+
+    rows = frappe.db.sql(f"""
+        SELECT
+            c.name,
+            c.total_pledged, c.pledge_count, c.donor_count, c.total_collected,
+            COALESCE(p.total_pledged, 0) AS source_pledged,
+            COALESCE(p.pledge_count, 0) AS source_pledges,
+            COALESCE(p.donor_count, 0) AS source_donors,
+            COALESCE(d.total_collected, 0) AS source_collected,
+            COALESCE(m.member_count, 0) AS member_count,
+            COALESCE(m.member_pledges, 0) AS member_pledges
+        FROM `tabCampaign` c
+        LEFT JOIN (
+            SELECT campaign, SUM(pledge_amount) AS total_pledged,
+                   COUNT(*) AS pledge_count, COUNT(DISTINCT donor) AS donor_count
+            FROM `tabPledge`
+            WHERE docstatus = 1
+            GROUP BY campaign
+        ) p ON p.campaign = c.name
+        LEFT JOIN (
+            SELECT campaign, SUM(amount) AS total_collected
+            FROM `tabDonation`
+            WHERE docstatus = 1
+            GROUP BY campaign
+        ) d ON d.campaign = c.name
+        LEFT JOIN (
+            SELECT campaign, COUNT(*) AS member_count, SUM(pledge_count) AS member_pledges
+            FROM `tabCampaign Donor`
+            GROUP BY campaign
+        ) m ON m.campaign = c.name
+        WHERE c.docstatus = 1 {condition}
+    """, {"campaign": campaign}, as_dict=True)
+
+    drifted = []
+    for row in rows:
+        drift = {}
+        for field, source in (
+            ("total_pledged", "source_pledged"),
+            ("total_collected", "source_collected"),
+        ):
+            if abs(flt(row[field]) - flt(row[source])) > 0.005:
+                drift[field] = (flt(row[field]), flt(row[source]))
+
+        for field, source in (
+            ("pledge_count", "source_pledges"),
+            ("donor_count", "source_donors"),
+            ("member_count", "source_donors"),
+            ("member_pledges", "source_pledges"),
+        ):
+            if cint(row[field]) != cint(row[source]):
+                drift[field] = (cint(row[field]), cint(row[source]))
+
+        if not drift:
+            continue
+
+        drifted.append({"campaign": row.name, "drift": drift})
+        frappe.logger().warning(f"Campaign totals drift [{row.name}]: {drift}")
+
+        if repair:
+            rebuild_campaign_donors(row.name)
+            recalculate_campaign(row.name)
+            recompute_pledge_collections(frappe.get_all(
+                "Pledge", filters={"campaign": row.name, "docstatus": 1}, pluck="name"
+            ))
+
+    return drifted
@@ -1,5 +1,6 @@
 import frappe
 import unittest
+from unittest.mock import patch
 from frappe.utils import flt
 
 
@@ -46,15 +47,15 @@ class TestCampaign(unittest.TestCase):
             "Contact", {"first_name": "_TestCamp", "last_name": "DonorB"}, "name"
         )
 
-    def _make_campaign(self, goal=100000):
+    def _make_campaign(self, goal=100000, year=2097):
         """Helper to create and submit a test campaign."""
         camp = frappe.new_doc("Campaign")
         camp.campaign_name = f"_Test Rollup Campaign {frappe.generate_hash(length=6)}"
         camp.campaign_type = "Annual Campaign"
-        camp.campaign_year = 2097
+        camp.campaign_year = year
         camp.status = "Active"
-        camp.start_date = "2097-01-01"
-        camp.end_date = "2097-12-31"
+        camp.start_date = f"{year}-01-01"
+        camp.end_date = f"{year}-12-31"
         camp.fundraising_goal = goal
         camp.insert()
         camp.submit()
@@ -199,3 +200,116 @@ class TestCampaign(unittest.TestCase):
         self.assertEqual(camp.pledge_count, 0)
 
         camp.cancel()
+
+    def _make_pledge(self, campaign, donor, amount):
+        """Helper to create and submit a pledge."""
+        pledge = frappe.new_doc("Pledge")
+        pledge.campaign = campaign
+        pledge.donor = donor
+        pledge.pledge_amount = amount
+        pledge.pledge_date = "2097-06-01"
+        pledge.append("allocations", {
+            "agency": "_Test Agency Campaign",
+            "percentage": 100,
+        })
+        pledge.insert()
+        pledge.submit()
+        return pledge
+
+    # --- Delta Maintenance Tests ---
+
+    def test_repeat_donor_counted_once(self):
+        """A second pledge from the same donor should not increase donor_count."""
+        camp = self._make_campaign(goal=50000)
+
+        first = self._make_pledge(camp.name, self.donor_a, 1000)
+        second = self._make_pledge(camp.name, self.donor_a, 2000)
+
+        camp.reload()
+        self.assertEqual(flt(camp.total_pledged), 3000)
+        self.assertEqual(camp.pledge_count, 2)
+        self.assertEqual(camp.donor_count, 1)
+
+        first.cancel()
+        camp.reload()
+        self.assertEqual(camp.pledge_count, 1)
+        self.assertEqual(camp.donor_count, 1)
+
+        second.cancel()
+        camp.reload()
+        self.assertEqual(camp.donor_count, 0)
+        self.assertFalse(frappe.db.exists("Campaign Donor", {"campaign": camp.name}))
+
+        camp.cancel()
+
+    def test_reconciler_repairs_drift(self):
+        """The reconciler should report and repair totals that drifted from source."""
+        from united_way.uw_core.doctype.campaign.campaign import reconcile_campaign_totals
+
+        camp = self._make_campaign(goal=50000)
+        pledge = self._make_pledge(camp.name, self.donor_a, 5000)
+
+        self.assertEqual(reconcile_campaign_totals(camp.name), [])
+
+        frappe.db.set_value("Campaign", camp.name, "total_pledged", 1, update_modified=False)
+        frappe.db.delete("Campaign Donor", {"campaign": camp.name})
+
+        drifted = reconcile_campaign_totals(camp.name, repair=True)
+        self.assertEqual(len(drifted), 1)
+        self.assertIn("total_pledged", drifted[0]["drift"])
+        self.assertIn("member_count", drifted[0]["drift"])
+
+        camp.reload()
+        self.assertEqual(flt(camp.total_pledged), 5000)
+        self.assertEqual(reconcile_campaign_totals(camp.name), [])
+
+        pledge.cancel()
+        camp.cancel()
+
+    # --- Report Cache Tests ---
+
+    def test_executive_summary_cached_until_campaign_changes(self):
+        """A repeat run should come from the cache, and a committed pledge should refresh it."""
+        from united_way.uw_core.report.executive_summary.executive_summary import execute
+
+        camp = self._make_campaign(goal=50000)
+        first = self._make_pledge(camp.name, self.donor_a, 1000)
+        frappe.db.commit()
+
+        filters = frappe._dict(campaign=camp.name)
+        computed = execute(filters)
+
+        with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+            cached = execute(filters)
+        self.assertEqual(sql.call_count, 0)
+        self.assertEqual(cached[1], computed[1])
+
+        second = self._make_pledge(camp.name, self.donor_b, 2000)
+        frappe.db.commit()
+
+        refreshed = execute(filters)
+        pledged = next(row for row in refreshed[1] if row["metric"] == "Total Pledged vs Goal")
+        self.assertEqual(flt(pledged["value"]), 3000)
+
+        first.cancel()
+        second.cancel()
+        camp.cancel()
+        frappe.db.commit()
+
+    def test_prior_year_changes_invalidate_next_year_reports(self):
+        """New donor counts depend on last year's donors, so its changes should bump next year's version."""
+        from united_way.reporting import get_campaign_version
+
+        prior = self._make_campaign(goal=50000)
+        current = self._make_campaign(goal=50000, year=2098)
+        frappe.db.commit()
+
+        version = get_campaign_version(current.name)
+        pledge = self._make_pledge(prior.name, self.donor_a, 1000)
+        frappe.db.commit()
+        self.assertGreater(get_campaign_version(current.name), version)
+
+        pledge.cancel()
+        current.cancel()
+        prior.cancel()
+        frappe.db.commit()
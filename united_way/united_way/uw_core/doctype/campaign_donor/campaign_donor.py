@@ -0,0 +1,98 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, now
+
+
+class CampaignDonor(Document):
+    pass
+
+
+def on_doctype_update():
+    """One membership row per (campaign, donor)."""
+    frappe.db.add_unique("Campaign Donor", ["campaign", "donor"], constraint_name="unique_campaign_donor")
+
+
+def add_campaign_donor(campaign, donor):
+    """Record one more submitted pledge for a donor in a campaign.
+
+    Returns:
+        1 if the donor is new to the campaign, otherwise 0
+    """
+    existing = frappe.db.get_value(
+        "Campaign Donor",
+        {"campaign": campaign, "donor": donor},
+        "name",
+        for_update=True,
+    )
+
+    if existing:
+        frappe.db.sql("""
+            UPDATE `tabCampaign Donor`
+            SET pledge_count = pledge_count + 1
+            WHERE name = %s
+        """, existing)
+        return 0
+
+    frappe.get_doc({
+        "doctype": "Campaign Donor",
+        "campaign": campaign,
+        "donor": donor,
+        "pledge_count": 1,
+    }).db_insert()
+    return 1
+
+
+def remove_campaign_donor(campaign, donor):
+    """Record one fewer submitted pledge for a donor in a campaign.
+
+    Returns:
+        1 if the donor no longer has any submitted pledge in the campaign, otherwise 0
+    """
+    row = frappe.db.get_value(
+        "Campaign Donor",
+        {"campaign": campaign, "donor": donor},
+        ["name", "pledge_count"],
+        as_dict=True,
+        for_update=True,
+    )
+
+    if not row:
+        return 0
+
+    if cint(row.pledge_count) > 1:
+        frappe.db.sql("""
+            UPDATE `tabCampaign Donor`
+            SET pledge_count = pledge_count - 1
+            WHERE name = %s
+        """, row.name)
+        return 0
+
+    frappe.db.delete("Campaign Donor", {"name": row.name})
+    return 1
+
+
+def rebuild_campaign_donors(campaign):
+    """Rebuild the membership rows for a campaign from submitted pledges."""
+    frappe.db.delete("Campaign Donor", {"campaign": campaign})
+
+    donors = frappe.db.sql("""
+        SELECT donor, COUNT(*) AS pledge_count
+        FROM `tabPledge`
+        WHERE campaign = %s AND docstatus = 1 AND donor IS NOT NULL
+        GROUP BY donor
+    """, campaign, as_dict=True)
+
+    if not donors:
+        return
+
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Campaign Donor",
+        fields=["name", "creation", "modified", "owner", "modified_by", "campaign", "donor", "pledge_count"],
+        values=[
+            (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+             campaign, row.donor, row.pledge_count)
+            for row in donors
+        ],
+    )
@@ -1,50 +1,60 @@
 import frappe
 from frappe.model.document import Document
-from frappe.utils import flt
+from frappe.utils import flt, getdate
 
 
 class Contact(Document):
     def validate(self):
         self.full_name = f"{self.first_name} {self.last_name}".strip()
+        self.validate_employee_id()
+
+    def validate_employee_id(self):
+        """Employee IDs identify a contact on their employer's payroll files."""
+        self.employee_id = (self.employee_id or "").strip() or None
+        if not self.employee_id:
+            return
+
+        if not self.organization:
+            frappe.throw("Employee ID requires an Organization.")
+
+        # A friendlier message than the unique constraint, which still catches concurrent saves
+        duplicate = frappe.db.get_value("Contact", {
+            "organization": self.organization,
+            "employee_id": self.employee_id,
+            "name": ("!=", self.name),
+        })
+        if duplicate:
+            frappe.throw(f"Employee ID {self.employee_id} is already used by {duplicate} at {self.organization}.")
 
     def before_save(self):
         self.full_name = f"{self.first_name} {self.last_name}".strip()
 
     def update_donor_stats(self):
-        """Recalculate lifetime giving, last donation, consecutive years, donor level."""
-        donations = frappe.get_all(
-            "Donation",
-            filters={"donor": self.name, "docstatus": 1},
-            fields=["amount", "donation_date"],
-            order_by="donation_date desc",
+        """Recalculate lifetime giving, last donation, consecutive years, donor level.
+
+        Donation submit/cancel keep these current with apply_donor_delta();
+        this full rebuild is for backfills and manual repairs."""
+        from united_way.uw_core.doctype.donor_giving_year.donor_giving_year import (
+            get_consecutive_years,
+            rebuild_giving_years,
         )
 
-        if donations:
-            self.lifetime_giving = flt(sum(flt(d.amount) for d in donations))
-            self.last_donation_date = donations[0].donation_date
-            self.last_donation_amount = flt(donations[0].amount)
-
-            # Calculate consecutive years giving (backward from most recent year)
-            years = sorted(
-                set(d.donation_date.year for d in donations if d.donation_date),
-                reverse=True,
-            )
-            consecutive = 1
-            for i in range(1, len(years)):
-                if years[i] == years[i - 1] - 1:
-                    consecutive += 1
-                else:
-                    break
-            self.consecutive_years_giving = consecutive
-        else:
-            self.lifetime_giving = 0
-            self.last_donation_date = None
-            self.last_donation_amount = 0
-            self.consecutive_years_giving = 0
-            self.donor_level = ""
+        rebuild_giving_years(self.name)
 
+        self.lifetime_giving = flt(frappe.db.get_value(
+            "Donor Giving Year", {"donor": self.name}, "SUM(total_amount)"
+        ))
+        self.last_donation_date, self.last_donation_amount = get_last_donation(self.name)
+        self.consecutive_years_giving = get_consecutive_years(self.name)
         self.autoset_donor_level()
-        self.save()
+
+        self.db_set({
+            "lifetime_giving": self.lifetime_giving,
+            "last_donation_date": self.last_donation_date,
+            "last_donation_amount": self.last_donation_amount,
+            "consecutive_years_giving": self.consecutive_years_giving,
+            "donor_level": self.donor_level,
+        }, update_modified=False)
 
     def autoset_donor_level(self):
         """Set donor level based on lifetime giving thresholds.
@@ -54,16 +64,170 @@ class Contact(Document):
         Partner: $100 - $499
         Supporter: Under $100
         """
-        giving = flt(self.lifetime_giving)
-        if giving >= 10000:
-            self.donor_level = "Tocqueville Society ($10,000+)"
-        elif giving >= 1000:
-            self.donor_level = "Leadership Circle ($1,000-$9,999)"
-        elif giving >= 500:
-            self.donor_level = "Community Builder ($500-$999)"
-        elif giving >= 100:
-            self.donor_level = "Partner ($100-$499)"
-        elif giving > 0:
-            self.donor_level = "Supporter (Under $100)"
-        else:
-            self.donor_level = ""
+        self.donor_level = get_donor_level(self.lifetime_giving)
+
+
+def on_doctype_update():
+    """One contact per employee ID at an employer; also serves payroll matching by employee ID.
+
+    Blank IDs are stored as NULL (see validate_employee_id), which never collide.
+    """
+    frappe.db.add_unique(
+        "Contact", ["organization", "employee_id"], constraint_name="unique_contact_employee_id"
+    )
+
+
+def get_donor_level(lifetime_giving):
+    """Map lifetime giving to a donor level (see Contact.autoset_donor_level)."""
+    giving = flt(lifetime_giving)
+    if giving >= 10000:
+        return "Tocqueville Society ($10,000+)"
+    elif giving >= 1000:
+        return "Leadership Circle ($1,000-$9,999)"
+    elif giving >= 500:
+        return "Community Builder ($500-$999)"
+    elif giving >= 100:
+        return "Partner ($100-$499)"
+    elif giving > 0:
+        return "Supporter (Under $100)"
+    return ""
+
+
+def get_last_donation(contact_name):
+    """Return (date, amount) of the donor's most recent submitted donation."""
+    last = frappe.db.sql("""
+        SELECT donation_date, amount
+        FROM `tabDonation`
+        WHERE donor = %s AND docstatus = 1
+        ORDER BY donation_date DESC, creation DESC
+        LIMIT 1
+    """, contact_name, as_dict=True)
+
+    if not last:
+        return None, 0
+    return last[0].donation_date, flt(last[0].amount)
+
+
+def rebuild_all_donor_stats(chunk_size=5000):
+    """Recalculate the giving stats of every Contact with a few set-based passes.
+
+    Rebuilds Donor Giving Year once, reads the latest gift per donor with a
+    window function, and writes the stats with one UPDATE ... CASE per
+    chunk. Used after bulk loads, where Contact.update_donor_stats per
+    donor would be far too slow.
+    """
+    from united_way.utils import bulk_update
+    from united_way.uw_core.doctype.donor_giving_year.donor_giving_year import (
+        count_consecutive_years,
+        rebuild_giving_years,
+    )
+
+    rebuild_giving_years()
+
+    stats = {}
+    for donor, year, total_amount in frappe.db.sql("""
+        SELECT donor, year, total_amount
+        FROM `tabDonor Giving Year`
+        ORDER BY donor, year DESC
+    """):
+        row = stats.setdefault(donor, frappe._dict(lifetime_giving=0, years=[]))
+        row.lifetime_giving += flt(total_amount)
+        row.years.append(year)
+
+    for donor, donation_date, amount in frappe.db.sql("""
+        SELECT donor, donation_date, amount
+        FROM (
+            SELECT donor, donation_date, amount,
+                   ROW_NUMBER() OVER (PARTITION BY donor ORDER BY donation_date DESC, creation DESC) AS gift_rank
+            FROM `tabDonation`
+            WHERE docstatus = 1 AND donor IS NOT NULL
+        ) latest
+        WHERE gift_rank = 1
+    """):
+        if donor in stats:
+            stats[donor].last_donation_date = donation_date
+            stats[donor].last_donation_amount = flt(amount)
+
+    updates = {
+        donor: {
+            "lifetime_giving": flt(row.lifetime_giving, 2),
+            "last_donation_date": row.get("last_donation_date"),
+            "last_donation_amount": row.get("last_donation_amount") or 0,
+            "consecutive_years_giving": count_consecutive_years(row.years),
+            "donor_level": get_donor_level(row.lifetime_giving),
+        }
+        for donor, row in stats.items()
+    }
+
+    # Contacts whose donations are all gone
+    for name in frappe.db.sql_list("""
+        SELECT name FROM `tabContact`
+        WHERE lifetime_giving <> 0 OR last_donation_date IS NOT NULL OR consecutive_years_giving <> 0
+    """):
+        updates.setdefault(name, {
+            "lifetime_giving": 0,
+            "last_donation_date": None,
+            "last_donation_amount": 0,
+            "consecutive_years_giving": 0,
+            "donor_level": "",
+        })
+
+    bulk_update("Contact", updates, chunk_size=chunk_size)
+
+
+def apply_donor_delta(contact_name, amount=0, years=None, last_gift=None, removed_dates=None):
+    """Apply accumulated donation changes to a donor's giving stats.
+
+    Args:
+        contact_name: Donor Contact
+        amount: Net change to lifetime giving
+        years: {year: [amount, count, first_added, first_removed]} changes to
+            the Donor Giving Year rows
+        last_gift: (date, amount) of the latest newly submitted donation
+        removed_dates: donation dates of cancelled donations
+
+    Only a cancellation on or after the stored last donation date needs a
+    lookup, and consecutive years are recounted only when a year gains its
+    first or loses its last donation. Everything else is O(1) and written
+    with one column update instead of a Contact save.
+    """
+    from united_way.uw_core.doctype.donor_giving_year.donor_giving_year import (
+        apply_giving_year_delta,
+        get_consecutive_years,
+    )
+
+    years_changed = False
+    for year, delta in sorted((years or {}).items()):
+        if apply_giving_year_delta(contact_name, year, *delta):
+            years_changed = True
+
+    current = frappe.db.get_value(
+        "Contact",
+        contact_name,
+        ["lifetime_giving", "last_donation_date", "last_donation_amount", "consecutive_years_giving"],
+        as_dict=True,
+        for_update=True,
+    )
+    if not current:
+        return
+
+    lifetime_giving = flt(flt(current.lifetime_giving) + flt(amount), 2)
+    last_date = getdate(current.last_donation_date) if current.last_donation_date else None
+    last_amount = flt(current.last_donation_amount)
+
+    if removed_dates and last_date and max(getdate(d) for d in removed_dates) >= last_date:
+        last_date, last_amount = get_last_donation(contact_name)
+    elif last_gift and (not last_date or getdate(last_gift[0]) >= last_date):
+        last_date, last_amount = getdate(last_gift[0]), flt(last_gift[1])
+
+    consecutive = current.consecutive_years_giving
+    if years_changed:
+        consecutive = get_consecutive_years(contact_name)
+
+    frappe.db.set_value("Contact", contact_name, {
+        "lifetime_giving": lifetime_giving,
+        "last_donation_date": last_date,
+        "last_donation_amount": last_amount,
+        "consecutive_years_giving": consecutive,
+        "donor_level": get_donor_level(lifetime_giving),
+    }, update_modified=False)
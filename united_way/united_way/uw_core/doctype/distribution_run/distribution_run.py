@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, getdate
 
+from united_way.reporting import get_agency_totals, get_distributed_by_agency
+
 
 class DistributionRun(Document):
     def validate(self):
@@ -34,13 +36,11 @@ class DistributionRun(Document):
         self.agency_count = len(self.items)
 
     def on_submit(self):
-        """Record the distribution decision and create journal entries if enabled."""
+        """Record the distribution decision and queue journal entries if enabled."""
+        from united_way.accounting import create_distribution_journal_entries
+
         self.db_update()
-        try:
-            from united_way.accounting import create_distribution_journal_entries
-            create_distribution_journal_entries(self)
-        except Exception:
-            pass  # Don't block distribution if JE creation fails
+        create_distribution_journal_entries(self)
 
     def on_cancel(self):
         """Cancel the distribution run."""
@@ -53,7 +53,7 @@ def populate_distribution_items(campaign, period_start, period_end):
 
     For each agency:
     - total_allocated: sum of allocated_amount from submitted Pledge Allocations
-    - total_collected: proportional collections based on each pledge's collection_percentage
+    - total_collected: donations against submitted pledges, split by allocation percentage
     - previously_distributed: sum of distribution_amount from prior submitted Distribution Runs
     - distribution_amount: total_collected - previously_distributed (minimum 0)
 
@@ -67,19 +67,8 @@ def populate_distribution_items(campaign, period_start, period_end):
         list of dicts ready to populate the Distribution Item child table
     """
     # Step 1: Get all agencies with pledge allocations for this campaign,
-    # along with their total allocated amounts and proportional collections.
-    agency_data = frappe.db.sql("""
-        SELECT
-            pa.agency,
-            SUM(pa.allocated_amount) AS total_allocated,
-            SUM(pa.allocated_amount * IFNULL(p.collection_percentage, 0) / 100) AS total_collected
-        FROM `tabPledge Allocation` pa
-        JOIN `tabPledge` p ON pa.parent = p.name
-        WHERE p.campaign = %s
-          AND p.docstatus = 1
-        GROUP BY pa.agency
-        ORDER BY pa.agency
-    """, campaign, as_dict=True)
+    # along with their total allocated and collected amounts.
+    agency_data = get_agency_totals({"campaign": campaign}, order_by="agency")
 
     if not agency_data:
         frappe.msgprint(
@@ -91,27 +80,13 @@ def populate_distribution_items(campaign, period_start, period_end):
 
     # Step 2: For each agency, get the total previously distributed amount
     # from prior submitted Distribution Runs for this campaign.
-    previously_distributed_data = frappe.db.sql("""
-        SELECT
-            di.agency,
-            SUM(di.distribution_amount) AS previously_distributed
-        FROM `tabDistribution Item` di
-        JOIN `tabDistribution Run` dr ON di.parent = dr.name
-        WHERE dr.campaign = %s
-          AND dr.docstatus = 1
-        GROUP BY di.agency
-    """, campaign, as_dict=True)
-
-    prev_dist_map = {
-        row.agency: flt(row.previously_distributed)
-        for row in previously_distributed_data
-    }
+    prev_dist_map = get_distributed_by_agency(campaign)
 
     # Step 3: Build the result list
     items = []
     for row in agency_data:
-        total_allocated = flt(row.total_allocated)
-        total_collected = flt(row.total_collected)
+        total_allocated = flt(row.allocated_amount)
+        total_collected = flt(row.collected_amount)
         previously_distributed = flt(prev_dist_map.get(row.agency, 0))
         distribution_amount = max(flt(total_collected) - flt(previously_distributed), 0)
 
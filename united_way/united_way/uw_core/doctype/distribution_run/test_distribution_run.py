@@ -1,5 +1,6 @@
 import frappe
 import unittest
+from unittest.mock import patch
 from frappe.utils import flt
 from united_way.uw_core.doctype.distribution_run.distribution_run import populate_distribution_items
 
@@ -257,3 +258,73 @@ class TestDistributionRun(unittest.TestCase):
         )
         for item in items:
             self.assertGreaterEqual(flt(item["distribution_amount"]), 0)
+
+    # --- Journal Entry Posting Tests ---
+
+    def _enable_journal_entries(self, summary_mode=0):
+        settings = frappe._dict(auto_create_journal_entries=1, journal_entry_summary_mode=summary_mode)
+        return patch("united_way.accounting.get_posting_settings", side_effect=lambda: frappe._dict(settings))
+
+    def _journal_entry_items(self):
+        return [
+            {"agency": "_Test Agency DistAlpha", "total_allocated": 6000, "total_collected": 3000,
+             "previously_distributed": 0, "distribution_amount": 2000},
+            {"agency": "_Test Agency DistBeta", "total_allocated": 4000, "total_collected": 2000,
+             "previously_distributed": 0, "distribution_amount": 1000},
+        ]
+
+    def test_journal_entries_posted_in_bulk(self):
+        """Bulk posting should write one entry per item, or one summary entry per run."""
+        from united_way.accounting import distribution_journal_entries, post_journal_entries
+
+        dist = self._make_distribution_run(items=self._journal_entry_items())
+        settings = frappe._dict(auto_create_journal_entries=1, journal_entry_summary_mode=0)
+
+        names = post_journal_entries(distribution_journal_entries(dist), settings=settings)
+        self.assertEqual(len(set(names)), 2)
+        amounts = sorted(flt(frappe.db.get_value("UW Journal Entry", n, "amount")) for n in names)
+        self.assertEqual(amounts, [1000, 2000])
+
+        summary = post_journal_entries(distribution_journal_entries(dist), settings=settings, summarize=True)
+        self.assertEqual(len(summary), 1)
+        self.assertEqual(flt(frappe.db.get_value("UW Journal Entry", summary[0], "amount")), 3000)
+        self.assertEqual(frappe.db.get_value("UW Journal Entry", summary[0], "reference_name"), dist.name)
+
+        frappe.db.delete("UW Journal Entry", {"name": ["in", names + summary]})
+        dist.delete()
+
+    def test_journal_entries_go_through_outbox_once(self):
+        """Submitting should only queue entries; draining and replaying should post them once."""
+        from united_way.journal_outbox import drain_outbox, replay_outbox
+
+        with self._enable_journal_entries(), patch("frappe.enqueue"):
+            dist = self._make_distribution_run(items=self._journal_entry_items(), submit=True)
+
+            self.assertFalse(frappe.db.exists("UW Journal Entry", {"reference_name": dist.name}))
+            outbox = frappe.get_all(
+                "Journal Entry Outbox", filters={"reference_name": dist.name}, fields=["name", "status"]
+            )
+            self.assertEqual(len(outbox), 1)
+            self.assertEqual(outbox[0].status, "Pending")
+
+            drain_outbox()
+            self.assertEqual(frappe.db.count("UW Journal Entry", {"reference_name": dist.name}), 2)
+            self.assertEqual(frappe.db.get_value("Journal Entry Outbox", outbox[0].name, "status"), "Posted")
+
+            # Replaying an already-posted row must not duplicate its entries
+            replay_outbox("Distribution Run", dist.name, include_posted=True)
+            drain_outbox()
+            self.assertEqual(frappe.db.count("UW Journal Entry", {"reference_name": dist.name}), 2)
+
+            # Even a drain that misses the existing entries can't write them twice
+            keys = frappe.get_all("UW Journal Entry", filters={"reference_name": dist.name}, pluck="posting_key")
+            self.assertEqual(len(set(keys)), 2)
+            replay_outbox("Distribution Run", dist.name, include_posted=True)
+            with patch("united_way.journal_outbox._existing_postings", return_value=set()):
+                drain_outbox()
+            self.assertEqual(frappe.db.count("UW Journal Entry", {"reference_name": dist.name}), 2)
+            self.assertEqual(frappe.db.get_value("Journal Entry Outbox", outbox[0].name, "attempts"), 1)
+
+        frappe.db.delete("UW Journal Entry", {"reference_name": dist.name})
+        frappe.db.delete("Journal Entry Outbox", {"reference_name": dist.name})
+        dist.cancel()
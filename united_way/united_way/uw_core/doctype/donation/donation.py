@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from united_way import identity_map, rollups
+
 
 class Donation(Document):
     def validate(self):
@@ -11,7 +13,11 @@ class Donation(Document):
     def validate_pledge_link(self):
         """If linked to a pledge, validate campaign matches and check overpayment."""
         if self.pledge:
-            pledge = frappe.get_doc("Pledge", self.pledge)
+            pledge = identity_map.get_header(
+                "Pledge", self.pledge, ["campaign", "donor", "pledge_amount", "docstatus"]
+            )
+            if not pledge:
+                return
 
             # Campaign must match
             if pledge.campaign != self.campaign:
@@ -49,47 +55,48 @@ class Donation(Document):
 
     def on_submit(self):
         """Update linked pledge collection status and campaign totals."""
-        self.update_pledge()
-        self.update_campaign()
-        self.update_donor_stats()
-        self.create_journal_entry()
+        with rollups.batch():
+            self.update_pledge()
+            self.update_campaign(flt(self.amount))
+            self.update_agency_facts(flt(self.amount))
+            self.update_donor_stats()
+            self.create_journal_entry()
 
     def on_cancel(self):
         """Reverse updates on cancellation."""
-        self.update_pledge()
-        self.update_campaign()
-        self.update_donor_stats()
+        with rollups.batch():
+            self.update_pledge()
+            self.update_campaign(-flt(self.amount))
+            self.update_agency_facts(-flt(self.amount))
+            self.update_donor_stats(cancelled=True)
 
     def update_pledge(self):
-        """Trigger pledge recalculation."""
-        if self.pledge:
-            pledge = frappe.get_doc("Pledge", self.pledge)
-            pledge.update_collection_fields()
-            pledge.db_update()
-            frappe.db.commit()
-
-    def update_campaign(self):
-        """Trigger campaign recalculation."""
-        if self.campaign:
-            from united_way.uw_core.doctype.campaign.campaign import recalculate_campaign
-            recalculate_campaign(self.campaign)
-
-    def update_donor_stats(self):
-        """Trigger donor stats recalculation."""
-        if self.donor:
-            try:
-                contact = frappe.get_doc("Contact", self.donor)
-                contact.update_donor_stats()
-            except Exception:
-                pass  # Don't block donation processing if stats update fails
+        """Queue pledge recalculation."""
+        rollups.mark_pledge(self.pledge)
+
+    def update_campaign(self, collected):
+        """Queue the change to the campaign's collected total."""
+        rollups.add_campaign_delta(self.campaign, collected=collected)
+
+    def update_agency_facts(self, collected):
+        """Queue the change to the collected amount of the pledge's agencies."""
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import get_period
+
+        # Pledge submit/cancel carries the donations of pledges that aren't submitted
+        pledge = identity_map.get_header("Pledge", self.pledge, ["docstatus"])
+        if pledge and pledge.docstatus == 1:
+            rollups.add_agency_split(
+                self.pledge, get_period(self.donation_date), collected_amount=collected
+            )
+
+    def update_donor_stats(self, cancelled=False):
+        """Queue the change to the donor's giving stats."""
+        rollups.add_donor_gift(self.donor, self.donation_date, self.amount, cancelled=cancelled)
 
     def create_journal_entry(self):
-        """Create an accounting journal entry if enabled in UW Settings."""
-        try:
-            from united_way.accounting import create_donation_journal_entry
-            create_donation_journal_entry(self)
-        except Exception:
-            pass  # Don't block donation processing if JE creation fails
+        """Queue an accounting journal entry (posted if enabled in UW Settings)."""
+        from united_way.accounting import create_donation_journal_entry
+        create_donation_journal_entry(self)
 
 
 # Hook functions referenced in hooks.py
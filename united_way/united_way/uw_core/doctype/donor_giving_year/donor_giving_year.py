@@ -0,0 +1,132 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, getdate, now
+
+
+class DonorGivingYear(Document):
+    pass
+
+
+def on_doctype_update():
+    """One row per (donor, year)."""
+    frappe.db.add_unique("Donor Giving Year", ["donor", "year"], constraint_name="unique_donor_giving_year")
+
+
+def apply_giving_year_delta(donor, year, amount, count, first_added=None, first_removed=None):
+    """Add submitted (or cancelled, with negative values) donations to a donor's year.
+
+    Args:
+        first_added: earliest date among the newly submitted donations
+        first_removed: earliest date among the cancelled donations
+
+    Returns:
+        True if the year gained its first or lost its last donation, otherwise False
+    """
+    row = frappe.db.get_value(
+        "Donor Giving Year",
+        {"donor": donor, "year": year},
+        ["name", "donation_count", "first_gift_date"],
+        as_dict=True,
+        for_update=True,
+    )
+
+    if not row:
+        if count <= 0:
+            return False
+
+        frappe.get_doc({
+            "doctype": "Donor Giving Year",
+            "donor": donor,
+            "year": year,
+            "total_amount": flt(amount),
+            "donation_count": count,
+            "first_gift_date": first_added,
+        }).db_insert()
+        return True
+
+    if cint(row.donation_count) + count <= 0:
+        frappe.db.delete("Donor Giving Year", {"name": row.name})
+        return True
+
+    first_gift_date = getdate(row.first_gift_date) if row.first_gift_date else None
+    if first_removed and (not first_gift_date or getdate(first_removed) <= first_gift_date):
+        first_gift_date = get_first_gift_date(donor, year)
+    elif first_added and (not first_gift_date or getdate(first_added) < first_gift_date):
+        first_gift_date = getdate(first_added)
+
+    frappe.db.sql("""
+        UPDATE `tabDonor Giving Year`
+        SET total_amount = total_amount + %(amount)s,
+            donation_count = donation_count + %(count)s,
+            first_gift_date = %(first_gift_date)s
+        WHERE name = %(name)s
+    """, {"name": row.name, "amount": flt(amount), "count": count, "first_gift_date": first_gift_date})
+    return False
+
+
+def get_first_gift_date(donor, year):
+    """Earliest submitted donation of a donor within a calendar year."""
+    from united_way.periods import date_range_condition
+
+    condition, values = date_range_condition("donation_date", {"year": year})
+    return frappe.db.sql(f"""
+        SELECT MIN(donation_date)
+        FROM `tabDonation`
+        WHERE donor = %(donor)s AND docstatus = 1 AND {condition}
+    """, dict(values, donor=donor))[0][0]
+
+
+def get_consecutive_years(donor):
+    """Count consecutive giving years backward from the donor's most recent year."""
+    years = frappe.get_all(
+        "Donor Giving Year",
+        filters={"donor": donor},
+        pluck="year",
+        order_by="year desc",
+    )
+    return count_consecutive_years(years)
+
+
+def count_consecutive_years(years):
+    """Length of the unbroken run of years ending at the latest one (years sorted descending)."""
+    consecutive = 1 if years else 0
+    for i in range(1, len(years)):
+        if years[i] == years[i - 1] - 1:
+            consecutive += 1
+        else:
+            break
+    return consecutive
+
+
+def rebuild_giving_years(donor=None):
+    """Rebuild the year rows from submitted donations (one donor, or everyone)."""
+    if donor:
+        frappe.db.delete("Donor Giving Year", {"donor": donor})
+    else:
+        frappe.db.delete("Donor Giving Year")
+
+    condition = "AND donor = %(donor)s" if donor else ""
+    rows = frappe.db.sql(f"""
+        SELECT donor, YEAR(donation_date) AS year,
+               SUM(amount) AS total_amount, COUNT(*) AS donation_count,
+               MIN(donation_date) AS first_gift_date
+        FROM `tabDonation`
+        WHERE docstatus = 1 AND donor IS NOT NULL AND donation_date IS NOT NULL {condition}
+        GROUP BY donor, YEAR(donation_date)
+    """, {"donor": donor}, as_dict=True)
+
+    if not rows:
+        return
+
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Donor Giving Year",
+        fields=["name", "creation", "modified", "owner", "modified_by",
+                "donor", "year", "total_amount", "donation_count", "first_gift_date"],
+        values=[
+            (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+             row.donor, row.year, row.total_amount, row.donation_count, row.first_gift_date)
+            for row in rows
+        ],
+    )
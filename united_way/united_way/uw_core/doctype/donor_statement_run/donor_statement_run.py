@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, cint
 
+from united_way.periods import date_range_condition
+
 
 class DonorStatementRun(Document):
     def validate(self):
@@ -42,7 +44,10 @@ def populate_donor_statements(tax_year):
     if not tax_year:
         frappe.throw("Please provide a valid tax year.")
 
-    results = frappe.db.sql("""
+    # Tax years are calendar years; a date range keeps donation_date indexable
+    condition, values = date_range_condition("d.donation_date", {"year": tax_year})
+
+    results = frappe.db.sql(f"""
         SELECT
             d.donor AS donor,
             d.donor_name AS donor_name,
@@ -50,11 +55,11 @@ def populate_donor_statements(tax_year):
             COUNT(d.name) AS donation_count,
             SUM(COALESCE(d.tax_deductible_amount, 0)) AS tax_deductible_total
         FROM `tabDonation` d
-        WHERE YEAR(d.donation_date) = %s
+        WHERE {condition}
           AND d.docstatus = 1
         GROUP BY d.donor, d.donor_name
         HAVING COUNT(d.name) >= 1
         ORDER BY d.donor_name
-    """, (tax_year,), as_dict=True)
+    """, values, as_dict=True)
 
     return results
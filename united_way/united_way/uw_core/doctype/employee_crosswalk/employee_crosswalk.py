@@ -0,0 +1,64 @@
+import frappe
+from frappe.model.document import Document
+
+
+class EmployeeCrosswalk(Document):
+    def validate(self):
+        from united_way.payroll_import import get_match_key
+
+        self.employee_id = (self.employee_id or "").strip() or None
+        self.employee_name = (self.employee_name or "").strip() or None
+        if not self.employee_id and not self.employee_name:
+            frappe.throw("Enter the Employee ID or Employee Name as it appears in the payroll file.")
+
+        self.match_key = get_match_key(self.employee_id, self.employee_name)
+
+        duplicate = frappe.db.get_value("Employee Crosswalk", {
+            "organization": self.organization,
+            "match_key": self.match_key,
+            "name": ("!=", self.name),
+        })
+        if duplicate:
+            frappe.throw(f"{self.employee_id or self.employee_name} at {self.organization} is already mapped by {duplicate}.")
+
+
+def on_doctype_update():
+    """One donor per (organization, employee)."""
+    frappe.db.add_unique(
+        "Employee Crosswalk", ["organization", "match_key"], constraint_name="unique_employee_crosswalk"
+    )
+
+
+@frappe.whitelist()
+def resolve_payroll_employee(organization, donor, employee_id=None, employee_name=None):
+    """Record which donor a payroll employee is, e.g. for a row left unmatched.
+
+    Later uploads from the organization match the employee to this donor
+    before trying any other strategy. An existing mapping for the same
+    employee is repointed.
+
+    Returns:
+        name of the Employee Crosswalk record
+    """
+    from united_way.payroll_import import get_match_key
+
+    match_key = get_match_key(employee_id, employee_name)
+    existing = frappe.db.get_value(
+        "Employee Crosswalk", {"organization": organization, "match_key": match_key}
+    )
+
+    if existing:
+        doc = frappe.get_doc("Employee Crosswalk", existing)
+        doc.update({"donor": donor, "source": "Manual"})
+        doc.save()
+    else:
+        doc = frappe.get_doc({
+            "doctype": "Employee Crosswalk",
+            "organization": organization,
+            "employee_id": employee_id,
+            "employee_name": employee_name,
+            "donor": donor,
+            "source": "Manual",
+        }).insert()
+
+    return doc.name
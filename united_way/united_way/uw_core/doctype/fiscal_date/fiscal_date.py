@@ -0,0 +1,92 @@
+import datetime
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, getdate, now, nowdate
+
+from united_way.periods import get_fiscal_period, get_fiscal_start_month
+
+# Years kept beyond the current one, for future-dated pledges and schedules
+YEARS_AHEAD = 5
+
+
+class FiscalDate(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_unique("Fiscal Date", ["calendar_date"], constraint_name="unique_fiscal_date")
+
+
+def get_required_years():
+    """(first, last) calendar years the dimension must cover."""
+    first, last = frappe.db.sql("""
+        SELECT MIN(first_date), MAX(last_date) FROM (
+            SELECT MIN(donation_date) AS first_date, MAX(donation_date) AS last_date FROM `tabDonation`
+            UNION ALL SELECT MIN(pledge_date), MAX(pledge_date) FROM `tabPledge`
+            UNION ALL SELECT MIN(due_date), MAX(due_date) FROM `tabPayment Schedule Entry`
+        ) dates
+    """)[0]
+
+    current_year = getdate(nowdate()).year
+    first_year = min(getdate(first).year, current_year) if first else current_year
+    last_year = max(getdate(last).year, current_year + YEARS_AHEAD) if last else current_year + YEARS_AHEAD
+    return first_year, last_year
+
+
+def rebuild_fiscal_dates(first_year=None, last_year=None, start_month=None):
+    """Replace every Fiscal Date row, one per day from first_year to last_year."""
+    if not (first_year and last_year):
+        first_year, last_year = get_required_years()
+
+    start_month = start_month or get_fiscal_start_month()
+    timestamp = now()
+    user = frappe.session.user
+
+    frappe.db.delete("Fiscal Date")
+
+    date = datetime.date(cint(first_year), 1, 1)
+    end = datetime.date(cint(last_year) + 1, 1, 1)
+    values = []
+    while date < end:
+        period = get_fiscal_period(date, start_month)
+        values.append((
+            frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+            date, period.calendar_year, period.calendar_quarter, period.calendar_month,
+            period.fiscal_year, period.fiscal_quarter, period.fiscal_month, period.pay_period,
+        ))
+        date += datetime.timedelta(days=1)
+
+    frappe.db.bulk_insert(
+        "Fiscal Date",
+        fields=["name", "creation", "modified", "owner", "modified_by",
+                "calendar_date", "calendar_year", "calendar_quarter", "calendar_month",
+                "fiscal_year", "fiscal_quarter", "fiscal_month", "pay_period"],
+        values=values,
+    )
+
+
+def ensure_fiscal_dates():
+    """Rebuild the rows if they miss a required year or use an old fiscal start month.
+
+    Runs after migrate and daily, so the dimension always covers the data
+    and the coming years.
+    """
+    first_year, last_year = get_required_years()
+    bounds = frappe.db.sql("""
+        SELECT MIN(calendar_date), MAX(calendar_date) FROM `tabFiscal Date`
+    """)[0]
+
+    # January 1st is fiscal month 1 only with a January start, and so on
+    january = frappe.db.get_value(
+        "Fiscal Date", {"calendar_date": f"{first_year}-01-01"}, "fiscal_month"
+    )
+    expected = get_fiscal_period(datetime.date(first_year, 1, 1)).fiscal_month
+
+    if (
+        not bounds[0]
+        or getdate(bounds[0]) > datetime.date(first_year, 1, 1)
+        or getdate(bounds[1]) < datetime.date(last_year, 12, 31)
+        or cint(january) != expected
+    ):
+        rebuild_fiscal_dates(min(first_year, getdate(bounds[0]).year if bounds[0] else first_year), last_year)
@@ -0,0 +1,69 @@
+import datetime
+import frappe
+import unittest
+from frappe.utils import getdate
+from unittest.mock import patch
+
+from united_way.periods import date_range_condition, get_fiscal_period, get_period_range
+from united_way.uw_core.doctype.fiscal_date.fiscal_date import rebuild_fiscal_dates
+
+
+class TestFiscalDate(unittest.TestCase):
+    """Tests for fiscal periods, date-range filters and the Fiscal Date rows."""
+
+    def setUp(self):
+        self.bounds = frappe.db.sql("""
+            SELECT MIN(calendar_date), MAX(calendar_date) FROM `tabFiscal Date`
+        """)[0]
+
+    def tearDown(self):
+        # Put back the rows other tests and reports rely on, over the same years
+        bounds = frappe.db.sql("""
+            SELECT MIN(calendar_date), MAX(calendar_date) FROM `tabFiscal Date`
+        """)[0]
+        if bounds != self.bounds:
+            if self.bounds[0]:
+                rebuild_fiscal_dates(getdate(self.bounds[0]).year, getdate(self.bounds[1]).year)
+            else:
+                frappe.db.delete("Fiscal Date")
+
+    def test_fiscal_period_with_july_start(self):
+        """A July fiscal year is named after the year it ends in."""
+        period = get_fiscal_period("2025-08-15", start_month=7)
+        self.assertEqual(period.calendar_year, 2025)
+        self.assertEqual(period.fiscal_year, 2026)
+        self.assertEqual(period.fiscal_month, 2)
+        self.assertEqual(period.fiscal_quarter, 1)
+        # 2025-07-01 starts pay period 1; August 15th is day 45
+        self.assertEqual(period.pay_period, 4)
+
+        june = get_fiscal_period("2026-06-30", start_month=7)
+        self.assertEqual((june.fiscal_year, june.fiscal_quarter, june.fiscal_month), (2026, 4, 12))
+
+    def test_period_range_is_half_open(self):
+        """Fiscal quarter and date filters should combine into one [start, end) range."""
+        with patch("united_way.periods.get_fiscal_start_month", return_value=7):
+            start, end = get_period_range(fiscal_year=2026, fiscal_quarter=3)
+            self.assertEqual((start, end), (datetime.date(2026, 1, 1), datetime.date(2026, 4, 1)))
+
+            start, end = get_period_range(fiscal_year=2026, to_date="2025-09-30")
+            self.assertEqual((start, end), (datetime.date(2025, 7, 1), datetime.date(2025, 10, 1)))
+
+    def test_date_range_condition_is_sargable(self):
+        """Year filters should compare the bare column, never YEAR(column)."""
+        condition, values = date_range_condition("d.donation_date", {"year": 2098})
+        self.assertNotIn("YEAR(", condition)
+        self.assertEqual(condition, "d.donation_date >= %(donation_date_start)s AND d.donation_date < %(donation_date_end)s")
+        self.assertEqual(values["donation_date_end"], datetime.date(2099, 1, 1))
+
+        self.assertEqual(date_range_condition("d.donation_date", {})[0], "1 = 1")
+
+    def test_rebuild_uses_start_month(self):
+        """Rebuilt rows should carry the fiscal periods of the given start month."""
+        rebuild_fiscal_dates(2097, 2098, start_month=10)
+        row = frappe.db.get_value(
+            "Fiscal Date", {"calendar_date": "2097-10-01"},
+            ["fiscal_year", "fiscal_quarter", "fiscal_month"], as_dict=True,
+        )
+        self.assertEqual((row.fiscal_year, row.fiscal_quarter, row.fiscal_month), (2098, 1, 1))
+        self.assertEqual(frappe.db.count("Fiscal Date"), 365 + 365)
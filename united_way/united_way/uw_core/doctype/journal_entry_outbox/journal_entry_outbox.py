@@ -0,0 +1,15 @@
+import frappe
+from frappe.model.document import Document
+
+
+class JournalEntryOutbox(Document):
+    pass
+
+
+def on_doctype_update():
+    """One outbox row per posting; re-queuing the same posting is a no-op."""
+    frappe.db.add_unique(
+        "Journal Entry Outbox",
+        ["reference_doctype", "reference_name", "entry_type"],
+        constraint_name="unique_journal_entry_outbox",
+    )
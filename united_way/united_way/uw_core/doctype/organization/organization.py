@@ -1,5 +1,8 @@
 import frappe
 from frappe.model.document import Document
+from frappe.utils import flt
+
+from united_way.cache import clear_organization_cache
 
 
 class Organization(Document):
@@ -10,6 +13,22 @@ class Organization(Document):
         if self.corporate_match and not self.match_ratio:
             frappe.throw("Match Ratio is required when Corporate Match Program is enabled.")
 
+        for fieldname in ("fuzzy_match_threshold", "fuzzy_review_threshold"):
+            if not 0 <= flt(self.get(fieldname)) <= 100:
+                frappe.throw(f"{self.meta.get_label(fieldname)} must be between 0 and 100.")
+
+        if flt(self.fuzzy_review_threshold) > flt(self.fuzzy_match_threshold):
+            frappe.throw("Fuzzy Review Threshold cannot be higher than the Fuzzy Match Threshold.")
+
+    def on_update(self):
+        clear_organization_cache()
+
+    def on_trash(self):
+        clear_organization_cache()
+
+    def after_rename(self, old, new, merge=False):
+        clear_organization_cache()
+
     def get_total_pledges(self, campaign=None):
         """Get total pledge allocations directed to this organization."""
         filters = {"agency": self.name, "docstatus": 1}
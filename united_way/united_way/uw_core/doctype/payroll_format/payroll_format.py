@@ -0,0 +1,21 @@
+import frappe
+from frappe.model.document import Document
+
+
+class PayrollFormat(Document):
+    def validate(self):
+        # Compiling checks the column mapping (required fields, overlaps, widths)
+        self.get_layout()
+
+    def get_layout(self):
+        """This format compiled into a PayrollLayout parser."""
+        from united_way.payroll_import import PayrollLayout
+
+        return PayrollLayout(
+            self.format_type,
+            [(column.field, column.position, column.width) for column in self.columns],
+            delimiter=self.delimiter,
+            header_aliases=(self.header_aliases or "").splitlines(),
+            amount_format=self.amount_format,
+            name_order=self.name_order,
+        )
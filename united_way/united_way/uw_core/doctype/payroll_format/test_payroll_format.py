@@ -0,0 +1,105 @@
+import io
+import frappe
+import unittest
+from unittest.mock import patch
+
+from united_way.payroll_import import ParseErrors, get_payroll_layout, iter_payroll_rows
+
+
+class TestPayrollFormat(unittest.TestCase):
+    """Tests for declared payroll layouts and their compiled parsers."""
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def _make_format(self, **kwargs):
+        doc = frappe.get_doc(dict({
+            "doctype": "Payroll Format",
+            "format_name": "_Test Fixed Cents",
+            "format_type": "Fixed Width",
+            "amount_format": "Implied Decimal",
+            "name_order": "Last First",
+            "header_aliases": "EMPNO",
+            "columns": [
+                {"field": "employee_id", "position": 1, "width": 5},
+                {"field": "employee_name", "position": 8, "width": 12},
+                {"field": "amount", "position": 20, "width": 8},
+                {"field": "department", "position": 28, "width": 4},
+            ],
+        }, **kwargs))
+        return doc.insert()
+
+    def test_fixed_width_layout_with_gaps_and_implied_cents(self):
+        """Fields after gaps should unpack from full lines, and short lines should fall back to slices."""
+        self._make_format()
+        layout = get_payroll_layout(payroll_format="_Test Fixed Cents")
+        self.assertEqual(layout.unpacker.format, "5s2x12s8s4s")
+
+        content = (
+            "EMPNO  NAME        AMOUNT  DEPT\n"
+            "00001  ADAMS ZOE   00012550SALE\n"
+            "00002  LEE SAM     00000900\n"
+            "00003  SHORT\n"
+            "00004  NOBODY      00000000HR  \n"
+        ).encode("utf-8")
+        errors = ParseErrors()
+        rows = list(iter_payroll_rows(io.BytesIO(content), layout, errors))
+
+        self.assertEqual(
+            [(row.employee_id, row.employee_name, row.amount, row.department) for row in rows],
+            [("00001", "ADAMS ZOE", 125.5, "SALE"), ("00002", "LEE SAM", 9.0, "")],
+        )
+        self.assertEqual(errors.count, 2)
+        self.assertEqual(layout.name_order, "Last First")
+
+    def test_fixed_width_multibyte_names_keep_column_positions(self):
+        """A UTF-8 name with multi-byte characters should not shift the columns after it."""
+        self._make_format(header_aliases="")
+        layout = get_payroll_layout(payroll_format="_Test Fixed Cents")
+
+        content = (
+            "00001  ZOË ADAMS   00012550SALE\n"
+            "00002  LEE SAM     00000900HR  \n"
+        ).encode("utf-8")
+        rows = list(iter_payroll_rows(io.BytesIO(content), layout))
+
+        self.assertEqual(
+            [(row.employee_id, row.employee_name, row.amount, row.department) for row in rows],
+            [("00001", "ZOË ADAMS", 125.5, "SALE"), ("00002", "LEE SAM", 9.0, "HR")],
+        )
+
+        line = "123456789" + "Noël, Zoë".ljust(30) + "$1,250.00".rjust(10) + "UW".ljust(10) + "DEPT7"
+        rows = list(iter_payroll_rows(io.BytesIO(line.encode("utf-8")), "adp_fixed"))
+        self.assertEqual((rows[0].employee_name, rows[0].amount, rows[0].deduction_code), ("Noël, Zoë", 1250.0, "UW"))
+
+    def test_builtin_adp_layout_matches_documented_offsets(self):
+        """The declared ADP layout should read the same columns as the original fixed-width parser."""
+        line = "123456789" + "Adams, Zoe".ljust(30) + "$1,250.00".rjust(10) + "UW".ljust(10) + "DEPT7"
+        rows = list(iter_payroll_rows(io.BytesIO(line.encode("latin-1")), "adp_fixed"))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].as_dict(), {
+            "employee_id": "123456789",
+            "employee_name": "Adams, Zoe",
+            "amount": 1250.0,
+            "department": "DEPT7",
+            "deduction_code": "UW",
+            "source_line": 1,
+        })
+
+    def test_latin1_after_utf8_sample_is_not_replaced(self):
+        """Latin-1 bytes past the encoding sample should switch decoding, not become U+FFFD."""
+        content = "E1,Zoë Adams,10\n".encode("utf-8") + "E2,José Ruiz,20\nE3,Zoë Lee,30\n".encode("latin-1")
+
+        with patch("united_way.payroll_import.ENCODING_SAMPLE_SIZE", 16):
+            rows = list(iter_payroll_rows(io.BytesIO(content), "csv"))
+
+        self.assertEqual([row.employee_name for row in rows], ["Zoë Adams", "José Ruiz", "Zoë Lee"])
+
+    def test_overlapping_columns_rejected(self):
+        """Saving a fixed-width format with overlapping columns should fail."""
+        with self.assertRaises(frappe.ValidationError):
+            self._make_format(columns=[
+                {"field": "employee_id", "position": 1, "width": 10},
+                {"field": "amount", "position": 5, "width": 8},
+            ])
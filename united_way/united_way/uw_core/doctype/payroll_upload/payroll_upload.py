@@ -2,6 +2,10 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+# Caps on the detail lines kept in the parse and match logs
+MAX_LOGGED_ERRORS = 50
+MAX_LOGGED_MATCHES = 100
+
 
 class PayrollUpload(Document):
     def validate(self):
@@ -14,93 +18,106 @@ class PayrollUpload(Document):
 def process_payroll_upload(payroll_upload_name):
     """Full pipeline: parse file -> match employees -> create remittance.
 
+    The file is read, parsed, matched and written to the remittance one row
+    at a time, so memory use does not grow with the size of the file.
+
     Args:
         payroll_upload_name: Name of the Payroll Upload document to process
 
     Returns:
         dict with remittance name, matched count, and unmatched count
     """
-    doc = frappe.get_doc("Payroll Upload", payroll_upload_name)
-
-    # Step 1: Read the attached file content
-    file_url = doc.payroll_file
-    file_content = read_attached_file(file_url)
-
-    # Step 2: Parse the file
-    format_map = {
-        "CSV": "csv",
-        "ADP Fixed Width": "adp_fixed",
-        "Tab Delimited": "tab_delimited",
-    }
     from united_way.payroll_import import (
-        parse_payroll_file,
-        match_employees_to_donors,
-        create_remittance_from_payroll,
+        FILE_FORMATS,
+        DonorMatcher,
+        ParseErrors,
+        ParseSummary,
+        RemittanceWriter,
+        get_payroll_layout,
+        iter_payroll_rows,
+        open_payroll_file,
     )
 
-    result = parse_payroll_file(
-        file_content,
-        format_map.get(doc.file_format, "csv"),
+    doc = frappe.get_doc("Payroll Upload", payroll_upload_name)
+
+    # The employer's Payroll Format, or the standard layout picked as File Format
+    layout = get_payroll_layout(FILE_FORMATS.get(doc.file_format, "csv"), doc.payroll_format)
+    errors = ParseErrors(limit=MAX_LOGGED_ERRORS)
+    summary = ParseSummary()
+    # Name matches are learned into the Employee Crosswalk, kept only if the remittance is
+    matcher = DonorMatcher(doc.organization, name_order=layout.name_order, learn_from=doc.name)
+    writer = RemittanceWriter(
         organization=doc.organization,
         campaign=doc.campaign,
+        remittance_date=str(doc.remittance_date),
+        total_amount=doc.expected_total,
+        reference_number=doc.reference_number,
     )
 
+    matched_count = 0
+    unmatched_count = 0
+    match_details = []
+
+    with open_payroll_file(doc.payroll_file) as raw:
+        for row in iter_payroll_rows(raw, layout, errors):
+            summary.add(row)
+            donor, match_status, candidate = matcher.match_row(row.employee_id, row.employee_name, row.department)
+
+            if donor:
+                matched_count += 1
+                writer.add(donor, row.amount)
+            else:
+                unmatched_count += 1
+
+            if len(match_details) < MAX_LOGGED_MATCHES:
+                status_icon = "[OK]" if donor else "[??]"
+                detail = match_status
+                if candidate:
+                    detail += f" {flt(candidate.confidence * 100, 1)}%"
+                if match_status == "review":
+                    detail += f", closest {candidate.donor}"
+                match_details.append(
+                    f"{status_icon} {row.employee_name or 'Unknown'} -> {donor or 'NO MATCH'} ({detail})"
+                )
+
     # Build parse log
     error_detail = ""
-    if result["errors"]:
-        error_detail = "\n" + "\n".join(result["errors"][:50])  # Cap at 50 errors in log
-        if len(result["errors"]) > 50:
-            error_detail += f"\n... and {len(result['errors']) - 50} more errors"
+    if errors.messages:
+        error_detail = "\n" + "\n".join(errors.messages)
+        if errors.count > len(errors.messages):
+            error_detail += f"\n... and {errors.count - len(errors.messages)} more errors"
 
     parse_log = (
-        f"Parsed {result['summary']['total_rows']} rows, "
-        f"Total: {result['summary']['total_amount']}, "
-        f"Unique Employees: {result['summary']['unique_employees']}, "
-        f"Errors: {len(result['errors'])}"
+        f"Parsed {summary.total_rows} rows, "
+        f"Total: {flt(summary.total_amount)}, "
+        f"Errors: {errors.count}"
         f"{error_detail}"
     )
 
     doc.db_set("parse_log", parse_log)
     doc.db_set("status", "Parsed")
 
-    if not result["rows"]:
+    if not summary.total_rows:
         frappe.throw("No valid rows found in the uploaded file. Check the parse log for details.")
 
-    # Step 3: Match employees to donor Contact records
-    matched = match_employees_to_donors(result["rows"], doc.organization)
-    matched_count = sum(1 for r in matched if r.get("donor"))
-    unmatched_count = sum(1 for r in matched if not r.get("donor"))
-
     # Build match log with details
-    match_details = []
-    for r in matched:
-        status_icon = "[OK]" if r.get("donor") else "[??]"
-        donor_info = r.get("donor", "NO MATCH")
-        match_details.append(
-            f"{status_icon} {r.get('employee_name', 'Unknown')} -> {donor_info} ({r.get('match_status', 'unmatched')})"
-        )
-
     match_log = (
-        f"Matched: {matched_count}, Unmatched: {unmatched_count}\n\n"
-        + "\n".join(match_details[:100])  # Cap at 100 detail lines
+        f"Matched: {matched_count}, Unmatched: {unmatched_count}\n"
+        f"{matcher.get_crosswalk_summary()}\n"
+        f"{matcher.get_fuzzy_summary()}\n\n"
+        + "\n".join(match_details)
     )
-    if len(match_details) > 100:
-        match_log += f"\n... and {len(match_details) - 100} more rows"
+    if summary.total_rows > len(match_details):
+        match_log += f"\n... and {summary.total_rows - len(match_details)} more rows"
 
     doc.db_set("match_log", match_log)
     doc.db_set("status", "Matched")
 
-    # Step 4: Create Remittance (only matched rows)
-    matched_rows = [r for r in matched if r.get("donor")]
-    if matched_rows:
-        remittance_name = create_remittance_from_payroll(
-            organization=doc.organization,
-            campaign=doc.campaign,
-            remittance_date=str(doc.remittance_date),
-            rows=matched_rows,
-            total_amount=doc.expected_total,
-            reference_number=doc.reference_number,
-        )
+    # Remittance items were written as rows were matched (only matched rows)
+    remittance_name = writer.finish()
+    if remittance_name:
+        matcher.flush()
+        frappe.db.commit()
         doc.db_set("remittance", remittance_name)
         doc.db_set("status", "Remittance Created")
 
@@ -115,6 +132,7 @@ def process_payroll_upload(payroll_upload_name):
             "remittance": remittance_name,
             "matched": matched_count,
             "unmatched": unmatched_count,
+            "crosswalk_hits": matcher.crosswalk_hits,
         }
     else:
         frappe.throw(
@@ -122,29 +140,3 @@ def process_payroll_upload(payroll_upload_name):
             "Please check that donor Contact records exist for this organization "
             "and that names in the payroll file match."
         )
-
-
-def read_attached_file(file_url):
-    """Read content from an attached file.
-
-    Args:
-        file_url: The file URL from the Attach field
-
-    Returns:
-        File content as a string
-    """
-    if not file_url:
-        frappe.throw("No file attached.")
-
-    file_doc = frappe.get_doc("File", {"file_url": file_url})
-    file_path = file_doc.get_full_path()
-
-    # Try UTF-8 first, fall back to Latin-1 for Windows-origin files
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
-    except UnicodeDecodeError:
-        with open(file_path, "r", encoding="latin-1") as f:
-            return f.read()
-    except FileNotFoundError:
-        frappe.throw(f"Attached file not found at path: {file_path}")
@@ -2,6 +2,9 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from united_way import identity_map, rollups
+from united_way.cache import get_organization
+
 
 class Pledge(Document):
     def validate(self):
@@ -40,7 +43,7 @@ class Pledge(Document):
     def calculate_corporate_match(self):
         """Auto-calculate expected corporate match amount."""
         if self.eligible_for_match and self.donor_organization:
-            org = frappe.get_doc("Organization", self.donor_organization)
+            org = get_organization(self.donor_organization) or frappe._dict()
             if org.corporate_match and org.match_ratio:
                 self.match_amount = min(
                     flt(self.pledge_amount) * flt(org.match_ratio),
@@ -53,46 +56,26 @@ class Pledge(Document):
 
     def update_collection_fields(self):
         """Recalculate collection status from linked donations."""
-        total_collected = frappe.db.get_value(
-            "Donation",
-            {"pledge": self.name, "docstatus": 1},
-            "SUM(amount)",
-        ) or 0
-
-        self.total_collected = total_collected
-        self.outstanding_balance = flt(self.pledge_amount) - flt(total_collected)
-
-        if self.pledge_amount:
-            self.collection_percentage = (flt(total_collected) / flt(self.pledge_amount)) * 100
-        else:
-            self.collection_percentage = 0
+        fields = get_collection_fields({self.name: self.pledge_amount})[self.name]
 
-        # Auto-set collection status
-        if total_collected == 0:
-            self.collection_status = "Not Started"
-        elif flt(total_collected) >= flt(self.pledge_amount):
-            self.collection_status = "Fully Collected"
-        else:
-            self.collection_status = "In Progress"
-
-        # Last payment date
-        last_payment = frappe.db.get_value(
-            "Donation",
-            {"pledge": self.name, "docstatus": 1},
-            "MAX(donation_date)",
-        )
-        if last_payment:
-            self.last_payment_date = last_payment
+        self.total_collected = fields.total_collected
+        self.outstanding_balance = fields.outstanding_balance
+        self.collection_percentage = fields.collection_percentage
+        self.collection_status = fields.collection_status
+        if fields.last_payment_date:
+            self.last_payment_date = fields.last_payment_date
 
     def on_submit(self):
-        """After pledge is submitted, update campaign totals."""
-        self.update_campaign_totals()
+        """After pledge is submitted, update campaign totals and agency facts."""
+        self.update_campaign_totals(1)
+        self.update_agency_facts(1)
 
     def on_cancel(self):
         """After pledge is cancelled, update campaign totals.
         If this is being cancelled as part of an amendment, also warn
         about any donation linkages that need to be re-linked."""
-        self.update_campaign_totals()
+        self.update_campaign_totals(-1)
+        self.update_agency_facts(-1)
 
         # If being amended, check for linked donations and warn
         if self.amended_from or frappe.flags.in_amend:
@@ -110,7 +93,7 @@ class Pledge(Document):
     def before_insert(self):
         """When creating an amended pledge, inform the user about the amendment context."""
         if self.amended_from:
-            original = frappe.get_doc("Pledge", self.amended_from)
+            original = identity_map.get_header("Pledge", self.amended_from, ["pledge_amount"])
             frappe.msgprint(
                 f"This pledge was amended from {self.amended_from}. "
                 f"Original pledge amount was {frappe.format_value(original.pledge_amount, {'fieldtype': 'Currency'})}.",
@@ -118,11 +101,154 @@ class Pledge(Document):
                 title="Pledge Amendment"
             )
 
-    def update_campaign_totals(self):
-        """Trigger campaign recalculation."""
-        if self.campaign:
-            from united_way.uw_core.doctype.campaign.campaign import recalculate_campaign
-            recalculate_campaign(self.campaign)
+    def update_campaign_totals(self, sign):
+        """Queue campaign total deltas and campaign drive recalculation.
+
+        Args:
+            sign: 1 when the pledge is submitted, -1 when it is cancelled
+        """
+        from united_way.uw_core.doctype.campaign_donor.campaign_donor import (
+            add_campaign_donor,
+            remove_campaign_donor,
+        )
+
+        if not self.campaign:
+            return
+
+        if sign > 0:
+            donors = add_campaign_donor(self.campaign, self.donor)
+        else:
+            donors = -remove_campaign_donor(self.campaign, self.donor)
+
+        with rollups.batch():
+            rollups.add_campaign_delta(
+                self.campaign,
+                pledged=sign * flt(self.pledge_amount),
+                pledges=sign,
+                donors=donors,
+            )
+            rollups.mark_drive(self.campaign, self.donor_organization)
+
+    def update_agency_facts(self, sign):
+        """Queue this pledge's allocations (and any collections so far) into the agency facts.
+
+        Args:
+            sign: 1 when the pledge is submitted, -1 when it is cancelled
+        """
+        from united_way.uw_core.doctype.agency_campaign_donor.agency_campaign_donor import update_agency_donor
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import get_period
+
+        if not self.campaign:
+            return
+
+        period = get_period(self.pledge_date)
+
+        counted_agencies = set()
+        with rollups.batch():
+            for allocation in self.allocations:
+                if not allocation.agency:
+                    continue
+
+                # A pledge counts once per agency, under its first allocation there
+                rollups.add_agency_fact(
+                    self.campaign, allocation.agency, allocation.designation_type, period,
+                    allocated_amount=sign * flt(allocation.allocated_amount),
+                    pledge_count=0 if allocation.agency in counted_agencies else sign,
+                )
+                counted_agencies.add(allocation.agency)
+
+            # The donor is counted under their earliest remaining pledge to each agency,
+            # which this submit or cancel may have changed
+            for agency in counted_agencies if self.donor else ():
+                for counted_under, delta in update_agency_donor(self.campaign, agency, self.donor):
+                    rollups.add_agency_fact(self.campaign, agency, *counted_under, donor_count=delta)
+
+            # Donations only count toward agencies while their pledge is submitted
+            if sign < 0 or flt(self.total_collected):
+                for row in frappe.db.sql("""
+                    SELECT MIN(donation_date) AS donation_date, SUM(amount) AS amount
+                    FROM `tabDonation`
+                    WHERE pledge = %s AND docstatus = 1
+                    GROUP BY YEAR(donation_date), MONTH(donation_date)
+                """, self.name, as_dict=True):
+                    rollups.add_agency_split(
+                        self.name, get_period(row.donation_date),
+                        collected_amount=sign * flt(row.amount),
+                    )
+
+
+def get_collection_fields(pledge_amounts):
+    """Compute collection fields for many pledges with one grouped Donation query.
+
+    Args:
+        pledge_amounts: {pledge_name: pledge_amount}
+
+    Returns:
+        {pledge_name: frappe._dict(total_collected, outstanding_balance,
+        collection_percentage, collection_status, last_payment_date)}
+    """
+    if not pledge_amounts:
+        return {}
+
+    donations = {
+        row.pledge: row
+        for row in frappe.db.sql("""
+            SELECT pledge, SUM(amount) AS total_collected, MAX(donation_date) AS last_payment_date
+            FROM `tabDonation`
+            WHERE pledge IN %(pledges)s AND docstatus = 1
+            GROUP BY pledge
+        """, {"pledges": tuple(pledge_amounts)}, as_dict=True)
+    }
+
+    result = {}
+    for name, pledge_amount in pledge_amounts.items():
+        pledge_amount = flt(pledge_amount)
+        row = donations.get(name)
+        total_collected = flt(row.total_collected) if row else 0
+
+        if total_collected == 0:
+            collection_status = "Not Started"
+        elif total_collected >= pledge_amount:
+            collection_status = "Fully Collected"
+        else:
+            collection_status = "In Progress"
+
+        result[name] = frappe._dict(
+            total_collected=total_collected,
+            outstanding_balance=pledge_amount - total_collected,
+            collection_percentage=(total_collected / pledge_amount) * 100 if pledge_amount else 0,
+            collection_status=collection_status,
+            last_payment_date=row.last_payment_date if row else None,
+        )
+
+    return result
+
+
+def recompute_pledge_collections(pledge_names, chunk_size=1000):
+    """Recalculate and store collection fields for many pledges.
+
+    Each chunk costs one Pledge read, one grouped Donation query and one
+    UPDATE ... CASE, regardless of how many pledges it holds. A pledge with
+    no submitted donations keeps its existing last_payment_date.
+    """
+    from united_way.utils import bulk_update
+
+    pledge_names = sorted(set(filter(None, pledge_names)))
+
+    for start in range(0, len(pledge_names), chunk_size):
+        chunk = pledge_names[start:start + chunk_size]
+        pledges = frappe.get_all(
+            "Pledge",
+            filters={"name": ["in", chunk]},
+            fields=["name", "pledge_amount", "last_payment_date"],
+        )
+        fields = get_collection_fields({p.name: p.pledge_amount for p in pledges})
+
+        for pledge in pledges:
+            if not fields[pledge.name].last_payment_date:
+                fields[pledge.name].last_payment_date = pledge.last_payment_date
+
+        bulk_update("Pledge", fields, chunk_size=chunk_size)
 
 
 # Hook functions referenced in hooks.py
@@ -76,13 +76,13 @@ class TestPledge(unittest.TestCase):
             "Campaign", {"campaign_name": "_Test Campaign"}, "name"
         )
 
-    def _make_pledge(self, amount=1000, allocations=None, submit=False):
+    def _make_pledge(self, amount=1000, allocations=None, submit=False, campaign=None, pledge_date="2099-06-01"):
         """Helper to create a test pledge."""
         pledge = frappe.new_doc("Pledge")
-        pledge.campaign = self.campaign_name
+        pledge.campaign = campaign or self.campaign_name
         pledge.donor = self.donor_name
         pledge.pledge_amount = amount
-        pledge.pledge_date = "2099-06-01"
+        pledge.pledge_date = pledge_date
 
         if allocations is None:
             allocations = [
@@ -97,6 +97,23 @@ class TestPledge(unittest.TestCase):
             pledge.submit()
         return pledge
 
+    def _make_campaign(self, campaign_name):
+        """Helper to get (or create) a separate submitted campaign."""
+        if not frappe.db.exists("Campaign", {"campaign_name": campaign_name}):
+            camp = frappe.get_doc({
+                "doctype": "Campaign",
+                "campaign_name": campaign_name,
+                "campaign_type": "Annual Campaign",
+                "campaign_year": 2099,
+                "status": "Active",
+                "start_date": "2099-01-01",
+                "end_date": "2099-12-31",
+                "fundraising_goal": 10000,
+            })
+            camp.insert()
+            camp.submit()
+        return frappe.db.get_value("Campaign", {"campaign_name": campaign_name}, "name")
+
     # --- Allocation Validation Tests ---
 
     def test_allocations_must_total_100(self):
@@ -178,6 +195,23 @@ class TestPledge(unittest.TestCase):
         self.assertEqual(flt(pledge.match_amount), 0)
         pledge.delete()
 
+    def test_corporate_match_uses_updated_match_ratio(self):
+        """Saving the Organization should invalidate the cached match terms."""
+        org = frappe.get_doc("Organization", "_Test Corp Matcher")
+        org.match_ratio = 0.5
+        org.save()
+
+        try:
+            pledge = self._make_pledge(amount=3000)
+            pledge.eligible_for_match = 1
+            pledge.save()
+            self.assertEqual(flt(pledge.match_amount), 1500)
+            pledge.delete()
+        finally:
+            org.reload()
+            org.match_ratio = 1.0
+            org.save()
+
     # --- Collection Status Tests ---
 
     def test_initial_collection_status(self):
@@ -186,3 +220,221 @@ class TestPledge(unittest.TestCase):
         self.assertEqual(pledge.collection_status, "Not Started")
         self.assertEqual(flt(pledge.total_collected), 0)
         pledge.delete()
+
+    def test_recompute_pledge_collections_in_bulk(self):
+        """The bulk engine should repair collection fields for several pledges at once."""
+        from united_way.uw_core.doctype.pledge.pledge import recompute_pledge_collections
+
+        paid = self._make_pledge(amount=1000, submit=True)
+        unpaid = self._make_pledge(amount=800, submit=True)
+
+        donation = frappe.get_doc({
+            "doctype": "Donation",
+            "donation_date": "2099-07-15",
+            "donor": self.donor_name,
+            "campaign": self.campaign_name,
+            "pledge": paid.name,
+            "amount": 400,
+            "payment_method": "Check",
+        })
+        donation.insert()
+        donation.submit()
+
+        # Corrupt the stored fields, then recompute both pledges together
+        for name in (paid.name, unpaid.name):
+            frappe.db.set_value("Pledge", name, {
+                "total_collected": 999,
+                "collection_status": "Fully Collected",
+            })
+        recompute_pledge_collections([paid.name, unpaid.name])
+
+        paid.reload()
+        self.assertEqual(flt(paid.total_collected), 400)
+        self.assertEqual(flt(paid.outstanding_balance), 600)
+        self.assertEqual(flt(paid.collection_percentage), 40)
+        self.assertEqual(paid.collection_status, "In Progress")
+        self.assertEqual(str(paid.last_payment_date), "2099-07-15")
+
+        unpaid.reload()
+        self.assertEqual(flt(unpaid.total_collected), 0)
+        self.assertEqual(unpaid.collection_status, "Not Started")
+
+        donation.cancel()
+        paid.cancel()
+        unpaid.cancel()
+
+    def test_agency_facts_follow_submit_and_cancel(self):
+        """Agency facts should match a full rebuild and empty out when everything is cancelled."""
+        from united_way.reporting import get_agency_totals
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+            rebuild_agency_facts,
+        )
+
+        campaign = self._make_campaign("_Test Agency Fact Campaign")
+
+        split = [
+            {"agency": "_Test Agency Alpha", "designation_type": "Donor Designated", "percentage": 60},
+            {"agency": "_Test Agency Beta", "designation_type": "Undesignated", "percentage": 40},
+        ]
+        first = self._make_pledge(amount=1000, allocations=split, submit=True, campaign=campaign)
+        second = self._make_pledge(amount=500, submit=True, campaign=campaign)
+
+        donation = frappe.get_doc({
+            "doctype": "Donation",
+            "donation_date": "2099-07-15",
+            "donor": self.donor_name,
+            "campaign": campaign,
+            "pledge": first.name,
+            "amount": 500,
+            "payment_method": "Check",
+        })
+        donation.insert()
+        donation.submit()
+
+        def totals():
+            return {
+                row.agency: (row.allocated_amount, row.collected_amount, row.pledge_count, row.donor_count)
+                for row in get_agency_totals({"campaign": campaign})
+            }
+
+        incremental = totals()
+        self.assertEqual(incremental["_Test Agency Alpha"], (1100, 300, 2, 1))
+        self.assertEqual(incremental["_Test Agency Beta"], (400, 200, 1, 1))
+
+        rebuild_agency_facts(campaign)
+        self.assertEqual(totals(), incremental)
+
+        donation.cancel()
+        first.cancel()
+        second.cancel()
+        self.assertEqual(totals(), {})
+
+    def test_agency_donor_moves_to_earliest_remaining_pledge(self):
+        """Donor counts should follow the earliest submitted pledge, as a rebuild counts them."""
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+            rebuild_agency_facts,
+        )
+
+        campaign = self._make_campaign("_Test Agency Donor Campaign")
+
+        def facts():
+            return sorted(
+                (row.designation_type, str(row.period), row.pledge_count, row.donor_count, flt(row.allocated_amount))
+                for row in frappe.get_all(
+                    "Agency Campaign Fact", filters={"campaign": campaign},
+                    fields=["designation_type", "period", "pledge_count", "donor_count", "allocated_amount"],
+                )
+            )
+
+        # Submitted out of order: the later pledge first
+        later = self._make_pledge(amount=300, submit=True, campaign=campaign, pledge_date="2099-08-01", allocations=[
+            {"agency": "_Test Agency Alpha", "designation_type": "Undesignated", "percentage": 100},
+        ])
+        earlier = self._make_pledge(amount=200, submit=True, campaign=campaign, pledge_date="2099-03-01")
+        self.assertIn(("Donor Designated", "2099-03-01", 1, 1, 200), facts())
+
+        earlier.cancel()
+        incremental = facts()
+        self.assertEqual(incremental, [("Undesignated", "2099-08-01", 1, 1, 300)])
+
+        rebuild_agency_facts(campaign)
+        self.assertEqual(facts(), incremental)
+
+        later.cancel()
+        self.assertEqual(facts(), [])
+
+    def test_campaign_summary_splits_donations_by_allocation(self):
+        """A multi-agency pledge's donations should be split, not counted in full for each agency."""
+        from united_way.reporting import get_agency_collections
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import (
+            reconcile_agency_facts,
+        )
+        from united_way.uw_core.report.campaign_summary.campaign_summary import execute
+
+        campaign = self._make_campaign("_Test Agency Split Campaign")
+        pledge = self._make_pledge(amount=1000, submit=True, campaign=campaign, allocations=[
+            {"agency": "_Test Agency Alpha", "designation_type": "Donor Designated", "percentage": 75},
+            {"agency": "_Test Agency Beta", "designation_type": "Donor Designated", "percentage": 25},
+        ])
+        donation = frappe.get_doc({
+            "doctype": "Donation",
+            "donation_date": "2099-07-15",
+            "donor": self.donor_name,
+            "campaign": campaign,
+            "pledge": pledge.name,
+            "amount": 400,
+            "payment_method": "Check",
+        })
+        donation.insert()
+        donation.submit()
+
+        report = {row.agency: row.total_collected for row in execute({"campaign": campaign})[1]}
+        source = {
+            row.agency: flt(row.collected_amount)
+            for row in get_agency_collections({"campaign": campaign})
+        }
+        self.assertEqual(report, {"_Test Agency Alpha": 300, "_Test Agency Beta": 100})
+        self.assertEqual(source, report)
+        self.assertEqual(reconcile_agency_facts(campaign), [])
+
+        # Drift in any measure, counts included, is reported and repaired
+        fact = frappe.db.get_value(
+            "Agency Campaign Fact", {"campaign": campaign, "agency": "_Test Agency Beta", "donor_count": 1}, "name"
+        )
+        frappe.db.set_value("Agency Campaign Fact", fact, {"pledge_count": 5, "donor_count": 0}, update_modified=False)
+        drifted = reconcile_agency_facts(campaign, repair=True)
+        self.assertEqual(len(drifted), 1)
+        self.assertEqual(
+            [sorted(measures) for measures in drifted[0]["drift"].values()], [["donor_count", "pledge_count"]]
+        )
+        self.assertEqual(reconcile_agency_facts(campaign), [])
+
+        donation.cancel()
+        pledge.cancel()
+
+    def test_synthetic_data_is_deterministic_and_reconciled(self):
+        """A small synthetic load should repeat exactly and leave every rollup in step."""
+        from united_way import synthetic
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import reconcile_agency_facts
+        from united_way.uw_core.doctype.campaign.campaign import reconcile_campaign_totals
+        from united_way.uw_core.doctype.pledge.pledge import get_collection_fields
+
+        params = {"agencies": 4, "employers": 3, "contacts": 40, "campaigns": 2,
+                  "pledges_per_campaign": 30, "with_schedules": True, "aging_snapshots": 2, "chunk_size": 7}
+
+        def snapshot():
+            return frappe.db.sql("""
+                SELECT name, donor, pledge_amount, payment_frequency, total_collected
+                FROM `tabPledge` WHERE name LIKE 'SYN-%%' ORDER BY name
+            """)
+
+        try:
+            counts = synthetic.generate(**params)
+            first = snapshot()
+            self.assertEqual(synthetic.generate(**params), counts)
+            self.assertEqual(snapshot(), first)
+
+            self.assertEqual(counts["Pledge"], 60)
+            # Old campaigns leave overdue installments for the month-end aging snapshots
+            self.assertGreater(counts["Receivable Aging Snapshot"], 0)
+            self.assertEqual(frappe.db.count("Donation", {"name": ("like", "SYN-%")}), counts["Donation"])
+
+            for campaign in ("SYN-CAMP-001", "SYN-CAMP-002"):
+                self.assertEqual(reconcile_campaign_totals(campaign), [])
+                self.assertEqual(reconcile_agency_facts(campaign), [])
+
+            pledges = dict(frappe.db.sql("SELECT name, pledge_amount FROM `tabPledge` WHERE name LIKE 'SYN-%%'"))
+            for name, fields in get_collection_fields(pledges).items():
+                stored = frappe.db.get_value("Pledge", name, ["total_collected", "collection_status"], as_dict=True)
+                self.assertAlmostEqual(flt(stored.total_collected), fields.total_collected, places=2)
+                self.assertEqual(stored.collection_status, fields.collection_status)
+
+            donor, lifetime = frappe.db.sql("""
+                SELECT donor, SUM(amount) FROM `tabDonation`
+                WHERE name LIKE 'SYN-%%' AND docstatus = 1 GROUP BY donor ORDER BY donor LIMIT 1
+            """)[0]
+            self.assertAlmostEqual(flt(frappe.db.get_value("Contact", donor, "lifetime_giving")), flt(lifetime), places=2)
+        finally:
+            synthetic.purge()
+
+        self.assertFalse(frappe.db.exists("Pledge", {"name": ("like", "SYN-%")}))
@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, nowdate, add_days, add_months, getdate
 
+from united_way import identity_map, rollups
+
 
 class PledgeWriteoff(Document):
     def validate(self):
@@ -51,18 +53,26 @@ class PledgeWriteoff(Document):
                     entry.status = "Written Off"
                     entry.db_update()
 
-        # Create journal entry if enabled
-        try:
-            from united_way.accounting import create_writeoff_journal_entry
-            create_writeoff_journal_entry(self)
-        except Exception:
-            pass  # Don't block writeoff if JE creation fails
+        self.update_agency_facts(flt(self.writeoff_amount))
+
+        # Queue journal entry if enabled (posted by the outbox worker)
+        from united_way.accounting import create_writeoff_journal_entry
+        create_writeoff_journal_entry(self)
 
     def on_cancel(self):
-        """On cancellation: reload pledge and recalculate collection fields."""
-        pledge = frappe.get_doc("Pledge", self.pledge)
-        pledge.update_collection_fields()
-        pledge.db_update()
+        """On cancellation: recalculate collection fields of the pledge."""
+        with rollups.batch():
+            rollups.mark_pledge(self.pledge)
+            self.update_agency_facts(-flt(self.writeoff_amount))
+
+    def update_agency_facts(self, written_off):
+        """Queue the change to the written-off amount of the pledge's agencies."""
+        from united_way.uw_core.doctype.agency_campaign_fact.agency_campaign_fact import get_period
+
+        with rollups.batch():
+            rollups.add_agency_split(
+                self.pledge, get_period(self.writeoff_date), written_off_amount=written_off
+            )
 
 
 @frappe.whitelist()
@@ -75,7 +85,11 @@ def generate_payment_schedule(pledge_name):
     Returns:
         List of dicts with due_date and expected_amount for each scheduled payment.
     """
-    pledge = frappe.get_doc("Pledge", pledge_name)
+    pledge = identity_map.get_header("Pledge", pledge_name, [
+        "pledge_amount", "pledge_date", "payment_frequency", "payroll_start_date",
+    ])
+    if not pledge:
+        frappe.throw(f"Pledge {pledge_name} not found.")
 
     frequency_map = {
         "Weekly": 52,
@@ -344,3 +344,38 @@ class TestPledgeWriteoff(unittest.TestCase):
             self.assertEqual(flt(entry["expected_amount"]), per_period)
 
         pledge.cancel()
+
+    # --- Aging Tests ---
+
+    def test_aging_buckets_by_days_overdue(self):
+        """Open schedule balances should land in the bucket for their days overdue."""
+        from united_way.reporting import get_aging_buckets
+        from united_way.uw_core.doctype.receivable_aging_snapshot.receivable_aging_snapshot import (
+            take_aging_snapshot,
+        )
+
+        def buckets():
+            return get_aging_buckets(
+                {"campaign": self.campaign_name}, group_by=(), as_of_date="2096-08-15"
+            )[0]
+
+        before = buckets()
+        pledge = self._make_pledge(amount=2000, with_schedule=True)
+        after = buckets()
+
+        # Due 2096-07-01 is 45 days overdue, 2096-08-01 is 14
+        self.assertEqual(flt(after.bucket_31_60 - before.bucket_31_60), 1000)
+        self.assertEqual(flt(after.bucket_0_30 - before.bucket_0_30), 1000)
+        self.assertEqual(flt(after.bucket_90_plus - before.bucket_90_plus), 0)
+        self.assertEqual(after.overdue_count - before.overdue_count, 2)
+
+        take_aging_snapshot("2096-08-15")
+        snapshot = frappe.db.get_value(
+            "Receivable Aging Snapshot",
+            {"snapshot_date": "2096-08-15", "campaign": self.campaign_name},
+            "SUM(total_outstanding)",
+        )
+        self.assertEqual(flt(snapshot), flt(after.total_outstanding))
+
+        frappe.db.delete("Receivable Aging Snapshot", {"snapshot_date": "2096-08-15"})
+        pledge.cancel()
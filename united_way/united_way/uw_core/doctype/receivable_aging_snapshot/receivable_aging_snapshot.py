@@ -0,0 +1,46 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate, now, nowdate
+
+from united_way.reporting import AGING_BUCKETS, get_aging_buckets
+
+MEASURES = [bucket[0] for bucket in AGING_BUCKETS] + ["total_outstanding", "overdue_count", "entry_count"]
+
+
+class ReceivableAgingSnapshot(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Receivable Aging Snapshot", ["snapshot_date", "campaign"])
+
+
+def take_aging_snapshot(snapshot_date=None):
+    """Record the day's aging buckets per campaign and employer, replacing any earlier run that day.
+
+    Returns:
+        Number of rows written
+    """
+    snapshot_date = getdate(snapshot_date or nowdate())
+    rows = [
+        row for row in get_aging_buckets(group_by=("campaign", "employer"), as_of_date=snapshot_date)
+        if row.total_outstanding
+    ]
+
+    frappe.db.delete("Receivable Aging Snapshot", {"snapshot_date": snapshot_date})
+    if not rows:
+        return 0
+
+    timestamp = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Receivable Aging Snapshot",
+        fields=["name", "creation", "modified", "owner", "modified_by",
+                "snapshot_date", "campaign", "employer"] + MEASURES,
+        values=[
+            (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+             snapshot_date, row.campaign, row.employer) + tuple(row[measure] for measure in MEASURES)
+            for row in rows
+        ],
+    )
+    return len(rows)
@@ -2,6 +2,8 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from united_way.donation_batches import process_or_enqueue
+
 
 class Remittance(Document):
     def validate(self):
@@ -25,35 +27,31 @@ class Remittance(Document):
         self.variance = flt(flt(self.total_amount) - flt(self.items_total))
 
     def on_submit(self):
-        """Create individual Donation records for each remittance item."""
-        donation_count = 0
-
-        for item in self.items:
-            donation = frappe.new_doc("Donation")
-            donation.donation_date = self.remittance_date
-            donation.donor = item.donor
-            donation.campaign = self.campaign
-            donation.amount = item.amount
-            donation.pledge = item.pledge
-            donation.payment_method = "Payroll Deduction"
-            donation.reference_number = self.reference_number
-            donation.batch_number = self.name
-            donation.insert()
-            donation.submit()
-
-            # Write the created donation name back to the item row
-            frappe.db.set_value("Remittance Item", item.name, "donation", donation.name)
-            donation_count += 1
-
-        # Update the donations created count
-        self.db_set("donations_created", donation_count)
+        """Create individual Donation records for each remittance item.
+
+        Large remittances are processed in the background; see
+        united_way.donation_batches."""
+        process_or_enqueue(self, "submit")
 
     def on_cancel(self):
         """Cancel all Donation records created by this remittance."""
-        for item in self.items:
-            if item.donation:
-                donation = frappe.get_doc("Donation", item.donation)
-                donation.cancel()
-                frappe.db.set_value("Remittance Item", item.name, "donation", "")
-
-        self.db_set("donations_created", 0)
+        process_or_enqueue(self, "cancel")
+
+    def make_donation(self, item):
+        """Create and submit the Donation for one remittance item."""
+        donation = frappe.new_doc("Donation")
+        donation.donation_date = self.remittance_date
+        donation.donor = item.donor
+        donation.campaign = self.campaign
+        donation.amount = item.amount
+        donation.pledge = item.pledge
+        donation.payment_method = "Payroll Deduction"
+        donation.reference_number = self.reference_number
+        donation.batch_number = self.name
+        donation.insert()
+        donation.submit()
+        return donation.name
+
+    def cancel_donation(self, item):
+        """Cancel the Donation created for one remittance item."""
+        frappe.get_doc("Donation", item.donation).cancel()
@@ -1,5 +1,6 @@
 import frappe
 import unittest
+from unittest.mock import patch
 from frappe.utils import flt
 
 
@@ -290,3 +291,316 @@ class TestRemittance(unittest.TestCase):
         rem.cancel()
         rem.reload()
         self.assertEqual(rem.donations_created, 0)
+
+    # --- Rollup Queue Tests ---
+
+    def test_on_submit_recalculates_campaign_once(self):
+        """A multi-item remittance should update its campaign row once, not per item."""
+        from united_way.uw_core.doctype.campaign import campaign as campaign_module
+
+        with patch.object(
+            campaign_module, "apply_campaign_delta", wraps=campaign_module.apply_campaign_delta
+        ) as apply_delta:
+            rem = self._make_remittance(total_amount=900, items=[
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+                {"donor": self.donor_b, "amount": 300, "pledge": self.pledge_b},
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+            ], submit=True)
+
+        self.assertEqual(apply_delta.call_count, 1)
+
+        # Pledge rollups are still applied before submit returns
+        pledge = frappe.get_doc("Pledge", self.pledge_a)
+        self.assertGreaterEqual(flt(pledge.total_collected), 600)
+
+        rem.cancel()
+
+    # --- Background Processing Tests ---
+
+    def _run_in_background(self, threshold=1, chunk_size=1):
+        """Force background mode and run enqueued jobs synchronously."""
+        from united_way.cache import get_settings
+
+        settings = frappe._dict(get_settings(), background_item_threshold=threshold, item_chunk_size=chunk_size)
+        settings_patch = patch("united_way.donation_batches.get_settings", return_value=settings)
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+
+        def run_now(method, **kwargs):
+            for key in ("queue", "timeout", "job_id", "deduplicate", "enqueue_after_commit"):
+                kwargs.pop(key, None)
+            frappe.get_attr(method)(**kwargs)
+
+        return patch("frappe.enqueue", side_effect=run_now)
+
+    def test_background_submit_processes_in_chunks(self):
+        """Remittances above the threshold should be processed by the background job."""
+        with self._run_in_background():
+            rem = self._make_remittance(total_amount=900, items=[
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+                {"donor": self.donor_b, "amount": 300, "pledge": self.pledge_b},
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+            ], submit=True)
+
+        rem.reload()
+        self.assertEqual(rem.processing_status, "Completed")
+        self.assertEqual(rem.processed_items, 3)
+        self.assertEqual(rem.donations_created, 3)
+        self.assertTrue(all(item.donation for item in rem.items))
+
+        with self._run_in_background():
+            rem.cancel()
+
+        rem.reload()
+        self.assertEqual(rem.donations_created, 0)
+        self.assertFalse(any(item.donation for item in rem.items))
+
+    def test_cancel_refused_while_submit_is_queued(self):
+        """Cancelling before the submit job has run should fail, and stale jobs should do nothing."""
+        from united_way.donation_batches import process_items
+
+        with self._run_in_background(), patch("frappe.enqueue") as enqueue:
+            rem = self._make_remittance(total_amount=600, submit=True)
+
+        self.assertTrue(enqueue.call_args.kwargs["job_id"].endswith("::submit"))
+        rem.reload()
+        self.assertEqual(rem.processing_status, "Queued")
+
+        with self.assertRaises(frappe.ValidationError):
+            rem.cancel()
+        rem.reload()
+        self.assertEqual(rem.docstatus, 1)
+
+        # A cancel job for a document that is still submitted is a no-op
+        process_items("Remittance", rem.name, "cancel")
+        rem.reload()
+        self.assertEqual(rem.processing_status, "Queued")
+
+        with self._run_in_background():
+            process_items("Remittance", rem.name, "submit")
+        rem.reload()
+        self.assertEqual((rem.processing_status, rem.donations_created), ("Completed", 2))
+
+        with self._run_in_background():
+            rem.cancel()
+        rem.reload()
+        self.assertEqual(rem.donations_created, 0)
+
+    def test_failed_background_submit_resumes_from_checkpoint(self):
+        """A failed job should keep committed chunks and resume after the checkpoint."""
+        from united_way.donation_batches import resume_item_processing
+        from united_way.uw_core.doctype.remittance.remittance import Remittance
+
+        make_donation = Remittance.make_donation
+
+        def fail_on_second_item(doc, item):
+            if item.idx == 2:
+                frappe.throw("Simulated failure")
+            return make_donation(doc, item)
+
+        with self._run_in_background(), patch.object(
+            Remittance, "make_donation", autospec=True, side_effect=fail_on_second_item
+        ):
+            rem = self._make_remittance(total_amount=900, items=[
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+                {"donor": self.donor_b, "amount": 300, "pledge": self.pledge_b},
+                {"donor": self.donor_a, "amount": 300, "pledge": self.pledge_a},
+            ], submit=True)
+
+        rem.reload()
+        self.assertEqual(rem.processing_status, "Failed")
+        self.assertEqual(rem.processed_items, 1)
+        self.assertEqual(rem.donations_created, 1)
+
+        with self._run_in_background():
+            resume_item_processing("Remittance", rem.name)
+
+        rem.reload()
+        self.assertEqual(rem.processing_status, "Completed")
+        self.assertEqual(rem.donations_created, 3)
+        self.assertEqual(
+            frappe.db.count("Donation", {"batch_number": rem.name, "docstatus": 1}), 3
+        )
+
+        with self._run_in_background():
+            rem.cancel()
+
+    def test_payroll_rows_stream_into_remittance_chunks(self):
+        """Parsed payroll rows should stream from bytes into a remittance written in chunks."""
+        import io
+
+        from united_way.payroll_import import ParseErrors, RemittanceWriter, iter_payroll_rows
+
+        # Latin-1 bytes (not valid UTF-8) with a header and one bad amount
+        content = 'employee_id,employee_name,amount\nE1,Zoë Adams,"$1,200.00"\nE2,Bad Row,abc\nE3,Sam Lee,25\n'
+        errors = ParseErrors()
+        rows = list(iter_payroll_rows(io.BytesIO(content.encode("latin-1")), "csv", errors))
+
+        self.assertEqual([(row.employee_id, row.employee_name, row.amount) for row in rows],
+                         [("E1", "Zoë Adams", 1200), ("E3", "Sam Lee", 25)])
+        self.assertEqual(errors.count, 1)
+
+        writer = RemittanceWriter("_Test Corp Remittance", self.campaign_name, "2095-07-01", chunk_size=2)
+        for donor, amount in ((self.donor_a, 100), (self.donor_b, 200), (self.donor_a, 300)):
+            writer.add(donor, amount)
+        rem = frappe.get_doc("Remittance", writer.finish())
+
+        self.assertEqual([item.idx for item in rem.items], [1, 2, 3])
+        self.assertEqual([item.pledge for item in rem.items], [self.pledge_a, self.pledge_b, self.pledge_a])
+        self.assertEqual(flt(rem.items_total), 600)
+        self.assertEqual(flt(rem.total_amount), 600)
+        self.assertEqual(flt(rem.variance), 0)
+
+    def test_payroll_matching_uses_employee_ids(self):
+        """Employee IDs should resolve from the preloaded map and stay unique per employer."""
+        from united_way.payroll_import import match_employees_to_donors
+
+        frappe.db.set_value("Contact", self.donor_a, "organization", "_Test Corp Remittance")
+        contact = frappe.get_doc("Contact", self.donor_a)
+        contact.employee_id = " E-100 "
+        contact.save()
+        self.assertEqual(contact.employee_id, "E-100")
+
+        try:
+            rows = [
+                {"employee_id": "E-100", "employee_name": "Someone Else", "amount": 10},
+                {"employee_id": "E-999", "employee_name": "Nobody Known", "amount": 10},
+            ]
+            with patch("frappe.get_all", wraps=frappe.get_all) as get_all:
+                matched = match_employees_to_donors(rows, "_Test Corp Remittance")
+            self.assertEqual(get_all.call_count, 1)
+            self.assertEqual([(r["donor"], r["match_status"]) for r in matched],
+                             [(self.donor_a, "exact"), (None, "unmatched")])
+
+            other = frappe.get_doc("Contact", self.donor_b)
+            other.organization = "_Test Corp Remittance"
+            other.employee_id = "E-100"
+            with self.assertRaises(frappe.ValidationError):
+                other.save()
+        finally:
+            frappe.db.set_value("Contact", self.donor_a, {"organization": None, "employee_id": None})
+
+    def test_payroll_crosswalk_learns_and_resolves(self):
+        """Name matches and manual resolutions should be remembered for later uploads."""
+        from united_way.payroll_import import DonorMatcher, get_match_key
+        from united_way.uw_core.doctype.employee_crosswalk.employee_crosswalk import resolve_payroll_employee
+
+        self.assertEqual(get_match_key(None, "Smith, John"), get_match_key(None, " JOHN  smith "))
+        self.assertEqual(get_match_key("E-7", "Anyone"), "id:e-7")
+
+        frappe.db.set_value("Contact", self.donor_a, "organization", "_Test Corp Remittance")
+        try:
+            # A name match is learned under the row's employee ID
+            matcher = DonorMatcher("_Test Corp Remittance", learn_from="_Test Payroll Upload")
+            self.assertEqual(matcher.match("E-7", "DonorA, _TestRem"), (self.donor_a, "name_match"))
+            self.assertEqual(matcher.match("E-7", "DonorA, _TestRem"), (self.donor_a, "name_match"))
+            matcher.flush()
+            entry = frappe.db.get_value(
+                "Employee Crosswalk", {"organization": "_Test Corp Remittance", "match_key": "id:e-7"},
+                ["donor", "source", "payroll_upload"], as_dict=True,
+            )
+            self.assertEqual((entry.donor, entry.source), (self.donor_a, "Learned"))
+
+            # A manual resolution for an unmatched name
+            resolve_payroll_employee("_Test Corp Remittance", self.donor_b, employee_name="Unknown, Person")
+
+            matcher = DonorMatcher("_Test Corp Remittance", learn_from="_Test Payroll Upload")
+            self.assertEqual(matcher.match("E-7", "Renamed Employee"), (self.donor_a, "crosswalk"))
+            self.assertEqual(matcher.match(None, "Person Unknown"), (self.donor_b, "crosswalk"))
+            self.assertEqual(matcher.match(None, "Nobody Known"), (None, "unmatched"))
+            self.assertEqual((matcher.crosswalk_hits, matcher.crosswalk_misses), (2, 1))
+            self.assertIn("2 hits, 1 misses", matcher.get_crosswalk_summary())
+
+            matcher.flush()
+            self.assertEqual(frappe.db.get_value(
+                "Employee Crosswalk", {"organization": "_Test Corp Remittance", "match_key": "id:e-7"}, "hit_count"
+            ), 2)
+        finally:
+            frappe.db.delete("Employee Crosswalk", {"organization": "_Test Corp Remittance"})
+            frappe.db.set_value("Contact", self.donor_a, "organization", None)
+
+    def test_payroll_crosswalk_learns_only_unambiguous_names(self):
+        """Shared names should not be learned, and learned entries should not override employee IDs."""
+        from united_way.payroll_import import DonorMatcher
+
+        frappe.db.set_value("Contact", self.donor_a, "organization", "_Test Corp Remittance")
+        frappe.db.set_value("Contact", self.donor_b, {
+            "organization": "_Test Corp Remittance", "last_name": "DonorA", "full_name": "_TestRem DonorA",
+        })
+        try:
+            # Two contacts named "_TestRem DonorA": neither is matched or learned
+            matcher = DonorMatcher("_Test Corp Remittance", learn_from="_Test Payroll Upload")
+            self.assertEqual(matcher.match("E-8", "DonorA, _TestRem"), (None, "review"))
+            self.assertEqual(matcher.match(None, "_TestRem DonorA"), (None, "review"))
+            matcher.flush()
+            self.assertFalse(frappe.db.exists("Employee Crosswalk", {"organization": "_Test Corp Remittance"}))
+
+            # Once the name is unique again, the match is learned under the employee ID
+            frappe.db.set_value("Contact", self.donor_b, {"last_name": "DonorB", "full_name": "_TestRem DonorB"})
+            matcher = DonorMatcher("_Test Corp Remittance", learn_from="_Test Payroll Upload")
+            self.assertEqual(matcher.match("E-8", "DonorA, _TestRem"), (self.donor_a, "name_match"))
+            matcher.flush()
+
+            # The Contact holding the employee ID wins over the learned entry
+            frappe.db.set_value("Contact", self.donor_b, "employee_id", "E-8")
+            matcher = DonorMatcher("_Test Corp Remittance", learn_from="_Test Payroll Upload")
+            self.assertEqual(matcher.match("E-8", "DonorA, _TestRem"), (self.donor_b, "exact"))
+            self.assertEqual(matcher.match("E-9", "DonorA, _TestRem"), (self.donor_a, "name_match"))
+        finally:
+            frappe.db.delete("Employee Crosswalk", {"organization": "_Test Corp Remittance"})
+            frappe.db.set_value("Contact", self.donor_a, "organization", None)
+            frappe.db.set_value("Contact", self.donor_b, {
+                "organization": None, "employee_id": None, "last_name": "DonorB", "full_name": "_TestRem DonorB",
+            })
+
+    def test_payroll_fuzzy_matching_scores_blocked_candidates(self):
+        """Leftover names should be matched by blocked similarity, with per-employer thresholds."""
+        from united_way.name_matching import NameIndex, soundex
+        from united_way.payroll_import import DonorMatcher, match_employees_to_donors
+
+        self.assertEqual([soundex(name) for name in ("Robert", "Rupert", "Ashcraft", "Tymczak")],
+                         ["R163", "R163", "A261", "T522"])
+        # Accented letters are coded as their base letters rather than dropped
+        self.assertEqual([soundex(name) for name in ("Müller", "Muller", "Ñúñez")], ["M460", "M460", "N520"])
+
+        index = NameIndex()
+        index.add("bob", "Smith", "Bob")
+        index.add("robin", "Smith", "Robin")
+        index.add("mary", "Jones", "Mary")
+        # Nicknames and middle initials; Mary Jones is in another block and never scored
+        self.assertEqual(index.search("Smith", "Robert J."), [("bob", 0.98), ("robin", 0.785)])
+        # An initial fits both Bob and Robin equally
+        self.assertEqual([c.confidence for c in index.search("Smith", "R.")], [0.92, 0.92])
+
+        frappe.db.set_value("Contact", self.donor_a, {"organization": "_Test Corp Remittance", "department": "Finance"})
+        frappe.db.set_value("Organization", "_Test Corp Remittance",
+                            {"fuzzy_match_threshold": 90, "fuzzy_review_threshold": 75})
+        try:
+            matcher = DonorMatcher("_Test Corp Remittance")
+            self.assertEqual(matcher.match(None, "DonorA, TestRem"), (self.donor_a, "fuzzy"))
+            self.assertEqual(matcher.match(None, "Donora, Tstrem"), (self.donor_a, "fuzzy"))
+
+            # A different department lowers the confidence below the match threshold
+            donor, status, candidate = matcher.match_row(None, "Donora, Tstrem", "Sales")
+            self.assertEqual((donor, status, candidate.donor), (None, "review", self.donor_a))
+            self.assertEqual(matcher.match(None, "Unrelated, Person"), (None, "unmatched"))
+            self.assertIn("2 matched at 90.0%+, 1 for review", matcher.get_fuzzy_summary())
+
+            frappe.db.set_value("Organization", "_Test Corp Remittance", "fuzzy_match_threshold", 85)
+            matched = match_employees_to_donors(
+                [{"employee_name": "Donora, Tstrem", "department": "Sales", "amount": 10}], "_Test Corp Remittance"
+            )
+            self.assertEqual((matched[0]["donor"], matched[0]["match_status"]), (self.donor_a, "fuzzy"))
+            self.assertEqual(matched[0]["confidence"], 87)
+
+            # An explicit 0 is a threshold, not a missing one; out of range values are rejected
+            frappe.db.set_value("Organization", "_Test Corp Remittance", "fuzzy_review_threshold", 0)
+            self.assertEqual(DonorMatcher("_Test Corp Remittance").fuzzy_review_threshold, 0)
+            org = frappe.get_doc("Organization", "_Test Corp Remittance")
+            org.fuzzy_match_threshold = 150
+            with self.assertRaises(frappe.ValidationError):
+                org.save()
+        finally:
+            frappe.db.set_value("Organization", "_Test Corp Remittance",
+                                {"fuzzy_match_threshold": 90, "fuzzy_review_threshold": 75})
+            frappe.db.set_value("Contact", self.donor_a, {"organization": None, "department": None})
@@ -1,9 +1,22 @@
 import frappe
 from frappe.model.document import Document
 
+from united_way.cache import clear_settings_cache
+
 
 class UWSettings(Document):
-    pass
+    def on_update(self):
+        clear_settings_cache()
+
+        if self.has_value_changed("fiscal_year_start_month"):
+            self.rebuild_fiscal_dates()
+
+    def rebuild_fiscal_dates(self):
+        """Recompute the fiscal periods of every Fiscal Date row for the new start month."""
+        from united_way.periods import get_fiscal_start_month
+        from united_way.uw_core.doctype.fiscal_date.fiscal_date import rebuild_fiscal_dates
+
+        rebuild_fiscal_dates(start_month=get_fiscal_start_month(self.fiscal_year_start_month or "January"))
 
 
 def get_settings():
@@ -1,6 +1,8 @@
 import frappe
 from frappe.utils import flt
 
+from united_way.reporting import get_agency_totals
+
 
 def execute(filters=None):
     columns = get_columns()
@@ -26,6 +28,28 @@ def get_columns():
 
 
 def get_data(filters):
+    if filters and filters.get("agency_totals"):
+        return get_agency_total_rows(filters)
+
+    query, values = get_query(filters)
+    return frappe.db.sql(query, values, as_dict=True)
+
+
+def get_export_query(filters):
+    """Stream the allocation detail for background export (agency totals are small)."""
+    if filters.get("agency_totals"):
+        return None
+
+    query, values = get_query(filters)
+    return frappe._dict(query=query, values=values)
+
+
+def get_query(filters):
+    """One row per submitted pledge allocation.
+
+    Returns:
+        (sql, values)
+    """
     conditions = "p.docstatus = 1"
     values = {}
 
@@ -45,7 +69,8 @@ def get_data(filters):
         conditions += " AND pa.designation_type = %(designation_type)s"
         values["designation_type"] = filters["designation_type"]
 
-    data = frappe.db.sql(f"""
+    # Collected amount is the pledge's collection percentage of each allocation
+    query = f"""
         SELECT
             pa.agency,
             o.agency_code,
@@ -57,6 +82,7 @@ def get_data(filters):
             pa.percentage as allocation_pct,
             pa.allocated_amount,
             p.collection_percentage,
+            IFNULL(pa.allocated_amount * p.collection_percentage / 100, 0) as collected_against_pledge,
             p.collection_status as pledge_status
         FROM `tabPledge Allocation` pa
         JOIN `tabPledge` p ON pa.parent = p.name
@@ -65,14 +91,15 @@ def get_data(filters):
         LEFT JOIN `tabContact` ct ON p.donor = ct.name
         WHERE {conditions}
         ORDER BY o.organization_name, pa.allocated_amount DESC
-    """, values, as_dict=True)
+    """
+    return query, values
 
-    # Calculate proportional collected amount per allocation
-    for row in data:
-        row.collected_against_pledge = flt(
-            flt(row.allocated_amount) * flt(row.collection_percentage) / 100
-        )
 
+def get_agency_total_rows(filters):
+    """One row per agency and designation type, read from the agency fact table."""
+    data = get_agency_totals(filters, group_by=("agency", "designation_type"))
+    for row in data:
+        row.collected_against_pledge = row.collected_amount
     return data
 
 
@@ -1,4 +1,4 @@
-import frappe
+from united_way.reporting import get_agency_totals
 
 
 def execute(filters=None):
@@ -23,52 +23,14 @@ def get_columns():
 
 
 def get_data(filters):
-    conditions = "p.docstatus = 1"
-    values = {}
+    data = get_agency_totals(filters)
 
-    if filters and filters.get("campaign"):
-        conditions += " AND p.campaign = %(campaign)s"
-        values["campaign"] = filters["campaign"]
-
-    if filters and filters.get("campaign_year"):
-        conditions += " AND c.campaign_year = %(campaign_year)s"
-        values["campaign_year"] = filters["campaign_year"]
-
-    data = frappe.db.sql(f"""
-        SELECT
-            pa.agency,
-            o.agency_code,
-            o.organization_name,
-            COUNT(DISTINCT p.donor) as donor_count,
-            COUNT(DISTINCT p.name) as pledge_count,
-            SUM(pa.allocated_amount) as total_pledged
-        FROM `tabPledge Allocation` pa
-        JOIN `tabPledge` p ON pa.parent = p.name
-        JOIN `tabOrganization` o ON pa.agency = o.name
-        JOIN `tabCampaign` c ON p.campaign = c.name
-        WHERE {conditions}
-        GROUP BY pa.agency, o.agency_code, o.organization_name
-        ORDER BY total_pledged DESC
-    """, values, as_dict=True)
-
-    # Add collection data
     for row in data:
-        collected = frappe.db.sql("""
-            SELECT COALESCE(SUM(d.amount), 0) as total
-            FROM `tabDonation` d
-            JOIN `tabPledge` p ON d.pledge = p.name
-            JOIN `tabPledge Allocation` pa ON pa.parent = p.name
-            WHERE pa.agency = %s AND d.docstatus = 1 AND p.docstatus = 1
-        """, row.agency, as_dict=True)[0].get("total", 0)
-
-        # Approximate collection proportional to pledge allocation
-        if row.total_pledged:
-            row.total_collected = collected * (row.total_pledged / (row.total_pledged or 1))
-        else:
-            row.total_collected = 0
-
-        row.outstanding = (row.total_pledged or 0) - (row.total_collected or 0)
-        row.collection_rate = ((row.total_collected or 0) / row.total_pledged * 100) if row.total_pledged else 0
+        row.organization_name = row.agency_name
+        row.total_pledged = row.allocated_amount
+        row.total_collected = row.collected_amount
+        row.outstanding = row.total_pledged - row.total_collected
+        row.collection_rate = (row.total_collected / row.total_pledged * 100) if row.total_pledged else 0
 
     return data
 
@@ -1,12 +1,14 @@
 import frappe
 from frappe.utils import flt
 
+from united_way.reporting import get_agency_totals, get_distributed_by_agency
+
 
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
     chart = get_chart(data)
-    summary = get_summary(data)
+    summary = get_summary(data, filters)
     return columns, data, None, chart, summary
 
 
@@ -104,16 +106,36 @@ def get_chart(data):
     }
 
 
-def get_summary(data):
+def get_summary(data, filters=None):
     # Count unique distribution runs
     unique_runs = len(set(row.name for row in data))
     total_distributed = sum(flt(row.distribution_amount) for row in data)
     unique_agencies = len(set(row.agency for row in data))
     avg_per_agency = total_distributed / unique_agencies if unique_agencies else 0
 
-    return [
+    summary = [
         {"value": unique_runs, "label": "Total Runs", "datatype": "Int", "indicator": "blue"},
         {"value": total_distributed, "label": "Total Distributed", "datatype": "Currency", "indicator": "green"},
         {"value": unique_agencies, "label": "Total Agencies", "datatype": "Int", "indicator": "blue"},
         {"value": avg_per_agency, "label": "Avg per Agency", "datatype": "Currency", "indicator": "green"},
     ]
+
+    if filters and filters.get("campaign"):
+        summary.append({
+            "value": get_undistributed(filters["campaign"], filters.get("agency")),
+            "label": "Collected, Not Yet Distributed",
+            "datatype": "Currency",
+            "indicator": "orange",
+        })
+
+    return summary
+
+
+def get_undistributed(campaign, agency=None):
+    """Collected to date (from the agency fact table) less everything already distributed."""
+    collected = get_agency_totals({"campaign": campaign, "agency": agency})
+    distributed = get_distributed_by_agency(campaign)
+    return sum(
+        max(row.collected_amount - distributed.get(row.agency, 0), 0)
+        for row in collected
+    )
@@ -1,12 +1,15 @@
 import frappe
-from frappe.utils import flt
+from frappe.utils import cint, flt
+
+
+PAGE_LENGTH = 1000
 
 
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
     chart = get_chart(data)
-    summary = get_summary(data)
+    summary = get_summary(filters)
     return columns, data, None, chart, summary
 
 
@@ -26,11 +29,90 @@ def get_columns():
 
 
 def get_data(filters):
+    """One page of (donor, campaign) rows.
+
+    The page is picked from pledges and contacts alone; donations are then
+    aggregated only for the donors and campaigns on the page, so the cost
+    of a page does not grow with the donation history.
+    """
+    query, values = get_query(filters, with_donations=False)
+    filters = filters or {}
+    page_length = cint(filters.get("page_length")) or PAGE_LENGTH
+    values["limit"] = page_length
+    values["offset"] = (max(cint(filters.get("page")), 1) - 1) * page_length
+
+    data = frappe.db.sql(f"""
+        {query}
+        ORDER BY ct.lifetime_giving DESC, pledge_amount DESC, p.donor, p.campaign
+        LIMIT %(limit)s OFFSET %(offset)s
+    """, values, as_dict=True)
+
+    donated = get_donated(data)
+    for row in data:
+        row.total_donated = donated.get((row.donor, row.campaign), 0)
+    return [prepare_row(row) for row in data]
+
+
+def get_donated(rows):
+    """Submitted donation totals for the (donor, campaign) pairs of some rows.
+
+    Returns:
+        {(donor, campaign): total donated}
+    """
+    if not rows:
+        return {}
+
+    return {
+        (donor, campaign): flt(total)
+        for donor, campaign, total in frappe.db.sql("""
+            SELECT donor, campaign, SUM(amount)
+            FROM `tabDonation`
+            WHERE docstatus = 1 AND donor IN %(donors)s AND campaign IN %(campaigns)s
+            GROUP BY donor, campaign
+        """, {
+            "donors": tuple({row.donor for row in rows}),
+            "campaigns": tuple({row.campaign for row in rows}),
+        })
+    }
+
+
+def get_export_query(filters):
+    """Every matching row, unpaged, for background export."""
+    query, values = get_query(filters)
+    return frappe._dict(
+        query=f"{query} ORDER BY ct.lifetime_giving DESC, pledge_amount DESC, p.donor, p.campaign",
+        values=values,
+        prepare_row=prepare_row,
+    )
+
+
+def prepare_row(row):
+    row.total_donated = flt(row.total_donated)
+    row.outstanding = flt(row.pledge_amount) - flt(row.total_donated)
+    row.collection_pct = (
+        flt(row.total_donated) / flt(row.pledge_amount) * 100
+        if flt(row.pledge_amount) else 0
+    )
+    return row
+
+
+def get_query(filters, with_donations=True):
+    """Grouped pledge rows joined to the donation aggregate for the same donor and campaign.
+
+    Args:
+        with_donations: Include total_donated. The donation aggregate is limited
+            to the donors matching the pledge and contact filters.
+
+    Returns:
+        (sql without ORDER BY / LIMIT, values)
+    """
     conditions = "p.docstatus = 1"
+    donation_conditions = "docstatus = 1"
     values = {}
 
     if filters and filters.get("campaign"):
         conditions += " AND p.campaign = %(campaign)s"
+        donation_conditions += " AND campaign = %(campaign)s"
         values["campaign"] = filters["campaign"]
 
     if filters and filters.get("from_date"):
@@ -49,40 +131,43 @@ def get_data(filters):
         conditions += " AND ct.donor_level = %(donor_level)s"
         values["donor_level"] = filters["donor_level"]
 
-    data = frappe.db.sql(f"""
+    if set(values) - {"campaign"}:
+        donation_conditions += f"""
+            AND donor IN (
+                SELECT p.donor FROM `tabPledge` p
+                JOIN `tabContact` ct ON p.donor = ct.name
+                WHERE {conditions}
+            )"""
+
+    donations = ""
+    if with_donations:
+        donations = f"""
+        LEFT JOIN (
+            SELECT donor, campaign, SUM(amount) as total_donated
+            FROM `tabDonation`
+            WHERE {donation_conditions}
+            GROUP BY donor, campaign
+        ) d ON d.donor = p.donor AND d.campaign = p.campaign"""
+
+    query = f"""
         SELECT
             p.donor,
             ct.full_name as donor_name,
             ct.organization,
             p.campaign,
             SUM(p.pledge_amount) as pledge_amount,
-            COUNT(DISTINCT p.name) as pledge_count,
+            COUNT(*) as pledge_count,
             ct.donor_since,
             ct.lifetime_giving
+            {", COALESCE(MAX(d.total_donated), 0) as total_donated" if with_donations else ""}
         FROM `tabPledge` p
         JOIN `tabContact` ct ON p.donor = ct.name
+        {donations}
         WHERE {conditions}
         GROUP BY p.donor, ct.full_name, ct.organization, p.campaign,
                  ct.donor_since, ct.lifetime_giving
-        ORDER BY ct.lifetime_giving DESC, pledge_amount DESC
-    """, values, as_dict=True)
-
-    # Calculate donation totals per donor+campaign
-    for row in data:
-        donated = frappe.db.sql("""
-            SELECT COALESCE(SUM(d.amount), 0) as total
-            FROM `tabDonation` d
-            WHERE d.donor = %s AND d.campaign = %s AND d.docstatus = 1
-        """, (row.donor, row.campaign), as_dict=True)[0].total
-
-        row.total_donated = flt(donated)
-        row.outstanding = flt(row.pledge_amount) - flt(row.total_donated)
-        row.collection_pct = (
-            flt(row.total_donated) / flt(row.pledge_amount) * 100
-            if flt(row.pledge_amount) else 0
-        )
-
-    return data
+    """
+    return query, values
 
 
 def get_chart(data):
@@ -116,10 +201,21 @@ def get_chart(data):
     }
 
 
-def get_summary(data):
-    unique_donors = len(set(row.donor for row in data))
-    total_pledged = sum(flt(row.pledge_amount) for row in data)
-    total_collected = sum(flt(row.total_donated) for row in data)
+def get_summary(filters):
+    """Totals over every matching row, not just the current page."""
+    query, values = get_query(filters)
+    totals = frappe.db.sql(f"""
+        SELECT
+            COUNT(*) as row_count,
+            COUNT(DISTINCT history.donor) as unique_donors,
+            SUM(history.pledge_amount) as total_pledged,
+            SUM(history.total_donated) as total_collected
+        FROM ({query}) history
+    """, values, as_dict=True)[0]
+
+    unique_donors = totals.unique_donors or 0
+    total_pledged = flt(totals.total_pledged)
+    total_collected = flt(totals.total_collected)
     avg_gift = total_collected / unique_donors if unique_donors else 0
 
     return [
@@ -127,4 +223,5 @@ def get_summary(data):
         {"value": total_pledged, "label": "Total Pledged", "datatype": "Currency", "indicator": "blue"},
         {"value": total_collected, "label": "Total Collected", "datatype": "Currency", "indicator": "green"},
         {"value": avg_gift, "label": "Average Gift Size", "datatype": "Currency", "indicator": "green"},
+        {"value": totals.row_count or 0, "label": "Rows (All Pages)", "datatype": "Int", "indicator": "blue"},
     ]
@@ -1,8 +1,26 @@
 import frappe
-from frappe.utils import flt, cint
+import numpy as np
+from frappe.utils import add_days, flt, cint
+
+from united_way.periods import date_range_condition, get_fiscal_start_month, get_period_range
+
+STATUSES = ["Retained", "New", "Reactivated", "Lapsed", "SYBUNT"]
+VIEWS = ["Donor Status", "LYBUNT", "SYBUNT", "By Donor Level", "Cohorts"]
 
 
 def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    view = filters.get("view") or "Donor Status"
+    current_year = cint(filters.get("current_year")) or 2025
+
+    if view == "Cohorts":
+        columns, data = get_cohorts(filters, current_year)
+        return columns, data, None, None, []
+
+    if view == "By Donor Level":
+        data = get_level_data(filters, current_year)
+        return get_level_columns(), data, None, None, []
+
     columns = get_columns()
     data = get_data(filters)
     chart = get_chart(data)
@@ -26,136 +44,279 @@ def get_columns():
 
 
 def get_data(filters):
-    current_year = cint(filters.get("current_year")) if filters else 0
-    if not current_year:
-        current_year = 2025
+    """Donor rows for the Donor Status, LYBUNT and SYBUNT views."""
+    filters = frappe._dict(filters or {})
+    view = filters.get("view") or "Donor Status"
+    current_year = cint(filters.get("current_year")) or 2025
     previous_year = current_year - 1
 
-    campaign_condition = ""
-    campaign_value = {}
-    if filters and filters.get("campaign"):
-        campaign_condition = " AND d.campaign = %(campaign)s"
-        campaign_value["campaign"] = filters["campaign"]
-
-    # Donors who gave in current year (submitted donations)
-    current_year_donors = frappe.db.sql("""
-        SELECT
-            d.donor,
-            SUM(d.amount) as total_given
-        FROM `tabDonation` d
-        WHERE d.docstatus = 1
-            AND YEAR(d.donation_date) = %(current_year)s
-            {campaign_condition}
-        GROUP BY d.donor
-    """.format(campaign_condition=campaign_condition),
-        dict(current_year=current_year, **campaign_value),
-        as_dict=True
-    )
-    current_map = {row.donor: flt(row.total_given) for row in current_year_donors}
-
-    # Donors who gave in previous year (submitted donations)
-    previous_year_donors = frappe.db.sql("""
-        SELECT
-            d.donor,
-            SUM(d.amount) as total_given
-        FROM `tabDonation` d
-        WHERE d.docstatus = 1
-            AND YEAR(d.donation_date) = %(previous_year)s
-            {campaign_condition}
-        GROUP BY d.donor
-    """.format(campaign_condition=campaign_condition),
-        dict(previous_year=previous_year, **campaign_value),
-        as_dict=True
-    )
-    previous_map = {row.donor: flt(row.total_given) for row in previous_year_donors}
-
-    # Donors who gave before previous year (to distinguish New vs Reactivated)
-    # These are donors with any submitted donation before Jan 1 of previous_year
-    historical_donors = frappe.db.sql("""
-        SELECT DISTINCT d.donor
-        FROM `tabDonation` d
-        WHERE d.docstatus = 1
-            AND YEAR(d.donation_date) < %(previous_year)s
-            {campaign_condition}
-    """.format(campaign_condition=campaign_condition),
-        dict(previous_year=previous_year, **campaign_value),
-        as_dict=True
-    )
-    historical_set = {row.donor for row in historical_donors}
-
-    # Union of all donors from current and previous year
-    all_donors = set(current_map.keys()) | set(previous_map.keys())
-
-    if not all_donors:
+    matrix = get_giving_matrix(filters, previous_year, current_year)
+    if not len(matrix.donors):
         return []
 
-    # Fetch contact details for all relevant donors
-    donor_list = list(all_donors)
-    contact_details = frappe.db.sql("""
-        SELECT
-            ct.name,
-            ct.full_name,
-            ct.organization,
-            ct.lifetime_giving,
-            ct.donor_level
-        FROM `tabContact` ct
-        WHERE ct.name IN %(donors)s
-    """, {"donors": donor_list}, as_dict=True)
-    contact_map = {c.name: c for c in contact_details}
-
-    data = []
-    for donor in sorted(all_donors):
-        in_current = donor in current_map
-        in_previous = donor in previous_map
-        in_historical = donor in historical_set
-
-        # Categorize the donor
-        if in_current and in_previous:
-            status = "Retained"
-        elif in_current and not in_previous and not in_historical:
-            status = "New"
-        elif in_current and not in_previous and in_historical:
-            status = "Reactivated"
-        elif not in_current and in_previous:
-            status = "Lapsed"
-        else:
-            # Should not happen given our union, but guard just in case
-            continue
+    status = classify(matrix)
+    if view == "LYBUNT":
+        # Last Year But Unfortunately Not This year: the lapsed donors
+        wanted = status == "Lapsed"
+    elif view == "SYBUNT":
+        wanted = status == "SYBUNT"
+    else:
+        wanted = np.isin(status, ["Retained", "New", "Reactivated", "Lapsed"])
 
-        current_giving = flt(current_map.get(donor, 0))
-        previous_giving = flt(previous_map.get(donor, 0))
-        change_amount = flt(current_giving) - flt(previous_giving)
+    donors = matrix.donors[wanted]
+    if not len(donors):
+        return []
 
-        if flt(previous_giving):
-            change_pct = flt(change_amount) / flt(previous_giving) * 100
-        elif flt(current_giving):
-            # New or reactivated donor with no previous year giving
-            change_pct = 100.0
-        else:
-            change_pct = 0.0
+    current = matrix.amounts[wanted, -1]
+    previous = matrix.amounts[wanted, -2]
+    change = current - previous
+    change_pct = np.where(
+        previous != 0,
+        change / np.where(previous != 0, previous, 1) * 100,
+        np.where(current != 0, 100.0, 0.0),
+    )
+    labels = status[wanted]
 
-        contact = contact_map.get(donor, {})
+    contacts = get_contacts(filters, previous_year if view != "SYBUNT" else None, current_year)
 
+    data = []
+    for i, donor in enumerate(donors.tolist()):
+        contact = contacts.get(donor) or {}
         data.append({
             "donor": donor,
             "donor_name": contact.get("full_name", ""),
             "organization": contact.get("organization", ""),
-            "status": status,
-            "current_year_giving": current_giving,
-            "previous_year_giving": previous_giving,
-            "change_amount": change_amount,
-            "change_pct": change_pct,
+            "status": str(labels[i]),
+            "current_year_giving": flt(current[i]),
+            "previous_year_giving": flt(previous[i]),
+            "change_amount": flt(change[i]),
+            "change_pct": flt(change_pct[i]),
             "lifetime_giving": flt(contact.get("lifetime_giving", 0)),
             "donor_level": contact.get("donor_level", ""),
         })
 
     # Sort: Retained first, then New, Reactivated, Lapsed; within each group by current year giving desc
     status_order = {"Retained": 0, "New": 1, "Reactivated": 2, "Lapsed": 3}
-    data.sort(key=lambda r: (status_order.get(r["status"], 99), -flt(r["current_year_giving"])))
+    data.sort(key=lambda r: (status_order.get(r["status"], 99), -flt(r["current_year_giving"]), r["donor"]))
+
+    return data
+
+
+def get_giving_matrix(filters, first_year, last_year):
+    """Donor x year giving, as NumPy arrays.
+
+    Column 0 holds everything given before first_year; columns 1.. are
+    first_year..last_year.
+
+    Returns:
+        frappe._dict(donors, years, amounts, counts)
+    """
+    source, values = _giving_source(filters, last_year)
+    values.update(first_year=first_year, last_year=last_year)
+
+    rows = frappe.db.sql(f"""
+        SELECT g.donor, GREATEST(g.year, %(first_year)s - 1) AS year,
+               SUM(g.total_amount) AS total_amount, SUM(g.donation_count) AS donation_count
+        FROM {source} g
+        WHERE g.year <= %(last_year)s
+        GROUP BY g.donor, GREATEST(g.year, %(first_year)s - 1)
+    """, values)
+
+    years = np.arange(first_year - 1, last_year + 1)
+    if not rows:
+        empty = np.zeros((0, len(years)))
+        return frappe._dict(donors=np.array([], dtype=object), years=years, amounts=empty, counts=empty)
+
+    donor_column, year_column, amount_column, count_column = zip(*rows)
+    donors, donor_index = np.unique(np.array(donor_column, dtype=object), return_inverse=True)
+    year_index = np.array(year_column, dtype=int) - (first_year - 1)
+
+    amounts = np.zeros((len(donors), len(years)))
+    counts = np.zeros((len(donors), len(years)), dtype=int)
+    np.add.at(amounts, (donor_index, year_index), np.array(amount_column, dtype=float))
+    np.add.at(counts, (donor_index, year_index), np.array(count_column, dtype=int))
+
+    return frappe._dict(donors=donors, years=years, amounts=amounts, counts=counts)
+
+
+def classify(matrix):
+    """Retention status of every donor in the matrix for its last year.
+
+    Retained: gave this year and last year
+    New: gave this year, never before
+    Reactivated: gave this year and before last year, but not last year
+    Lapsed: gave last year but not this year (LYBUNT)
+    SYBUNT: gave before last year, but neither last year nor this year
+    """
+    current = matrix.counts[:, -1] > 0
+    previous = matrix.counts[:, -2] > 0
+    earlier = (matrix.counts[:, :-2] > 0).any(axis=1)
+
+    return np.select(
+        [
+            current & previous,
+            current & ~previous & ~earlier,
+            current & ~previous & earlier,
+            ~current & previous,
+            ~current & ~previous & earlier,
+        ],
+        STATUSES,
+        default="",
+    )
+
+
+def get_contacts(filters, from_year, to_year):
+    """Contact details for donors who gave between from_year (or ever) and to_year."""
+    source, values = _giving_source(filters, to_year)
+    values.update(from_year=from_year, to_year=to_year)
+    condition = "AND g.year >= %(from_year)s" if from_year else ""
+
+    return {
+        row.name: row
+        for row in frappe.db.sql(f"""
+            SELECT ct.name, ct.full_name, ct.organization, ct.lifetime_giving, ct.donor_level
+            FROM `tabContact` ct
+            JOIN (
+                SELECT DISTINCT g.donor
+                FROM {source} g
+                WHERE g.year <= %(to_year)s {condition}
+            ) donors ON donors.donor = ct.name
+        """, values, as_dict=True)
+    }
+
+
+def get_level_columns():
+    return [
+        {"fieldname": "donor_level", "label": "Donor Level", "fieldtype": "Data", "width": 220},
+        {"fieldname": "previous_year_donors", "label": "Previous Year Donors", "fieldtype": "Int", "width": 150},
+        {"fieldname": "retained", "label": "Retained", "fieldtype": "Int", "width": 100},
+        {"fieldname": "lapsed", "label": "Lapsed", "fieldtype": "Int", "width": 100},
+        {"fieldname": "new", "label": "New", "fieldtype": "Int", "width": 100},
+        {"fieldname": "reactivated", "label": "Reactivated", "fieldtype": "Int", "width": 110},
+        {"fieldname": "retention_rate", "label": "Retention Rate", "fieldtype": "Percent", "width": 120},
+    ]
+
+
+def get_level_data(filters, current_year):
+    """Retention counts per current donor level."""
+    matrix = get_giving_matrix(filters, current_year - 1, current_year)
+    if not len(matrix.donors):
+        return []
+
+    status = classify(matrix)
+    contacts = get_contacts(filters, current_year - 1, current_year)
+    levels = np.array(
+        [(contacts.get(donor) or {}).get("donor_level") or "" for donor in matrix.donors.tolist()],
+        dtype=object,
+    )
+
+    data = []
+    for level in sorted(set(levels.tolist())):
+        at_level = status[levels == level]
+        counts = {s: int((at_level == s).sum()) for s in STATUSES}
+        previous_year_donors = counts["Retained"] + counts["Lapsed"]
+        if not (previous_year_donors or counts["New"] or counts["Reactivated"]):
+            continue
+
+        data.append({
+            "donor_level": level or "(None)",
+            "previous_year_donors": previous_year_donors,
+            "retained": counts["Retained"],
+            "lapsed": counts["Lapsed"],
+            "new": counts["New"],
+            "reactivated": counts["Reactivated"],
+            "retention_rate": counts["Retained"] / previous_year_donors * 100 if previous_year_donors else 0,
+        })
 
     return data
 
 
+def get_cohorts(filters, current_year):
+    """Donors grouped by first giving year, with how many gave again in each later year."""
+    years_back = max(cint(filters.get("cohort_years")) or 5, 2)
+    first_year = current_year - years_back + 1
+    matrix = get_giving_matrix(filters, first_year, current_year)
+    years = matrix.years[1:].tolist()
+
+    columns = [
+        {"fieldname": "cohort", "label": "First Gift Year", "fieldtype": "Int", "width": 120},
+        {"fieldname": "donors", "label": "Donors", "fieldtype": "Int", "width": 100},
+    ] + [
+        {"fieldname": f"year_{year}", "label": str(year), "fieldtype": "Int", "width": 90}
+        for year in years
+    ] + [
+        {"fieldname": "second_year_retention", "label": "Second Year Retention", "fieldtype": "Percent", "width": 160},
+    ]
+
+    if not len(matrix.donors):
+        return columns, []
+
+    gave = matrix.counts[:, 1:] > 0
+    # Donors who gave before the window belong to an older cohort
+    in_window = (matrix.counts[:, 0] == 0) & gave.any(axis=1)
+    cohort_index = np.where(in_window, gave.argmax(axis=1), -1)
+
+    data = []
+    for i, year in enumerate(years):
+        members = gave[cohort_index == i]
+        if not len(members):
+            continue
+
+        active = members.sum(axis=0)
+        row = {"cohort": year, "donors": len(members)}
+        row.update({f"year_{y}": int(active[j]) if j >= i else None for j, y in enumerate(years)})
+        row["second_year_retention"] = (
+            active[i + 1] / len(members) * 100 if i + 1 < len(years) else None
+        )
+        data.append(row)
+
+    return columns, data
+
+
+def _giving_source(filters, to_year):
+    """Derived table of (donor, year, total_amount, donation_count) rows up to to_year.
+
+    For calendar years without a campaign filter this is the Donor Giving
+    Year table kept current by Donation submit/cancel. Fiscal years or a
+    campaign filter group the donations by their Fiscal Date instead.
+    """
+    fiscal = filters.get("year_type") == "Fiscal Year"
+    if not (fiscal or filters.get("campaign")):
+        return "`tabDonor Giving Year`", {}
+
+    # Dates outside the Fiscal Date rows (until the daily extension adds
+    # them) fall back to computing the year, as periods.get_fiscal_year does
+    if fiscal:
+        year_column = """COALESCE(fd.fiscal_year, YEAR(d.donation_date)
+            + (%(fiscal_start_month)s > 1 AND MONTH(d.donation_date) >= %(fiscal_start_month)s))"""
+    else:
+        year_column = "COALESCE(fd.calendar_year, YEAR(d.donation_date))"
+
+    # Up to the end of to_year, as a range the donation_date index can use
+    condition, values = date_range_condition(
+        "d.donation_date", {"to_date": _year_end(to_year, fiscal)}
+    )
+    values["fiscal_start_month"] = get_fiscal_start_month()
+    if filters.get("campaign"):
+        condition += " AND d.campaign = %(campaign)s"
+        values["campaign"] = filters["campaign"]
+
+    return f"""(
+        SELECT d.donor, {year_column} AS year,
+               SUM(d.amount) AS total_amount, COUNT(*) AS donation_count
+        FROM `tabDonation` d
+        LEFT JOIN `tabFiscal Date` fd ON fd.calendar_date = d.donation_date
+        WHERE d.docstatus = 1 AND d.donor IS NOT NULL AND {condition}
+        GROUP BY d.donor, {year_column}
+    )""", values
+
+
+def _year_end(year, fiscal):
+    """Last day of a calendar or fiscal year."""
+    end = get_period_range(**{"fiscal_year" if fiscal else "year": year})[1]
+    return add_days(end, -1)
+
+
 def get_chart(data):
     if not data:
         return None
@@ -168,6 +329,8 @@ def get_chart(data):
     # Fixed order for consistent chart display
     labels = ["Retained", "New", "Reactivated", "Lapsed"]
     values = [status_counts.get(label, 0) for label in labels]
+    if not any(values):
+        return None
 
     return {
         "data": {
@@ -182,7 +345,7 @@ def get_chart(data):
 
 
 def get_summary(data, filters=None):
-    if not data:
+    if not data or (filters and filters.get("view") in ("LYBUNT", "SYBUNT")):
         return []
 
     current_year_donors = [r for r in data if r["status"] != "Lapsed"]
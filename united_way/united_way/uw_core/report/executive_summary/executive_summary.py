@@ -1,12 +1,28 @@
 import frappe
 from frappe.utils import flt
 
+from united_way.cache import get_organization
+from united_way.reporting import get_agency_totals, get_cached_report
+
 
 def execute(filters=None):
     columns = get_columns()
-    data = get_data(filters)
+    if not filters or not filters.get("campaign"):
+        return columns, [], None, None, []
+
+    campaign = filters["campaign"]
+    return get_cached_report("Executive Summary", campaign, lambda: get_result(campaign, columns))
+
+
+def get_result(campaign, columns):
+    """Compute the full report; cached per campaign data version by execute()."""
+    campaign_doc = _get_campaign(campaign)
+    if not campaign_doc:
+        return columns, [], None, None, []
+
+    data = get_data(campaign_doc)
     chart = get_chart(data)
-    summary = get_summary(data, filters)
+    summary = get_summary(campaign_doc)
     return columns, data, None, chart, summary
 
 
@@ -21,27 +37,13 @@ def get_columns():
     ]
 
 
-def get_data(filters):
-    if not filters or not filters.get("campaign"):
-        return []
-
-    campaign = filters["campaign"]
+def get_data(campaign_doc):
+    campaign = campaign_doc.name
     data = []
 
     # ---------------------------------------------------------------
     # Section 1 - Campaign Overview
     # ---------------------------------------------------------------
-    campaign_doc = frappe.db.get_value(
-        "Campaign",
-        campaign,
-        ["campaign_name", "fundraising_goal", "total_pledged", "total_collected",
-         "donor_count", "pledge_count", "collection_rate", "campaign_year"],
-        as_dict=True,
-    )
-
-    if not campaign_doc:
-        return []
-
     goal = flt(campaign_doc.fundraising_goal)
     total_pledged = flt(campaign_doc.total_pledged)
     total_collected = flt(campaign_doc.total_collected)
@@ -106,7 +108,7 @@ def get_data(filters):
     campaign_year = campaign_doc.campaign_year or 0
     prior_year = campaign_year - 1 if campaign_year else 0
 
-    new_donor_count = _get_new_donor_count(campaign, prior_year)
+    new_donor_count = _get_new_donor_count(campaign_doc, prior_year)
     data.append({
         "category": "Campaign Overview",
         "metric": "New Donors (vs Prior Year)",
@@ -203,22 +205,8 @@ def get_chart(data):
     }
 
 
-def get_summary(data, filters):
+def get_summary(campaign_doc):
     """KPI summary cards for the top of the report."""
-    if not filters or not filters.get("campaign"):
-        return []
-
-    campaign = filters["campaign"]
-    campaign_doc = frappe.db.get_value(
-        "Campaign",
-        campaign,
-        ["fundraising_goal", "total_pledged", "total_collected", "collection_rate"],
-        as_dict=True,
-    )
-
-    if not campaign_doc:
-        return []
-
     goal = flt(campaign_doc.fundraising_goal)
     total_pledged = flt(campaign_doc.total_pledged)
     total_collected = flt(campaign_doc.total_collected)
@@ -278,88 +266,73 @@ def _collection_status(percent):
         return "Behind"
 
 
-def _get_new_donor_count(campaign, prior_year):
+def _get_campaign(campaign):
+    """The Campaign row, read once for both the overview and the summary cards."""
+    return frappe.db.get_value(
+        "Campaign",
+        campaign,
+        ["name", "campaign_name", "fundraising_goal", "total_pledged", "total_collected",
+         "donor_count", "pledge_count", "collection_rate", "campaign_year"],
+        as_dict=True,
+    )
+
+
+def _get_new_donor_count(campaign_doc, prior_year):
     """Count donors who gave in this campaign but not in any prior-year campaign."""
     if not prior_year:
         # No prior year available -- count all donors as new
-        result = frappe.db.sql("""
-            SELECT COUNT(DISTINCT p.donor) as cnt
-            FROM `tabPledge` p
-            WHERE p.campaign = %s AND p.docstatus = 1
-        """, campaign, as_dict=True)
-        return result[0].cnt if result else 0
+        return campaign_doc.donor_count or 0
 
+    # Campaign Donor holds one row per donor with a submitted pledge in a campaign
     result = frappe.db.sql("""
-        SELECT COUNT(DISTINCT p.donor) as cnt
-        FROM `tabPledge` p
-        WHERE p.campaign = %s
-          AND p.docstatus = 1
-          AND p.donor NOT IN (
-              SELECT DISTINCT p2.donor
-              FROM `tabPledge` p2
-              JOIN `tabCampaign` c2 ON p2.campaign = c2.name
-              WHERE c2.campaign_year = %s
-                AND p2.docstatus = 1
+        SELECT COUNT(*) as cnt
+        FROM `tabCampaign Donor` cd
+        WHERE cd.campaign = %s
+          AND NOT EXISTS (
+              SELECT 1
+              FROM `tabCampaign Donor` prior_cd
+              JOIN `tabCampaign` c2 ON prior_cd.campaign = c2.name
+              WHERE prior_cd.donor = cd.donor
+                AND c2.campaign_year = %s
           )
-    """, (campaign, prior_year), as_dict=True)
+    """, (campaign_doc.name, prior_year), as_dict=True)
     return result[0].cnt if result else 0
 
 
 def _get_top_donors(campaign, limit=10):
     """Return top donors by pledge amount with their collected totals."""
-    return frappe.db.sql("""
+    donors = frappe.db.sql("""
         SELECT
             p.donor,
             p.donor_name,
             p.donor_organization,
-            o.organization_name AS org_name,
             SUM(p.pledge_amount) AS pledge_amount,
-            COALESCE(
-                (SELECT SUM(d.amount)
-                 FROM `tabDonation` d
-                 WHERE d.donor = p.donor
-                   AND d.campaign = p.campaign
-                   AND d.docstatus = 1),
-                0
-            ) AS total_collected
+            COALESCE(MAX(d.total_collected), 0) AS total_collected
         FROM `tabPledge` p
-        LEFT JOIN `tabOrganization` o ON p.donor_organization = o.name
-        WHERE p.campaign = %s AND p.docstatus = 1
-        GROUP BY p.donor, p.donor_name, p.donor_organization, o.organization_name
+        LEFT JOIN (
+            SELECT donor, SUM(amount) AS total_collected
+            FROM `tabDonation`
+            WHERE campaign = %(campaign)s AND docstatus = 1
+            GROUP BY donor
+        ) d ON d.donor = p.donor
+        WHERE p.campaign = %(campaign)s AND p.docstatus = 1
+        GROUP BY p.donor, p.donor_name, p.donor_organization
         ORDER BY pledge_amount DESC
-        LIMIT %s
-    """, (campaign, limit), as_dict=True)
+        LIMIT %(limit)s
+    """, {"campaign": campaign, "limit": limit}, as_dict=True)
+
+    for donor in donors:
+        donor.org_name = (get_organization(donor.donor_organization) or frappe._dict()).organization_name
+
+    return donors
 
 
 def _get_agency_allocations(campaign):
-    """Return agency allocation totals with proportional collected amounts."""
-    return frappe.db.sql("""
-        SELECT
-            pa.agency,
-            o.organization_name AS agency_name,
-            o.agency_code,
-            SUM(pa.allocated_amount) AS allocated_amount,
-            COALESCE(
-                SUM(pa.allocated_amount) *
-                (SELECT COALESCE(SUM(d.amount), 0)
-                 FROM `tabDonation` d
-                 WHERE d.campaign = %s AND d.docstatus = 1)
-                /
-                NULLIF(
-                    (SELECT COALESCE(SUM(p2.pledge_amount), 0)
-                     FROM `tabPledge` p2
-                     WHERE p2.campaign = %s AND p2.docstatus = 1),
-                    0
-                ),
-                0
-            ) AS collected_proportional
-        FROM `tabPledge Allocation` pa
-        JOIN `tabPledge` p ON pa.parent = p.name
-        LEFT JOIN `tabOrganization` o ON pa.agency = o.name
-        WHERE p.campaign = %s AND p.docstatus = 1
-        GROUP BY pa.agency, o.organization_name, o.agency_code
-        ORDER BY allocated_amount DESC
-    """, (campaign, campaign, campaign), as_dict=True)
+    """Return agency allocation totals with the amounts collected for each agency."""
+    rows = get_agency_totals({"campaign": campaign})
+    for row in rows:
+        row.collected_proportional = row.collected_amount
+    return rows
 
 
 def _get_campaign_drives(campaign):
@@ -1,12 +1,27 @@
 import frappe
-from frappe.utils import flt, getdate, date_diff, nowdate
+from frappe.utils import flt, getdate, nowdate
+
+from united_way.cache import get_organization
+from united_way.periods import date_range_condition
+from united_way.reporting import AGING_BUCKETS, OPEN_SCHEDULE_STATUSES, get_aging_buckets
+
+GROUPS = {"Campaign": "campaign", "Employer": "employer", "Donor": "donor"}
 
 
 def execute(filters=None):
-    columns = get_columns()
-    data = get_data(filters)
-    chart = get_chart(data)
-    summary = get_summary(data)
+    filters = frappe._dict(filters or {})
+    group_by = filters.get("group_by") or "Campaign"
+
+    if group_by == "Entry":
+        columns = get_columns()
+        data = get_data(filters)
+    else:
+        columns = get_bucket_columns(group_by)
+        data = get_bucket_data(filters, group_by)
+
+    totals = get_aging_buckets(filters, group_by=(), as_of_date=filters.get("as_of_date"))[0]
+    chart = get_chart(totals)
+    summary = get_summary(totals)
     return columns, data, None, chart, summary
 
 
@@ -22,25 +37,99 @@ def get_columns():
         {"fieldname": "actual_amount", "label": "Actual Amount", "fieldtype": "Currency", "width": 120},
         {"fieldname": "status", "label": "Status", "fieldtype": "Data", "width": 110},
         {"fieldname": "days_overdue", "label": "Days Overdue", "fieldtype": "Int", "width": 110},
+        {"fieldname": "aging_bucket", "label": "Aging Bucket", "fieldtype": "Data", "width": 110},
         {"fieldname": "donation", "label": "Donation", "fieldtype": "Link", "options": "Donation", "width": 150},
     ]
 
 
+def get_bucket_columns(group_by):
+    if group_by == "Donor":
+        columns = [
+            {"fieldname": "donor", "label": "Donor", "fieldtype": "Link", "options": "Contact", "width": 160},
+            {"fieldname": "donor_name", "label": "Donor Name", "fieldtype": "Data", "width": 160},
+        ]
+    elif group_by == "Employer":
+        columns = [
+            {"fieldname": "employer", "label": "Employer", "fieldtype": "Link", "options": "Organization", "width": 180},
+            {"fieldname": "employer_name", "label": "Employer Name", "fieldtype": "Data", "width": 180},
+        ]
+    else:
+        columns = [
+            {"fieldname": "campaign", "label": "Campaign", "fieldtype": "Link", "options": "Campaign", "width": 170},
+        ]
+
+    columns += [
+        {"fieldname": fieldname, "label": label, "fieldtype": "Currency", "width": 120}
+        for fieldname, label, first_day, last_day in AGING_BUCKETS
+    ]
+    columns += [
+        {"fieldname": "total_outstanding", "label": "Total Outstanding", "fieldtype": "Currency", "width": 140},
+        {"fieldname": "overdue_count", "label": "Overdue Entries", "fieldtype": "Int", "width": 110},
+        {"fieldname": "entry_count", "label": "Entries", "fieldtype": "Int", "width": 90},
+    ]
+    return columns
+
+
+def get_bucket_data(filters, group_by):
+    """One row per campaign, employer or donor, aggregated in SQL."""
+    if group_by not in GROUPS:
+        frappe.throw(f"Cannot group Payment Schedule Aging by '{group_by}'.")
+
+    column = GROUPS[group_by]
+    data = get_aging_buckets(filters, group_by=(column,), as_of_date=filters.get("as_of_date"))
+
+    if group_by == "Employer":
+        for row in data:
+            row.employer_name = (get_organization(row.employer) or {}).get("organization_name")
+    elif group_by == "Donor":
+        names = {}
+        donors = [row.donor for row in data if row.donor]
+        if donors:
+            names = dict(frappe.db.sql("""
+                SELECT name, full_name FROM `tabContact` WHERE name IN %(donors)s
+            """, {"donors": donors}))
+        for row in data:
+            row.donor_name = names.get(row.donor)
+
+    data.sort(key=lambda row: (-row.total_outstanding, row.get(column) or ""))
+    return data
+
+
 def get_data(filters):
+    """Row-level drill-down: one row per Payment Schedule Entry."""
+    query, values = get_entry_query(filters)
+    return [prepare_row(row) for row in frappe.db.sql(query, values, as_dict=True)]
+
+
+def get_export_query(filters):
+    """Stream the row-level listing for background export (grouped views are small)."""
+    if (filters.get("group_by") or "Campaign") != "Entry":
+        return None
+
+    query, values = get_entry_query(filters)
+    return frappe._dict(query=query, values=values, prepare_row=prepare_row)
+
+
+def get_entry_query(filters):
+    """Payment Schedule Entry rows with their days overdue.
+
+    Returns:
+        (sql, values)
+    """
     conditions = "p.docstatus = 1"
-    values = {}
+    values = {
+        "as_of_date": getdate(filters.get("as_of_date") or nowdate()),
+        "open_statuses": OPEN_SCHEDULE_STATUSES,
+    }
 
     if filters and filters.get("campaign"):
         conditions += " AND p.campaign = %(campaign)s"
         values["campaign"] = filters["campaign"]
 
-    if filters and filters.get("from_date"):
-        conditions += " AND pse.due_date >= %(from_date)s"
-        values["from_date"] = filters["from_date"]
-
-    if filters and filters.get("to_date"):
-        conditions += " AND pse.due_date <= %(to_date)s"
-        values["to_date"] = filters["to_date"]
+    # Date and fiscal period filters, as one range on due_date
+    due_date_condition, due_date_values = date_range_condition("pse.due_date", filters)
+    conditions += f" AND {due_date_condition}"
+    values.update(due_date_values)
 
     if filters and filters.get("organization"):
         conditions += " AND p.donor_organization = %(organization)s"
@@ -51,7 +140,7 @@ def get_data(filters):
         conditions += " AND pse.status = %(status)s"
         values["status"] = status_filter
 
-    data = frappe.db.sql(f"""
+    query = f"""
         SELECT
             p.name as pledge,
             p.donor,
@@ -64,9 +153,9 @@ def get_data(filters):
             pse.status,
             pse.donation,
             CASE
-                WHEN pse.status IN ('Pending', 'Overdue', 'Partially Paid')
-                     AND pse.due_date < CURDATE()
-                THEN DATEDIFF(CURDATE(), pse.due_date)
+                WHEN pse.status IN %(open_statuses)s
+                     AND pse.due_date < %(as_of_date)s
+                THEN DATEDIFF(%(as_of_date)s, pse.due_date)
                 ELSE 0
             END as days_overdue
         FROM `tabPayment Schedule Entry` pse
@@ -74,50 +163,45 @@ def get_data(filters):
         LEFT JOIN `tabContact` ct ON p.donor = ct.name
         WHERE {conditions}
         ORDER BY pse.due_date ASC, pse.expected_amount DESC
-    """, values, as_dict=True)
+    """
+    return query, values
 
-    return data
 
+def prepare_row(row):
+    row.aging_bucket = get_bucket_label(row.days_overdue) if row.status in OPEN_SCHEDULE_STATUSES else None
+    return row
 
-def get_chart(data):
-    if not data:
-        return None
 
-    # Count entries by status
-    status_counts = {}
-    for row in data:
-        status = row.get("status", "Unknown")
-        status_counts[status] = status_counts.get(status, 0) + 1
+def get_bucket_label(days_overdue):
+    for fieldname, label, first_day, last_day in AGING_BUCKETS:
+        if (first_day is None or days_overdue >= first_day) and (last_day is None or days_overdue <= last_day):
+            return label
 
-    if not status_counts:
+
+def get_chart(totals):
+    values = [flt(totals[fieldname]) for fieldname, label, first_day, last_day in AGING_BUCKETS]
+    if not any(values):
         return None
 
     return {
         "data": {
-            "labels": list(status_counts.keys()),
+            "labels": [label for fieldname, label, first_day, last_day in AGING_BUCKETS],
             "datasets": [
-                {"name": "Entries", "values": list(status_counts.values())},
+                {"name": "Outstanding", "values": values},
             ],
         },
-        "type": "pie",
-        "colors": [
-            "#5B8FF9", "#5AD8A6", "#F6BD16", "#E86452",
-            "#6DC8EC", "#945FB9",
-        ],
+        "type": "bar",
+        "colors": ["#5B8FF9"],
     }
 
 
-def get_summary(data):
-    total_expected = sum(flt(row.expected_amount) for row in data)
-    total_collected = sum(flt(row.actual_amount) for row in data)
-
-    overdue_rows = [row for row in data if flt(row.days_overdue) > 0]
-    total_overdue = sum(flt(row.expected_amount) - flt(row.actual_amount) for row in overdue_rows)
-    overdue_count = len(overdue_rows)
+def get_summary(totals):
+    total_overdue = flt(totals.total_outstanding) - flt(totals.current_amount)
+    overdue_count = totals.overdue_count
 
     return [
-        {"value": total_expected, "label": "Total Expected", "datatype": "Currency", "indicator": "blue"},
-        {"value": total_collected, "label": "Total Collected", "datatype": "Currency", "indicator": "green"},
+        {"value": totals.expected_amount, "label": "Total Expected", "datatype": "Currency", "indicator": "blue"},
+        {"value": totals.actual_amount, "label": "Total Collected", "datatype": "Currency", "indicator": "green"},
         {
             "value": total_overdue,
             "label": "Total Overdue",
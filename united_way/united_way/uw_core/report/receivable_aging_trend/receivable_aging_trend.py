@@ -0,0 +1,80 @@
+import frappe
+from frappe.utils import cint, flt
+
+from united_way.periods import date_range_condition
+from united_way.reporting import AGING_BUCKETS
+
+
+def execute(filters=None):
+    columns = get_columns()
+    data = get_data(filters)
+    chart = get_chart(data)
+    return columns, data, None, chart
+
+
+def get_columns():
+    columns = [
+        {"fieldname": "snapshot_date", "label": "Snapshot Date", "fieldtype": "Date", "width": 120},
+    ]
+    columns += [
+        {"fieldname": fieldname, "label": label, "fieldtype": "Currency", "width": 120}
+        for fieldname, label, first_day, last_day in AGING_BUCKETS
+    ]
+    columns += [
+        {"fieldname": "total_outstanding", "label": "Total Outstanding", "fieldtype": "Currency", "width": 140},
+        {"fieldname": "overdue_count", "label": "Overdue Entries", "fieldtype": "Int", "width": 110},
+    ]
+    return columns
+
+
+def get_data(filters):
+    """Daily totals from Receivable Aging Snapshot, without rescanning payment schedules."""
+    filters = frappe._dict(filters or {})
+    conditions = []
+    values = {}
+
+    if filters.campaign:
+        conditions.append("s.campaign = %(campaign)s")
+        values["campaign"] = filters.campaign
+    if filters.employer:
+        conditions.append("s.employer = %(employer)s")
+        values["employer"] = filters.employer
+
+    date_condition, date_values = date_range_condition(
+        "s.snapshot_date", {"from_date": filters.from_date, "to_date": filters.to_date}
+    )
+    conditions.append(date_condition)
+    values.update(date_values)
+
+    measures = [bucket[0] for bucket in AGING_BUCKETS] + ["total_outstanding", "overdue_count"]
+    data = frappe.db.sql(f"""
+        SELECT s.snapshot_date, {", ".join(f"SUM(s.{measure}) AS {measure}" for measure in measures)}
+        FROM `tabReceivable Aging Snapshot` s
+        WHERE {" AND ".join(conditions)}
+        GROUP BY s.snapshot_date
+        ORDER BY s.snapshot_date
+    """, values, as_dict=True)
+
+    for row in data:
+        for measure in measures:
+            row[measure] = flt(row[measure])
+        row.overdue_count = cint(row.overdue_count)
+
+    return data
+
+
+def get_chart(data):
+    if not data:
+        return None
+
+    return {
+        "data": {
+            "labels": [str(row.snapshot_date) for row in data],
+            "datasets": [
+                {"name": label, "values": [row[fieldname] for row in data]}
+                for fieldname, label, first_day, last_day in AGING_BUCKETS[1:]
+            ],
+        },
+        "type": "line",
+        "colors": ["#5AD8A6", "#F6BD16", "#FF9845", "#E86452"],
+    }